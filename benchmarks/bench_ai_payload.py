@@ -0,0 +1,139 @@
+"""Serialisation cost of the AI request payload for a patient with 500 medical checks.
+
+Compares the current single-pass pipeline (model_dump(mode="json"), each check serialised once with
+pydantic-core's encoder and reused in the message) against the previous
+model_dump_json -> json.loads -> json.dumps(indent=4) round trip.
+
+Usage:
+    uv run python -m benchmarks.bench_ai_payload
+"""
+
+import json
+import statistics
+import timeit
+from datetime import date, timedelta
+from typing import Any
+
+from settings import OpenAISettings
+from src.models.address import Address
+from src.models.enums import MedicalCheckStatus, Sex, Title
+from src.models.medical_check import MedicalCheck, MedicalCheckAttachment
+from src.models.medical_check_item import MedicalCheckItem
+from src.models.patient import Patient
+from src.services.ai_service import AiService, _hash_payload_json
+from src.services.payload_builder import to_compact_json
+
+CHECK_COUNT = 500
+REPEAT = 20
+
+_STATUSES = list(MedicalCheckStatus)
+
+
+def build_patient() -> Patient:
+    return Patient(
+        patient_id=1,
+        title=Title.MR,
+        first_name="bench",
+        last_name="mark",
+        sex=Sex.MALE,
+        dob=date(1970, 1, 1),
+        email="bench@example.com",
+        phone="000",
+        address=Address(line_1="1 Bench Street", line_2=None, town="London", postcode="SW1A1AA"),
+    )
+
+
+def build_checks(count: int = CHECK_COUNT) -> list[MedicalCheck]:
+    start = date(2000, 1, 1)
+    return [
+        MedicalCheck(
+            check_id=i,
+            patient_id=1,
+            check_date=start + timedelta(days=i * 7),
+            template_name="blood",
+            status=_STATUSES[i % len(_STATUSES)],
+            notes=f"Routine review {i}. Patient reports feeling well.",
+            medical_check_items=[
+                MedicalCheckItem(check_item_id=f"{i}-{n}", name=name, units=units, value=str(4.5 + n))
+                for n, (name, units) in enumerate(
+                    [("Glucose", "mmol/L"), ("Haemoglobin", "g/L"), ("Cholesterol", "mmol/L"), ("WBC", "10^9/L")]
+                )
+            ],
+            attachments=[
+                MedicalCheckAttachment(
+                    attachment_id=i,
+                    filename=f"report_{i}.txt",
+                    content_type="text/plain",
+                    file_path=f"1/{i}/report_{i}.txt",
+                    parsed_content="Full blood count within normal limits. " * 10,
+                )
+            ]
+            if i % 5 == 0
+            else [],
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_payload(service: AiService, patient: Patient, checks: list[MedicalCheck]) -> str:
+    """The serialisation pipeline before single-pass dumps, kept here as the baseline."""
+    anonymized_patient = json.loads(
+        patient.model_dump_json(exclude={"first_name", "middle_name", "last_name", "address", "email", "phone"})
+    )
+    anonymized_checks: list[dict[str, Any]] = []
+    for mc in checks:
+        data = json.loads(mc.model_dump_json())
+        for i, attachment in enumerate(mc.attachments):
+            if attachment.parsed_content:
+                data["attachments"][i]["content"] = attachment.parsed_content
+        anonymized_checks.append(data)
+
+    payload = {
+        "model": service.settings.model,
+        "messages": [
+            {"role": "system", "content": service.settings.system_prompt},
+            {
+                "role": "user",
+                "content": json.dumps(
+                    {"patient_info": anonymized_patient, "medical_history": anonymized_checks}, indent=4
+                ),
+            },
+        ],
+    }
+    return json.dumps(payload)
+
+
+def current_payload(service: AiService, patient: Patient, checks: list[MedicalCheck]) -> str:
+    # Mirrors AiService.prepare_request + _save_request: build, dump once, hash the stored string
+    payload, _ = service._build_payload(patient, checks)
+    payload_json = to_compact_json(payload)
+    _hash_payload_json(payload_json)
+    return payload_json
+
+
+def _time(fn, *args) -> tuple[float, float]:
+    runs = timeit.repeat(lambda: fn(*args), number=1, repeat=REPEAT)
+    return min(runs) * 1000, statistics.median(runs) * 1000
+
+
+def main() -> None:
+    settings = OpenAISettings(
+        api_key="",
+        system_prompt="benchmark",
+        model="bench",
+        url="",
+        timeout=30.0,
+        response_format={"type": "json_object"},
+        token_budget=10_000_000,
+    )
+    service = AiService(None, settings)  # type: ignore[arg-type]
+    patient, checks = build_patient(), build_checks()
+
+    for name, fn in (("legacy round-trip", legacy_payload), ("single-pass", current_payload)):
+        best, median = _time(fn, service, patient, checks)
+        size_kb = len(fn(service, patient, checks)) / 1024
+        print(f"{name:<20} best={best:7.2f} ms  median={median:7.2f} ms  size={size_kb:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Throughput of many small concurrent writes, one commit each versus the group commit writer.
+
+Simulates a clinic peak: `--writes` medical check status updates issued by concurrent requests. "direct" is
+the default path, where every storage method commits (one fsync per write); "grouped" sends the same writes
+through GroupCommitWriter with the default 2 ms window.
+
+Usage:
+    uv run python -m benchmarks.bench_group_commit [--writes 2000]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_ai_payload import build_patient
+from migrate import apply_migrations
+from src.data_access.db_storage import DbStorage
+from src.data_access.group_commit import DirectWriter, GroupCommitWriter
+
+CHECKS = 50
+
+
+def build_database(db_file: Path) -> list[int]:
+    apply_migrations(str(db_file))
+    db = DbStorage(db_file)
+    patient_id = db.patients.save(build_patient()).patient_id
+    assert patient_id is not None
+    check_ids = [
+        db.medical_checks.save(
+            patient_id=patient_id,
+            check_template="blood",
+            check_date="2024-01-01",
+            status="Green",
+            medical_check_items=[],
+        )
+        for _ in range(CHECKS)
+    ]
+    db.close()
+    return check_ids
+
+
+def _update(check_id: int, n: int):
+    status = ("Red", "Amber", "Green")[n % 3]
+    return lambda db: db.medical_checks.update_status(check_id=check_id, status=status)
+
+
+async def run_writes(writer: DirectWriter | GroupCommitWriter, check_ids: list[int], writes: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(writer.run(_update(check_ids[n % len(check_ids)], n)) for n in range(writes)))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "bench.sqlite"
+        check_ids = build_database(db_file)
+
+        db = DbStorage(db_file)
+        elapsed = asyncio.run(run_writes(DirectWriter(db), check_ids, args.writes))
+        db.close()
+        print(f"{'direct':<10} {elapsed * 1000:9.2f} ms  {args.writes / elapsed:9.0f} writes/s  commits={args.writes}")
+
+        writer = GroupCommitWriter(db_file)
+        writer.start()
+        elapsed = asyncio.run(run_writes(writer, check_ids, args.writes))
+        writer.close()
+        stats = writer.stats
+        print(
+            f"{'grouped':<10} {elapsed * 1000:9.2f} ms  {args.writes / elapsed:9.0f} writes/s  commits={stats.batches}"
+            f"  mean batch={stats.mean_batch_size:.1f}  mean commit={stats.mean_commit_seconds * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Peak memory and render time of the patients list, buffered versus streamed, for 10,000 patients.
+
+"buffered" loads every patient with get_all_patients and renders or serialises the whole body at once, as
+the list used to; "streamed" reads PatientsStorage.iter_patients from an open cursor and renders with
+Template.generate, as GET /patients now does. Peak memory is traced with tracemalloc, so times include its
+overhead and are only comparable with each other.
+
+Usage:
+    uv run python -m benchmarks.bench_patient_list [--patients 10000]
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.bench_ai_payload import build_patient
+from migrate import apply_migrations
+from src.data_access.db_storage import DbStorage
+from src.models.patient import Patients
+from src.templating import templates
+
+
+def build_database(db_file: Path, patients: int) -> None:
+    apply_migrations(str(db_file))
+    db = DbStorage(db_file)
+    template = build_patient()
+    for patient_id in range(1, patients + 1):
+        db.patients.save(template.model_copy(update={"patient_id": patient_id}))
+    db.close()
+
+
+def measure(run: Callable[[], object]) -> tuple[float, float]:
+    """Peak traced memory in MiB and elapsed seconds of one run."""
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024, elapsed
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "bench.sqlite"
+        build_database(db_file, args.patients)
+        db = DbStorage(db_file)
+        page = templates.env.get_template("patients.html")
+        context = {"active_page": "patients", "request": None}
+
+        def consume(pieces) -> None:
+            for _ in pieces:
+                pass
+
+        runs = {
+            "html buffered": lambda: page.render(**context, patients=db.patients.get_all_patients()),
+            "html streamed": lambda: consume(page.generate(**context, patients=db.patients.iter_patients())),
+            "json buffered": lambda: Patients(records=db.patients.get_all_patients()).model_dump_json(),
+            "json streamed": lambda: consume(p.model_dump_json() for p in db.patients.iter_patients()),
+        }
+        for name, run in runs.items():
+            peak, elapsed = measure(run)
+            print(f"{name:<24} peak={peak:8.2f} MiB  time={elapsed * 1000:8.2f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Time to first byte and full load of the patient details page for a patient with 500 medical checks.
+
+The page is a shell whose check tiles, chart options and AI summary are fetched by HTMX once it loads.
+"full load" adds those requests to the shell, as the browser would make them; "all pages" also scrolls
+through every page of check tiles. Cold runs clear the fragment cache first, warm runs reuse it.
+
+Usage:
+    uv run python -m benchmarks.bench_patient_page [--checks 500]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_ai_payload import build_checks, build_patient
+from migrate import apply_migrations
+from src.data_access.db_storage import DbStorage
+
+REPEAT = 20
+
+_NEXT_PAGE = re.compile(r'hx-get="([^"]+/tiles\?[^"]+)"')
+
+
+def build_database(db_file: Path, checks: int) -> int:
+    apply_migrations(str(db_file))
+    db = DbStorage(db_file)
+    patient_id = db.patients.save(build_patient()).patient_id
+    assert patient_id is not None
+    for mc in build_checks(checks):
+        db.medical_checks.save(
+            patient_id=patient_id,
+            check_template=mc.template_name,
+            check_date=mc.check_date,
+            status=mc.status.value,
+            medical_check_items=mc.medical_check_items,
+            notes=mc.notes,
+            attachments=[a.model_dump() for a in mc.attachments],
+        )
+    db.close()
+    return patient_id
+
+
+def ttfb(client: TestClient, url: str) -> float:
+    started = time.perf_counter()
+    with client.stream("GET", url) as response:
+        chunks = response.iter_raw()
+        next(chunks)
+        elapsed = time.perf_counter() - started
+        for _ in chunks:
+            pass
+    return elapsed
+
+
+def full_load(client: TestClient, patient_id: int, all_pages: bool = False) -> None:
+    base = f"/patients/{patient_id}"
+    client.get(base)
+    client.get(f"{base}/medical_checks/chartable_options", headers={"HX-Request": "true"})
+    client.get(f"{base}/ai_summary")
+    url: str | None = f"{base}/medical_checks/tiles"
+    while url:
+        html = client.get(url.replace("&amp;", "&")).text
+        url = m.group(1) if all_pages and (m := _NEXT_PAGE.search(html)) else None
+
+
+def report(name: str, run: Callable[[], float | None], before: Callable[[], None]) -> None:
+    timings = []
+    for _ in range(REPEAT):
+        before()
+        started = time.perf_counter()
+        measured = run()
+        timings.append(measured if measured is not None else time.perf_counter() - started)
+    print(f"{name:<24} best={min(timings) * 1000:8.2f} ms  median={statistics.median(timings) * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "bench.sqlite"
+        patient_id = build_database(db_file, args.checks)
+        os.environ["DB_FILE"] = str(db_file)
+
+        from src.main import create_app
+
+        app = create_app()
+        with TestClient(app) as client:
+            cache = app.state.fragment_cache
+            for label, before in (("cold", cache.clear), ("warm", lambda: None)):
+                full_load(client, patient_id, all_pages=True)
+                report(f"ttfb {label}", lambda: ttfb(client, f"/patients/{patient_id}"), before)
+                report(f"full load {label}", lambda: full_load(client, patient_id), before)
+                report(f"all pages {label}", lambda: full_load(client, patient_id, all_pages=True), before)
+
+
+if __name__ == "__main__":
+    main()
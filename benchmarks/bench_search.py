@@ -0,0 +1,136 @@
+"""Full-text search over check notes, attachment text and transcripts on a generated corpus.
+
+Builds a throwaway database with `--documents` searchable documents (half check notes, a quarter
+attachments, a quarter voice transcripts; one million by default), indexed by the FTS5 triggers as they
+are inserted, then compares SearchStorage.search with the previous approach of loading every patient's
+checks through get_medical_checks and matching in Python.
+
+Usage:
+    uv run python -m benchmarks.bench_search [--documents 1000000] [--skip-baseline]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+import timeit
+from functools import partial
+from pathlib import Path
+
+from migrate import apply_migrations
+from settings import SQLITE_PROFILES
+from src.data_access.db_storage import DbStorage
+
+CHECKS_PER_PATIENT = 50
+REPEAT = 20
+PAGE_SIZE = 20
+QUERIES = ['"atrial fibrillation"', "haemoglobin", "palpitation*"]
+
+_WORDS = (  # noqa: SIM905
+    "patient reports feeling well blood pressure stable reviewed medication continue current dose follow up "
+    "in three months chest clear heart sounds normal mild oedema ankles advised weight loss exercise diet "
+    "haemoglobin cholesterol glucose within normal limits referral declined discussed options letter sent"
+).split()
+_RARE = ["atrial fibrillation", "palpitations at night", "ejection fraction reduced"]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choices(_WORDS, k=words))
+    if rng.random() < 0.002:
+        text += " " + rng.choice(_RARE)
+    return text
+
+
+def build_corpus(db_file: Path, documents: int, seed: int = 7) -> int:
+    """Insert patients and checks until `documents` searchable documents exist; returns the patient count."""
+    rng = random.Random(seed)
+    checks = documents // 2
+    patients = max(checks // CHECKS_PER_PATIENT, 1)
+
+    apply_migrations(str(db_file))
+    db = DbStorage(db_file, profile=SQLITE_PROFILES["bulk_load"])
+    conn = db._conn
+
+    template_id = conn.execute("INSERT INTO medical_check_templates (name) VALUES ('bench')").lastrowid
+    conn.executemany(
+        """
+        INSERT INTO patients (patient_id, title, first_name, last_name, sex, dob, email, phone)
+        VALUES (?, 'Mr', 'bench', 'mark', 'male', '1970-01-01', 'b@example.com', '000')
+        """,
+        [(p,) for p in range(1, patients + 1)],
+    )
+    conn.executemany(
+        """
+        INSERT INTO medical_checks (check_id, patient_id, template_id, check_date, status, notes)
+        VALUES (?, ?, ?, '2024-01-01', 'Green', ?)
+        """,
+        ((c, c % patients + 1, template_id, _text(rng, 30)) for c in range(1, checks + 1)),
+    )
+    conn.executemany(
+        """
+        INSERT INTO medical_check_attachments (check_id, filename, content_type, file_path, parsed_content)
+        VALUES (?, 'letter.txt', 'text/plain', 'letter.txt', ?)
+        """,
+        ((c, _text(rng, 200)) for c in range(1, checks + 1, 2)),
+    )
+    conn.executemany(
+        "INSERT INTO voice_recordings (check_id, file_path, full_text) VALUES (?, 'r.webm', ?)",
+        ((c, json.dumps({"text": _text(rng, 120), "segments": []})) for c in range(2, checks + 1, 2)),
+    )
+    conn.commit()
+    db.close()
+    return patients
+
+
+def python_grep(db: DbStorage, patients: int, term: str) -> list[int | None]:
+    """The approach before FTS: load every patient's checks and match text in Python."""
+    matches = []
+    for patient_id in range(1, patients + 1):
+        for mc in db.medical_checks.get_medical_checks(patient_id):
+            texts = [mc.notes or ""] + [a.parsed_content or "" for a in mc.attachments]
+            texts += [v.full_text or "" for v in mc.voice_recordings]
+            if any(term in t.lower() for t in texts):
+                matches.append(mc.check_id)
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--skip-baseline", action="store_true", help="Skip the (slow) Python grep baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "bench.sqlite"
+        started = time.perf_counter()
+        patients = build_corpus(db_file, args.documents)
+        print(
+            f"corpus: {args.documents:,} documents, {patients:,} patients, built in {time.perf_counter() - started:.1f} s"
+        )
+        print(f"database size: {db_file.stat().st_size / 2**20:,.0f} MiB")
+
+        db = DbStorage(db_file)
+        for query in QUERIES:
+            for patient_id in (None, patients // 2):
+                runs = timeit.repeat(
+                    partial(db.search.search, query, patient_id=patient_id, limit=PAGE_SIZE + 1),
+                    number=1,
+                    repeat=REPEAT,
+                )
+                scope = "one patient" if patient_id else "all patients"
+                print(
+                    f"fts {query:<24} {scope:<13} best={min(runs) * 1000:8.2f} ms  "
+                    f"median={statistics.median(runs) * 1000:8.2f} ms"
+                )
+
+        if not args.skip_baseline:
+            started = time.perf_counter()
+            found = python_grep(db, patients, "atrial fibrillation")
+            print(f"python grep over get_medical_checks: {time.perf_counter() - started:8.2f} s ({len(found)} checks)")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
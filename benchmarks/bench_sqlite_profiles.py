@@ -0,0 +1,94 @@
+"""The app's storage workload under each SQLite performance profile (SQLITE_PROFILE).
+
+For every profile, builds a fresh database and times three phases on it: saving `--patients` patients with
+`--checks` medical checks each, one commit per save as the routes do; reading every patient and their
+checks `--reads` times; and deleting the older half of the checks, followed by the maintenance the worker
+runs (PRAGMA optimize and incremental vacuum), reporting the file size it leaves behind.
+
+Usage:
+    uv run python -m benchmarks.bench_sqlite_profiles [--patients 200] [--checks 20] [--reads 5]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_ai_payload import build_patient
+from migrate import apply_migrations
+from settings import SQLITE_PROFILES, SqliteSettings
+from src.data_access.db_storage import DbStorage
+from src.models.medical_check_item import MedicalCheckItem
+
+ITEMS = [
+    MedicalCheckItem(name=name, units=units, value=str(4.5 + n))
+    for n, (name, units) in enumerate([("Glucose", "mmol/L"), ("Haemoglobin", "g/L"), ("Cholesterol", "mmol/L")])
+]
+
+
+def _file_size(db_file: Path) -> int:
+    return sum(p.stat().st_size for p in db_file.parent.glob(f"{db_file.name}*"))
+
+
+def write_phase(db: DbStorage, patients: int, checks: int) -> list[int]:
+    patient_ids = []
+    for _ in range(patients):
+        patient_id = db.patients.save(build_patient().model_copy(update={"patient_id": None})).patient_id
+        assert patient_id is not None
+        for n in range(checks):
+            db.medical_checks.save(
+                patient_id=patient_id,
+                check_template="blood",
+                check_date=f"2024-01-{n % 28 + 1:02d}",
+                status="Green",
+                medical_check_items=ITEMS,
+                notes=f"Routine review {n}. Patient reports feeling well.",
+            )
+        patient_ids.append(patient_id)
+    return patient_ids
+
+
+def read_phase(db: DbStorage, patient_ids: list[int], reads: int) -> None:
+    for _ in range(reads):
+        for patient_id in patient_ids:
+            db.patients.get_patient(patient_id)
+            db.medical_checks.get_medical_checks(patient_id)
+
+
+def maintenance_phase(db: DbStorage) -> int:
+    db.connection.execute("DELETE FROM medical_checks WHERE check_id <= (SELECT MAX(check_id) / 2 FROM medical_checks)")
+    db.commit()
+    return db.run_maintenance(vacuum_pages=SqliteSettings().incremental_vacuum_pages).vacuumed_pages
+
+
+def _timed(fn, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--checks", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'writes':>10} {'reads':>10} {'maintenance':>12} {'vacuumed':>9} {'size':>9}")
+    for name, profile in SQLITE_PROFILES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = Path(tmp) / "bench.sqlite"
+            apply_migrations(str(db_file))
+            db = DbStorage(db_file, profile=profile)
+            write_ms, patient_ids = _timed(write_phase, db, args.patients, args.checks)
+            read_ms, _ = _timed(read_phase, db, patient_ids, args.reads)
+            maintenance_ms, vacuumed = _timed(maintenance_phase, db)
+            db.close()
+            print(
+                f"{name:<10} {write_ms:7.0f} ms {read_ms:7.0f} ms {maintenance_ms:9.0f} ms {vacuumed:9d}"
+                f" {_file_size(db_file) / 1024:6.0f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Import time of the application, as paid by every uvicorn worker and test process on start.
+
+Imports `src.main` in fresh interpreters under `python -X importtime` and reports the cumulative time with
+the slowest modules. openai, pypdf, uvicorn and the optional PostgreSQL and S3 clients are loaded on first
+use, so none of them may appear here; tests/test_startup.py checks that on every run of the suite, and
+STARTUP_BUDGET_MS under the import_budget marker, which CI runs as a step of its own. Exits with status 1
+when the best run is over budget or a lazy module was imported.
+
+Usage:
+    uv run python -m benchmarks.bench_startup [--repeat 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+APP_MODULE = "src.main"
+# Generous enough for a slow CI machine; loading openai eagerly alone costs about this much again
+STARTUP_BUDGET_MS = 1000
+# Must only be imported once they are needed
+LAZY_MODULES = ("openai", "pypdf", "uvicorn", "psycopg", "psycopg_pool", "httpx")
+
+
+def import_profile(module: str = APP_MODULE) -> dict[str, tuple[int, int]]:
+    """Self and cumulative import time in microseconds of every module loaded by importing `module`."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DB_FILE": str(Path(tmp) / "startup.sqlite")}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        profile[name.strip()] = (int(own), int(cumulative))
+    return profile
+
+
+def startup_ms(profile: dict[str, tuple[int, int]], module: str = APP_MODULE) -> float:
+    return profile[module][1] / 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.repeat)]
+    timings = [startup_ms(p) for p in profiles]
+    best = min(profiles, key=startup_ms)
+
+    print(f"import {APP_MODULE:<18} best={min(timings):8.2f} ms  median={statistics.median(timings):8.2f} ms")
+    verdict = "ok" if min(timings) <= STARTUP_BUDGET_MS else "OVER"
+    print(f"budget                    {STARTUP_BUDGET_MS:8d} ms  {verdict}")
+    eager = [m for m in LAZY_MODULES if m in best]
+    print(f"lazy modules imported     {', '.join(eager) or 'none'}")
+    print(f"\nslowest {args.top} modules by own time:")
+    for name, (own, cumulative) in sorted(best.items(), key=lambda item: -item[1][0])[: args.top]:
+        print(f"  {name:<48} self={own / 1000:8.2f} ms  cumulative={cumulative / 1000:8.2f} ms")
+    return 0 if verdict == "ok" and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
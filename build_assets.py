@@ -0,0 +1,122 @@
+"""Vendor, fingerprint and precompress the static assets under src/static.
+
+1. Downloads every VENDORED_ASSETS entry missing from src/static (skipped with --offline).
+2. Copies each static file to src/static/dist/ under a content-hashed name, rewriting relative url()
+   references in CSS to the hashed names, and writes .gz (and .br when the optional `brotli` package is
+   installed) next to every compressible file.
+3. Writes src/static/dist/manifest.json, which asset_url() uses to resolve logical paths.
+
+Usage:
+    uv run python build_assets.py [--offline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import posixpath
+import re
+import shutil
+import urllib.request
+from logging import getLogger
+from pathlib import Path
+
+from src.static_assets import DIST_DIR, MANIFEST_NAME, STATIC_DIR, VENDORED_ASSETS
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone still covers every browser
+    brotli = None
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+# Already compressed formats gain nothing from another pass
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".map", ".html"}
+# Skip tiny files: the compressed copy would barely be smaller
+MIN_COMPRESS_BYTES = 256
+_CSS_URL = re.compile(r"""url\((['"]?)([^)'"]+)\1\)""")
+
+
+def vendor_assets(static_dir: Path = STATIC_DIR) -> None:
+    for logical, url in VENDORED_ASSETS.items():
+        target = static_dir / logical
+        if target.is_file():
+            continue
+        logger.info(f"downloading {url}")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            target.write_bytes(response.read())
+
+
+def _hashed_name(logical: str, content: bytes) -> str:
+    path = Path(logical)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}").as_posix()
+
+
+def _rewrite_css_urls(logical: str, css: str, manifest: dict[str, str]) -> str:
+    """Point relative url() references at the fingerprinted files, e.g. fonts/x.woff2?v -> fonts/x.<hash>.woff2."""
+    base = posixpath.dirname(logical)
+
+    def replace(match: re.Match[str]) -> str:
+        quote, ref = match.groups()
+        if ref.startswith(("data:", "http:", "https:", "/", "#")):
+            return match.group(0)
+        target, fragment = ref.split("#", 1) if "#" in ref else (ref, "")
+        target = posixpath.normpath(posixpath.join(base, target.split("?", 1)[0]))
+        if target not in manifest:
+            return match.group(0)
+        new_ref = posixpath.relpath(manifest[target], base or ".") + (f"#{fragment}" if fragment else "")
+        return f"url({quote}{new_ref}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _write_compressed(path: Path, content: bytes) -> None:
+    if path.suffix not in COMPRESSIBLE or len(content) < MIN_COMPRESS_BYTES:
+        return
+    path.with_name(path.name + ".gz").write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(content, quality=11))
+
+
+def build(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    """Rebuild static_dir/dist from scratch and return the manifest written there."""
+    dist = static_dir / DIST_DIR
+    shutil.rmtree(dist, ignore_errors=True)
+    dist.mkdir(parents=True)
+
+    sources = sorted(p for p in static_dir.rglob("*") if p.is_file() and dist not in p.parents)
+    # CSS last, so the files it references already have their hashed names
+    sources.sort(key=lambda p: p.suffix == ".css")
+
+    manifest: dict[str, str] = {}
+    for source in sources:
+        logical = source.relative_to(static_dir).as_posix()
+        content = source.read_bytes()
+        if source.suffix == ".css":
+            content = _rewrite_css_urls(logical, content.decode("utf-8"), manifest).encode("utf-8")
+        manifest[logical] = _hashed_name(logical, content)
+        target = dist / manifest[logical]
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        _write_compressed(target, content)
+
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    logger.info(f"built {len(manifest)} assets into {dist}")
+    return manifest
+
+
+if __name__ == "__main__":
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offline", action="store_true", help="Do not download missing vendored assets")
+    args = parser.parse_args()
+    if not args.offline:
+        vendor_assets()
+    build()
@@ -651,7 +651,7 @@ def _seed_medical_check_template_blood(storage: DbStorage) -> None:
 
 
 if __name__ == "__main__":
-    storage = DbStorage(Settings().db_file)
+    storage = DbStorage(Settings().database)
 
     _seed_medical_check_templates(storage)
     _seed_medical_check_template_blood(storage)
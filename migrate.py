@@ -1,25 +1,30 @@
 from __future__ import annotations
 
+import argparse
 import importlib.util
 import logging
 import re
-import sqlite3
 import sys
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 from pathlib import Path
 
+from settings import Settings
+from src.data_access.backends import Connection, close_pools, connect, dialect_of
 from src.db_migrations.utils import with_logging
+from src.tenancy import all_practices, practice_for
 
 logger = getLogger(__name__)
 logger.setLevel("INFO")
 
 
 @with_logging
-def set_version(conn: sqlite3.Connection, v: str) -> None:
+def set_version(conn: Connection, v: str) -> None:
     conn.execute("UPDATE schema_version SET version = ?", (v,))
 
 
-def _ensure_schema_version(conn: sqlite3.Connection) -> None:
+def _ensure_schema_version(conn: Connection) -> None:
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS schema_version(
@@ -32,12 +37,15 @@ def _ensure_schema_version(conn: sqlite3.Connection) -> None:
         conn.execute("INSERT INTO schema_version(version) VALUES ('0000')")
 
 
-def _get_current_version(conn: sqlite3.Connection) -> str:
+def _get_current_version(conn: Connection) -> str:
     return conn.execute("SELECT version FROM schema_version").fetchone()[0]
 
 
-def _get_migration_files() -> list[Path]:
+def _get_migration_files(dialect: str = "sqlite") -> list[Path]:
+    # PostgreSQL databases start from a baseline of the schema the SQLite migrations had built by then
     db_migrations = Path(__file__).parent / "src" / "db_migrations"
+    if dialect == "postgresql":
+        db_migrations /= "postgresql"
 
     return sorted(
         [f for f in db_migrations.iterdir() if re.match(r"^\d{4}_.+\.py$", f.name)],
@@ -62,14 +70,19 @@ def apply_migrations(db_path: str | Path, target_version: str | None = None) ->
       We set schema_version to the module stem after each successful call.
     - If current > target -> downgrade by calling each migration's downgrade(conn)
       in reverse order, and we set schema_version to the previous stem (or '0000').
+
+    `db_path` is a SQLite file or a postgresql:// URL, migrated with src/db_migrations/postgresql.
     """
-    conn = sqlite3.connect(str(db_path))
+    conn = connect(db_path)
+    dialect = dialect_of(conn).name
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
+        if dialect == "sqlite":
+            conn.execute("PRAGMA foreign_keys = ON;")
         _ensure_schema_version(conn)
+        conn.commit()
         current = _get_current_version(conn)
 
-        files = _get_migration_files()
+        files = _get_migration_files(dialect)
         versions = [p.stem for p in files]
         stem_to_path = {p.stem: p for p in files}
 
@@ -107,9 +120,51 @@ def apply_migrations(db_path: str | Path, target_version: str | None = None) ->
         conn.close()
 
 
-if __name__ == "__main__":
+def apply_migrations_to_all(
+    db_paths: Iterable[str | Path], target_version: str | None = None, *, max_workers: int = 4
+) -> dict[str | Path, BaseException]:
+    """Apply migrations to every database in `db_paths` in parallel; returns the ones that failed.
+
+    Each database is migrated in its own thread with its own connection, so one practice's long
+    migration does not hold back the others, and a failure in one leaves the rest migrated.
+    """
+    db_paths = list(db_paths)
+    failures: dict[str | Path, BaseException] = {}
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="migrate") as pool:
+        futures = {path: pool.submit(apply_migrations, path, target_version) for path in db_paths}
+        for path, future in futures.items():
+            if error := future.exception():
+                logger.error(f"Migrating {path} failed: {error!r}")
+                failures[path] = error
+    return failures
+
+
+def main() -> int:
     if not logging.getLogger().handlers:
         logging.basicConfig(level=logging.INFO)
-    db = Path(__file__).parent / "database.sqlite"
-    target = sys.argv[1] if len(sys.argv) > 1 else None
-    apply_migrations(db, target_version=target)
+    parser = argparse.ArgumentParser(description="Apply database migrations (to the latest, or to TARGET).")
+    parser.add_argument("target", nargs="?", help="Migration to upgrade or downgrade to, e.g. 0013_jobs or 0000")
+    shards = parser.add_mutually_exclusive_group()
+    shards.add_argument("--all-practices", action="store_true", help="Migrate every practice under PRACTICES_DIR")
+    shards.add_argument("--practice", help="Migrate one practice, creating its database if it is new")
+    parser.add_argument("--jobs", type=int, default=4, help="Practices migrated at the same time (default: 4)")
+    args = parser.parse_args()
+
+    settings = Settings()
+    if args.practice:
+        practice = practice_for(settings, args.practice)
+        practice.files_root.mkdir(parents=True, exist_ok=True)
+        db_paths = [practice.db_file]
+    elif args.all_practices:
+        db_paths = [practice.db_file for practice in all_practices(settings)]
+    else:
+        db_paths = [settings.database]
+
+    failures = apply_migrations_to_all(db_paths, args.target, max_workers=args.jobs)
+    close_pools()
+    logger.info(f"Migrated {len(db_paths) - len(failures)} of {len(db_paths)} databases")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import os
+from functools import cache
 from pathlib import Path
+from typing import Literal
 
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 load_dotenv()
 
+SYSTEM_PROMPT_FILE = Path(__file__).parent.absolute() / "system_prompt.txt"
+
 
 class OpenAISettings(BaseModel):
     api_key: str
@@ -15,15 +19,318 @@ class OpenAISettings(BaseModel):
     url: str
     timeout: float
     response_format: dict
+    token_budget: int = 12000
+    attachment_token_limit: int = 2000
+    batch_concurrency: int = 4
 
 
-class Settings(BaseSettings):
-    db_file: Path = Path(__file__).parent.absolute() / "database.sqlite"
-    openai: OpenAISettings = OpenAISettings(
+class CompressionSettings(BaseModel):
+    enabled: bool = True
+    # Smaller bodies fit in a packet or two anyway; compressing them only costs CPU
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    # Media such as PDFs, images and webm recordings is already compressed and is not in this list
+    content_types: tuple[str, ...] = (
+        "text/html",
+        "text/plain",
+        "text/css",
+        "text/javascript",
+        "application/javascript",
+        "application/json",
+        "application/x-ndjson",
+        "image/svg+xml",
+    )
+
+
+class JobSettings(BaseModel):
+    # Jobs run at the same time by one worker process
+    concurrency: int = 2
+    # Seconds between polls of the jobs table while it is empty
+    poll_interval: float = 1.0
+    # A job whose worker has not sent a heartbeat for this many seconds is handed to another worker
+    lease_seconds: float = 60.0
+    max_attempts: int = 5
+    # Retries wait backoff_base_seconds * 2 ** (attempt - 1), capped at backoff_max_seconds
+    backoff_base_seconds: float = 5.0
+    backoff_max_seconds: float = 600.0
+
+
+class GroupCommitSettings(BaseModel):
+    # Off by default: one commit per write is simplest and fast enough outside busy periods
+    enabled: bool = False
+    # How long the writer waits for more writes to join a batch, in milliseconds
+    window_ms: float = 2.0
+    max_batch: int = 64
+
+
+class SqliteProfile(BaseModel):
+    """PRAGMAs applied to every connection DbStorage opens."""
+
+    journal_mode: Literal["DELETE", "TRUNCATE", "WAL", "MEMORY"]
+    synchronous: Literal["OFF", "NORMAL", "FULL"]
+    # Negative values are KiB, positive values pages, as in PRAGMA cache_size
+    cache_size: int
+    # Bytes of the database file read through mmap; 0 disables it
+    mmap_size: int
+    temp_store: Literal["DEFAULT", "FILE", "MEMORY"]
+    busy_timeout_ms: int
+
+
+SQLITE_PROFILES: dict[str, SqliteProfile] = {
+    # SQLite's own defaults, as the app ran before profiles existed
+    "legacy": SqliteProfile(
+        journal_mode="DELETE",
+        synchronous="FULL",
+        cache_size=-2000,
+        mmap_size=0,
+        temp_store="DEFAULT",
+        busy_timeout_ms=5000,
+    ),
+    # WAL lets the web app read while the worker writes; with NORMAL a power cut may lose the last commits,
+    # but never corrupts the database
+    "balanced": SqliteProfile(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-65536,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout_ms=5000,
+    ),
+    # As balanced, but every commit is synced to disk
+    "durable": SqliteProfile(
+        journal_mode="WAL",
+        synchronous="FULL",
+        cache_size=-65536,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout_ms=5000,
+    ),
+    # For seeding and benchmarks only: a crash mid-write can corrupt the database
+    "bulk_load": SqliteProfile(
+        journal_mode="MEMORY",
+        synchronous="OFF",
+        cache_size=-262144,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+        busy_timeout_ms=5000,
+    ),
+}
+
+
+class SqliteSettings(BaseModel):
+    # Clinical records: durable by default, so a power cut never loses a commit the app has confirmed.
+    # Deployments on hardware they trust may opt into balanced for faster writes
+    profile: Literal["legacy", "balanced", "durable", "bulk_load"] = "durable"
+    # The worker refreshes query planner statistics and returns free pages to the OS this often
+    maintenance_interval_seconds: float = 6 * 3600
+    # Upper bound on the free pages one maintenance run gives back, so it never holds the write lock for long
+    incremental_vacuum_pages: int = 2000
+
+    @property
+    def pragmas(self) -> SqliteProfile:
+        return SQLITE_PROFILES[self.profile]
+
+
+class BackupSettings(BaseModel):
+    dir: Path = Path(__file__).parent.absolute() / "backups"
+    # The database is copied this many pages at a time, sleeping step_sleep_ms in between so the app keeps up
+    pages_per_step: int = 1024
+    step_sleep_ms: float = 5.0
+    # Older backups are pruned, along with the attachment and recording copies only they referenced
+    keep: int = 7
+
+
+class ArchiveSettings(BaseModel):
+    # The cold archive database; by default next to the live one, e.g. database.archive.sqlite. Ignored with
+    # TENANCY_ENABLED, where each practice's archive sits next to its own database
+    file: Path | None = None
+    # Patients whose latest check is older than this are moved to the archive
+    inactive_months: int = 60
+    # AI requests older than this are moved to the archive, except each patient's latest
+    ai_request_months: int = 24
+    # Patients or AI requests moved per transaction, so the archiver never holds the write lock for long
+    batch_size: int = 200
+
+    def path_for(self, db_file: Path, *, sharded: bool = False) -> Path:
+        if self.file and not sharded:
+            return self.file
+        return db_file.with_name(f"{db_file.stem}.archive{db_file.suffix}")
+
+
+class TenancySettings(BaseModel):
+    # Off: a single practice, stored in db_file with its files under the working directory
+    enabled: bool = False
+    # One directory per practice, named by its id, holding database.sqlite, attachments/ and voice_recordings/
+    practices_dir: Path = Path(__file__).parent.absolute() / "practices"
+    # Practices whose database stays open between requests; the least recently used one is closed beyond that
+    max_open_shards: int = 32
+    # Requests of one practice handled at the same time; more wait their turn, so a busy practice cannot
+    # crowd out the others
+    max_concurrent_requests: int = 16
+    # Requests are routed by the first label of their host name. Only behind a proxy that sets X-Practice-Id
+    # itself, and strips it from what clients send, may the header pick the practice instead
+    trust_practice_header: bool = False
+
+
+class BlobStoreSettings(BaseModel):
+    # Where attachments and voice recordings go: "local" directories next to the database, or an S3-compatible
+    # bucket shared by every app node
+    backend: Literal["local", "s3"] = "local"
+    # e.g. http://minio:9000; AWS S3 in s3_region when unset
+    s3_endpoint: str | None = None
+    s3_bucket: str = ""
+    s3_region: str = "us-east-1"
+    s3_access_key_id: str = ""
+    s3_secret_access_key: str = ""
+    # Uploads larger than this are sent in parts of this many bytes, so no upload is held in memory whole
+    part_size: int = 8 * 2**20
+    # Downloads from S3 redirect to a presigned URL valid this long; 0 streams them through the app instead
+    presign_seconds: int = 300
+
+
+class PostgresSettings(BaseModel):
+    # Connections each process keeps open to DATABASE_URL, and the most it opens under load
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+
+
+@cache
+def _read_system_prompt() -> str:
+    return SYSTEM_PROMPT_FILE.read_text()
+
+
+def _compression_from_env() -> CompressionSettings:
+    return CompressionSettings(
+        enabled=os.getenv("COMPRESSION_ENABLED", "true").lower() == "true",
+        minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+    )
+
+
+def _openai_from_env() -> OpenAISettings:
+    return OpenAISettings(
         api_key=os.getenv("OPENAI_API_KEY", ""),
-        system_prompt=Path("system_prompt.txt").read_text(),
+        system_prompt=_read_system_prompt(),
         model=os.getenv("OPENAI_MODEL", ""),
         url=os.getenv("OPENAI_URL", ""),
         timeout=float(os.getenv("OPENAI_TIMEOUT", "30.0")),
         response_format={"type": "json_object"},
+        token_budget=int(os.getenv("OPENAI_TOKEN_BUDGET", "12000")),
+        attachment_token_limit=int(os.getenv("OPENAI_ATTACHMENT_TOKEN_LIMIT", "2000")),
+        batch_concurrency=int(os.getenv("OPENAI_BATCH_CONCURRENCY", "4")),
+    )
+
+
+def _jobs_from_env() -> JobSettings:
+    return JobSettings(
+        concurrency=int(os.getenv("JOBS_CONCURRENCY", "2")),
+        poll_interval=float(os.getenv("JOBS_POLL_INTERVAL", "1.0")),
+        lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", "60")),
+        max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "5")),
+        backoff_base_seconds=float(os.getenv("JOBS_BACKOFF_BASE_SECONDS", "5")),
+        backoff_max_seconds=float(os.getenv("JOBS_BACKOFF_MAX_SECONDS", "600")),
+    )
+
+
+def _group_commit_from_env() -> GroupCommitSettings:
+    return GroupCommitSettings(
+        enabled=os.getenv("GROUP_COMMIT_ENABLED", "false").lower() == "true",
+        window_ms=float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2.0")),
+        max_batch=int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64")),
     )
+
+
+def _sqlite_from_env() -> SqliteSettings:
+    # Parsed by pydantic, which checks SQLITE_PROFILE against the profile names
+    return SqliteSettings.model_validate(
+        {
+            "profile": os.getenv("SQLITE_PROFILE", "durable"),
+            "maintenance_interval_seconds": float(os.getenv("SQLITE_MAINTENANCE_INTERVAL_SECONDS", str(6 * 3600))),
+            "incremental_vacuum_pages": int(os.getenv("SQLITE_INCREMENTAL_VACUUM_PAGES", "2000")),
+        }
+    )
+
+
+def _backup_from_env() -> BackupSettings:
+    defaults = BackupSettings()
+    return BackupSettings(
+        dir=Path(os.getenv("BACKUP_DIR", str(defaults.dir))),
+        pages_per_step=int(os.getenv("BACKUP_PAGES_PER_STEP", "1024")),
+        step_sleep_ms=float(os.getenv("BACKUP_STEP_SLEEP_MS", "5.0")),
+        keep=int(os.getenv("BACKUP_KEEP", "7")),
+    )
+
+
+def _archive_from_env() -> ArchiveSettings:
+    return ArchiveSettings(
+        file=Path(archive_file) if (archive_file := os.getenv("ARCHIVE_FILE")) else None,
+        inactive_months=int(os.getenv("ARCHIVE_INACTIVE_MONTHS", "60")),
+        ai_request_months=int(os.getenv("ARCHIVE_AI_REQUEST_MONTHS", "24")),
+        batch_size=int(os.getenv("ARCHIVE_BATCH_SIZE", "200")),
+    )
+
+
+def _tenancy_from_env() -> TenancySettings:
+    defaults = TenancySettings()
+    return TenancySettings(
+        enabled=os.getenv("TENANCY_ENABLED", "false").lower() == "true",
+        practices_dir=Path(os.getenv("PRACTICES_DIR", str(defaults.practices_dir))),
+        max_open_shards=int(os.getenv("TENANCY_MAX_OPEN_SHARDS", "32")),
+        max_concurrent_requests=int(os.getenv("TENANCY_MAX_CONCURRENT_REQUESTS", "16")),
+        trust_practice_header=os.getenv("TENANCY_TRUST_PRACTICE_HEADER", "false").lower() == "true",
+    )
+
+
+def _blob_store_from_env() -> BlobStoreSettings:
+    # Parsed by pydantic, which checks BLOB_STORE_BACKEND against the backend names. Not BLOB_STORE, which
+    # pydantic-settings reads as JSON for the blob_store field itself
+    return BlobStoreSettings.model_validate(
+        {
+            "backend": os.getenv("BLOB_STORE_BACKEND", "local"),
+            "s3_endpoint": os.getenv("S3_ENDPOINT") or None,
+            "s3_bucket": os.getenv("S3_BUCKET", ""),
+            "s3_region": os.getenv("S3_REGION", "us-east-1"),
+            "s3_access_key_id": os.getenv("S3_ACCESS_KEY_ID", ""),
+            "s3_secret_access_key": os.getenv("S3_SECRET_ACCESS_KEY", ""),
+            "part_size": int(os.getenv("BLOB_PART_SIZE", str(8 * 2**20))),
+            "presign_seconds": int(os.getenv("BLOB_PRESIGN_SECONDS", "300")),
+        }
+    )
+
+
+def _postgres_from_env() -> PostgresSettings:
+    return PostgresSettings(
+        pool_min_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1")),
+        pool_max_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+    )
+
+
+class Settings(BaseSettings):
+    db_file: Path = Path(__file__).parent.absolute() / "database.sqlite"
+    # A postgresql:// URL to keep the data in PostgreSQL instead of db_file, so several app nodes can share it
+    database_url: str | None = None
+    # Upper bound on the rendered HTML kept by the patient page fragment cache, in characters
+    fragment_cache_max_chars: int = 4_000_000
+    # Re-check template files for changes on every render; for development only
+    template_auto_reload: bool = False
+    # Compiled templates are kept here between restarts; None disables the cache
+    template_bytecode_cache_dir: Path | None = Path(__file__).parent.absolute() / ".cache" / "jinja"
+    # Built when Settings() is created rather than when this module is imported, so importing the app stays cheap
+    # and environment variables set after import are honoured
+    compression: CompressionSettings = Field(default_factory=_compression_from_env)
+    openai: OpenAISettings = Field(default_factory=_openai_from_env)
+    jobs: JobSettings = Field(default_factory=_jobs_from_env)
+    group_commit: GroupCommitSettings = Field(default_factory=_group_commit_from_env)
+    sqlite: SqliteSettings = Field(default_factory=_sqlite_from_env)
+    backup: BackupSettings = Field(default_factory=_backup_from_env)
+    archive: ArchiveSettings = Field(default_factory=_archive_from_env)
+    tenancy: TenancySettings = Field(default_factory=_tenancy_from_env)
+    postgres: PostgresSettings = Field(default_factory=_postgres_from_env)
+    blob_store: BlobStoreSettings = Field(default_factory=_blob_store_from_env)
+
+    @property
+    def database(self) -> Path | str:
+        """What DbStorage and the migrations open: the DATABASE_URL if set, else the SQLite db_file."""
+        return self.database_url or self.db_file
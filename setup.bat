@@ -16,5 +16,10 @@ uv run python .\migrate.py
 
 echo.
 
+echo Vendoring and fingerprinting static assets...
+uv run python .\build_assets.py
+
+echo.
+
 echo.
 echo Setup complete! Run: uv run uvicorn main:app --reload
\ No newline at end of file
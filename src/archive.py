@@ -0,0 +1,53 @@
+"""Move inactive patients and old AI requests from the live database into the cold archive.
+
+Run from the project root, e.g. weekly from cron; the app can keep running:
+
+    uv run python -m src.archive [--inactive-months 60] [--ai-request-months 24] [--practice ID]
+
+Archived rows live in ARCHIVE_FILE (database.archive.sqlite by default), which every connection attaches.
+They are left out of the app's queries unless a storage method is called with include_archived=True.
+"""
+
+import argparse
+import logging
+
+from settings import Settings
+from src.data_access.archive import attach_archive
+from src.data_access.backends import is_postgres
+from src.data_access.db_storage import DbStorage
+from src.tenancy import resolve_practice
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inactive-months", type=int, help="default: ARCHIVE_INACTIVE_MONTHS")
+    parser.add_argument("--ai-request-months", type=int, help="default: ARCHIVE_AI_REQUEST_MONTHS")
+    parser.add_argument("--practice", help="The practice to work on; required when TENANCY_ENABLED is set")
+    args = parser.parse_args()
+
+    settings = Settings()
+    archive = settings.archive
+    practice = resolve_practice(settings, args.practice)
+    if is_postgres(practice.db_file):
+        parser.error("The cold archive is a SQLite file; it is not available with a postgresql:// DATABASE_URL")
+    db = DbStorage(practice.db_file)
+    # Only left unset for PostgreSQL, which was turned away above
+    assert db.archive_file is not None
+    try:
+        attach_archive(db.connection, db.archive_file, create=True)
+        patients = db.archive.archive_inactive_patients(
+            inactive_months=args.inactive_months or archive.inactive_months, batch_size=archive.batch_size
+        )
+        requests = db.archive.archive_ai_requests(
+            older_than_months=args.ai_request_months or archive.ai_request_months, batch_size=archive.batch_size
+        )
+    finally:
+        db.close()
+    logger.info(f"Archived {patients} patients and {requests} AI requests to {db.archive_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Online backup of the database, attachments and voice recordings, without pausing the app.
+
+Run from the project root, e.g. nightly from cron:
+
+    uv run python -m src.backup [--keep 7] [--practice ID]
+
+Each backup is a directory under BACKUP_DIR holding a consistent snapshot of the database (and of the cold
+archive, if there is one) and a manifest of the attachment and recording files; only files added or
+changed since the previous backup are copied. With TENANCY_ENABLED each practice is backed up on its own,
+under BACKUP_DIR/<practice id>.
+Snapshots are plain SQLite files and double as read-only reporting databases:
+DbStorage(BackupStore(dir).latest_snapshot(), read_only=True).
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+from settings import Settings
+from src.data_access.backends import is_postgres
+from src.services.backup import FILE_ROOTS, BackupStore
+from src.tenancy import resolve_practice
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", type=int, help="Backups to keep (default: BACKUP_KEEP)")
+    parser.add_argument("--practice", help="The practice to work on; required when TENANCY_ENABLED is set")
+    args = parser.parse_args()
+
+    settings = Settings()
+    practice = resolve_practice(settings, args.practice)
+    if is_postgres(practice.db_file):
+        parser.error("Back up a postgresql:// DATABASE_URL with pg_dump or the server's own backups")
+    db_file = Path(practice.db_file)
+    backup_dir = settings.backup.dir / practice.practice_id if practice.practice_id else settings.backup.dir
+    store = BackupStore(backup_dir)
+    if settings.blob_store.backend != "local":
+        # Bucket versioning and replication keep attachments and recordings safe; only the database is copied
+        logger.info("Attachments and recordings are in the blob store bucket, backing up the database only")
+    store.create(
+        db_file,
+        archive_file=settings.archive.path_for(db_file, sharded=settings.tenancy.enabled),
+        base_dir=practice.files_root,
+        roots=FILE_ROOTS if settings.blob_store.backend == "local" else (),
+        pages_per_step=settings.backup.pages_per_step,
+        step_sleep_seconds=settings.backup.step_sleep_ms / 1000,
+    )
+    for backup in store.prune(args.keep or settings.backup.keep):
+        logger.info(f"Pruned backup {backup.name}")
+
+
+if __name__ == "__main__":
+    main()
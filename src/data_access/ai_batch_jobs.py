@@ -0,0 +1,113 @@
+from src.data_access.backends import Connection
+from src.data_access.base import BaseStorage
+from src.models.ai_batch_job import AiBatchJob
+from src.models.enums import AiBatchItemStatus, AiBatchJobStatus
+
+
+class AiBatchJobsStorage(BaseStorage):
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+
+    def create_job(self, patient_ids: list[int]) -> int:
+        cur = self.conn.execute(
+            "INSERT INTO ai_batch_jobs (status) VALUES (?) RETURNING job_id", [AiBatchJobStatus.PENDING.value]
+        )
+        job_id = int(cur.fetchone()[0])
+        self.conn.executemany(
+            """
+            INSERT INTO ai_batch_job_items (job_id, patient_id, position)
+            VALUES (?, ?, ?)
+            ON CONFLICT DO NOTHING
+            """,
+            [(job_id, patient_id, position) for position, patient_id in enumerate(patient_ids)],
+        )
+        self.conn.commit()
+        return job_id
+
+    def get_job(self, job_id: int) -> AiBatchJob | None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT j.job_id,
+                       j.status,
+                       j.created_at,
+                       j.started_at,
+                       j.finished_at,
+                       COUNT(i.patient_id)                                AS total,
+                       COUNT(i.patient_id) FILTER (WHERE i.status = 'pending') AS pending,
+                       COUNT(i.patient_id) FILTER (WHERE i.status = 'done')    AS done,
+                       COUNT(i.patient_id) FILTER (WHERE i.status = 'skipped') AS skipped,
+                       COUNT(i.patient_id) FILTER (WHERE i.status = 'failed')  AS failed,
+                       COUNT(i.patient_id) FILTER (WHERE i.status != 'pending' AND i.updated_at >= j.started_at)
+                                                                               AS processed_in_run,
+                       {self.dialect.seconds_since.format("j.started_at")}     AS elapsed_seconds
+                FROM ai_batch_jobs j
+                LEFT JOIN ai_batch_job_items i ON i.job_id = j.job_id
+                WHERE j.job_id = ?
+                GROUP BY j.job_id
+                """,
+                [job_id],
+            )
+            row = self._fetch_one_dict(cur)
+        finally:
+            cur.close()
+
+        if not row:
+            return None
+
+        processed_in_run = row.pop("processed_in_run")
+        elapsed_seconds = row.pop("elapsed_seconds")
+        if row["status"] == AiBatchJobStatus.RUNNING and processed_in_run and elapsed_seconds is not None:
+            row["eta_seconds"] = round(elapsed_seconds / processed_in_run * row["pending"], 1)
+        return AiBatchJob(**row)
+
+    def get_patient_ids(self, job_id: int, status: AiBatchItemStatus) -> list[int]:
+        cur = self.conn.execute(
+            """
+            SELECT patient_id
+            FROM ai_batch_job_items
+            WHERE job_id = ?
+              AND status = ?
+            ORDER BY position
+            """,
+            [job_id, status.value],
+        )
+        return [int(r[0]) for r in cur.fetchall()]
+
+    def reset_failed(self, job_id: int) -> None:
+        self.conn.execute(
+            "UPDATE ai_batch_job_items SET status = ?, error = NULL WHERE job_id = ? AND status = ?",
+            [AiBatchItemStatus.PENDING.value, job_id, AiBatchItemStatus.FAILED.value],
+        )
+        self.conn.commit()
+
+    def start_job(self, job_id: int) -> None:
+        self.conn.execute(
+            """
+            UPDATE ai_batch_jobs
+            SET status = ?, started_at = CURRENT_TIMESTAMP, finished_at = NULL
+            WHERE job_id = ?
+            """,
+            [AiBatchJobStatus.RUNNING.value, job_id],
+        )
+        self.conn.commit()
+
+    def finish_job(self, job_id: int) -> None:
+        self.conn.execute(
+            "UPDATE ai_batch_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+            [AiBatchJobStatus.COMPLETED.value, job_id],
+        )
+        self.conn.commit()
+
+    def update_item(self, *, job_id: int, patient_id: int, status: AiBatchItemStatus, error: str | None = None) -> None:
+        self.conn.execute(
+            """
+            UPDATE ai_batch_job_items
+            SET status = ?, error = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ?
+              AND patient_id = ?
+            """,
+            [status.value, error, job_id, patient_id],
+        )
+        self.conn.commit()
@@ -1,20 +1,21 @@
-import sqlite3
-
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.ai_request import AiRequest
 
 
 class AiRequestsStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         super().__init__(conn)
 
     def save(self, request: AiRequest) -> AiRequest:
         cur = self.conn.execute(
             """
             INSERT INTO ai_requests (
-                patient_id, model_name, model_url, system_prompt_text, request_payload_json
+                patient_id, model_name, model_url, system_prompt_text, request_payload_json, token_counts_json,
+                payload_hash
             )
-            VALUES (?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            RETURNING id
             """,
             [
                 request.patient_id,
@@ -22,28 +23,62 @@ class AiRequestsStorage(BaseStorage):
                 request.model_url,
                 request.system_prompt_text,
                 request.request_payload_json,
+                request.token_counts_json,
+                request.payload_hash,
             ],
         )
 
-        if request.id is None and cur.lastrowid is not None:
-            request.id = int(cur.lastrowid)
+        (request_id,) = cur.fetchone()
+        if request.id is None:
+            request.id = int(request_id)
 
         # Reload to get created_at if needed, but for now we just return the object
         self.conn.commit()
         return request
 
-    def get_by_patient(self, patient_id: int) -> list[AiRequest]:
+    def get_by_patient(self, patient_id: int, *, include_archived: bool = False) -> list[AiRequest]:
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
-                SELECT id, patient_id, model_name, model_url, system_prompt_text, request_payload_json, created_at
-                FROM ai_requests
+                f"""
+                SELECT id, patient_id, model_name, model_url, system_prompt_text, request_payload_json,
+                       token_counts_json, payload_hash, created_at
+                FROM {self._table("ai_requests", include_archived)}
                 WHERE patient_id = ?
-                ORDER BY created_at DESC
+                ORDER BY created_at DESC, id DESC
                 """,
                 [patient_id],
             )
             return [AiRequest(**r) for r in self._fetch_all_dicts(cur)]
         finally:
             cur.close()
+
+    def get_latest_id(self, patient_id: int) -> int | None:
+        """Id of the patient's most recent request, without loading its payload."""
+        row = self.conn.execute(
+            """
+            SELECT id
+            FROM ai_requests
+            WHERE patient_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+            """,
+            [patient_id],
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def get_latest_answered_hash(self, patient_id: int) -> str | None:
+        """Payload hash of the patient's most recent request that received a response."""
+        cur = self.conn.execute(
+            """
+            SELECT r.payload_hash
+            FROM ai_requests r
+            WHERE r.patient_id = ?
+              AND EXISTS (SELECT 1 FROM ai_responses s WHERE s.request_id = r.id)
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT 1
+            """,
+            [patient_id],
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
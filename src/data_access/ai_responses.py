@@ -1,11 +1,13 @@
-import sqlite3
+import json
 
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.ai_response import AiResponse
+from src.models.ai_summary import AiSummary
 
 
 class AiResponsesStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         super().__init__(conn)
 
     def save(self, response: AiResponse) -> AiResponse:
@@ -15,6 +17,7 @@ class AiResponsesStorage(BaseStorage):
                 request_id, response_json
             )
             VALUES (?, ?)
+            RETURNING id
             """,
             [
                 response.request_id,
@@ -22,19 +25,61 @@ class AiResponsesStorage(BaseStorage):
             ],
         )
 
-        if response.id is None and cur.lastrowid is not None:
-            response.id = int(cur.lastrowid)
+        (response_id,) = cur.fetchone()
+        if response.id is None:
+            response.id = int(response_id)
 
+        if response.id is not None:
+            self._save_summary(AiSummary.from_response_json(response.response_json, response_id=response.id))
         self.conn.commit()
         return response
 
-    def get_by_request(self, request_id: int) -> list[AiResponse]:
+    def get_latest_id(self, request_id: int) -> int | None:
+        row = self.conn.execute(
+            """
+            SELECT id
+            FROM ai_responses
+            WHERE request_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+            """,
+            [request_id],
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def get_summary(self, response_id: int) -> AiSummary | None:
+        row = self.conn.execute(
+            "SELECT sections_json, charts_json FROM ai_summaries WHERE response_id = ?", [response_id]
+        ).fetchone()
+        if row:
+            return AiSummary.model_validate_json(
+                f'{{"response_id":{response_id},"sections":{row[0]},"charts":{row[1]}}}'
+            )
+
+        # Summaries are written with their response (older ones by migration 0012); a GET never writes
+        row = self.conn.execute("SELECT response_json FROM ai_responses WHERE id = ?", [response_id]).fetchone()
+        return AiSummary.from_response_json(row[0], response_id=response_id) if row else None
+
+    def _save_summary(self, summary: AiSummary) -> None:
+        data = summary.model_dump(mode="json")
+        self.conn.execute(
+            """
+            INSERT INTO ai_summaries (response_id, sections_json, charts_json)
+            VALUES (?, ?, ?)
+            ON CONFLICT(response_id) DO UPDATE SET
+                sections_json = excluded.sections_json,
+                charts_json = excluded.charts_json
+            """,
+            [summary.response_id, json.dumps(data["sections"]), json.dumps(data["charts"])],
+        )
+
+    def get_by_request(self, request_id: int, *, include_archived: bool = False) -> list[AiResponse]:
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
+                f"""
                 SELECT id, request_id, response_json, created_at
-                FROM ai_responses
+                FROM {self._table("ai_responses", include_archived)}
                 WHERE request_id = ?
                 ORDER BY created_at DESC
                 """,
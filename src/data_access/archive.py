@@ -0,0 +1,207 @@
+import re
+from logging import getLogger
+from pathlib import Path
+
+from src.data_access.backends import Connection
+from src.data_access.base import ARCHIVE_SCHEMA, WITH_ARCHIVE_SUFFIX, BaseStorage
+
+logger = getLogger(__name__)
+
+# Tables with rows moved to the archive, each with the rows belonging to the ids of a batch: patient ids for
+# inactive patients, ai_requests ids for old AI requests. Parents come first.
+_PATIENT_ROWS = {
+    "patients": "patient_id IN ({ids})",
+    "addresses": "patient_id IN ({ids})",
+    "medical_checks": "patient_id IN ({ids})",
+    "medical_check_items": "check_id IN (SELECT check_id FROM main.medical_checks WHERE patient_id IN ({ids}))",
+    "medical_check_attachments": "check_id IN (SELECT check_id FROM main.medical_checks WHERE patient_id IN ({ids}))",
+    "voice_recordings": "check_id IN (SELECT check_id FROM main.medical_checks WHERE patient_id IN ({ids}))",
+    "ai_requests": "patient_id IN ({ids})",
+    "ai_responses": "request_id IN (SELECT id FROM main.ai_requests WHERE patient_id IN ({ids}))",
+    "ai_summaries": """response_id IN (
+        SELECT s.id FROM main.ai_responses s JOIN main.ai_requests r ON r.id = s.request_id
+        WHERE r.patient_id IN ({ids}))""",
+}
+_AI_REQUEST_ROWS = {
+    "ai_requests": "id IN ({ids})",
+    "ai_responses": "request_id IN ({ids})",
+    "ai_summaries": "response_id IN (SELECT id FROM main.ai_responses WHERE request_id IN ({ids}))",
+}
+ARCHIVED_TABLES = tuple(_PATIENT_ROWS)
+# Ids handed out by AUTOINCREMENT (migration 0015) that must never be given to a new row while an archived row
+# has them
+_ID_COLUMNS = {
+    "patients": "patient_id",
+    "medical_checks": "check_id",
+    "medical_check_attachments": "attachment_id",
+}
+# Archived rows are read by these columns
+_ARCHIVE_INDEXES = {
+    "medical_checks": "patient_id",
+    "medical_check_items": "check_id",
+    "medical_check_attachments": "check_id",
+    "voice_recordings": "check_id",
+    "ai_requests": "patient_id",
+    "ai_responses": "request_id",
+}
+# Each archived table is a copy of the live one without its foreign keys: the old AI requests of a patient who
+# is still active are archived without the patient
+_FOREIGN_KEY = re.compile(
+    r",\s*FOREIGN KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)"
+    r"(\s+ON\s+(DELETE|UPDATE)\s+(CASCADE|SET NULL|SET DEFAULT|RESTRICT|NO ACTION))*",
+    re.IGNORECASE,
+)
+_CREATE_TABLE = re.compile(r"^CREATE TABLE\s+(IF NOT EXISTS\s+)?[\"'`]?(\w+)[\"'`]?", re.IGNORECASE)
+
+
+def _columns(conn: Connection, schema: str, table: str) -> list[tuple[str, str]]:
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _ensure_archive_tables(conn: Connection) -> None:
+    """Create the archived tables missing from the archive and add columns that migrations added since."""
+    for table in ARCHIVED_TABLES:
+        archived = {name for name, _ in _columns(conn, ARCHIVE_SCHEMA, table)}
+        if not archived:
+            (sql,) = conn.execute(
+                "SELECT sql FROM main.sqlite_schema WHERE type = 'table' AND name = ?", [table]
+            ).fetchone()
+            conn.execute(_CREATE_TABLE.sub(f"CREATE TABLE {ARCHIVE_SCHEMA}.{table}", _FOREIGN_KEY.sub("", sql)))
+        else:
+            for name, declared_type in _columns(conn, "main", table):
+                if name not in archived:
+                    conn.execute(f"ALTER TABLE {ARCHIVE_SCHEMA}.{table} ADD COLUMN {name} {declared_type}")
+    for table, column in _ARCHIVE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.ix_{table}_{column} ON {table}({column})")
+    conn.commit()
+
+
+def attach_archive(conn: Connection, archive_file: Path, *, create: bool = False) -> bool:
+    """ATTACH the archive database to `conn` and create the temp views reading live and archived rows together.
+
+    Does nothing and returns False when the archive does not exist yet, unless `create` is set. Queries on the
+    connection only read the archive through the views, i.e. when a storage method is called with
+    include_archived=True.
+    """
+    if not conn.execute("SELECT 1 FROM pragma_database_list WHERE name = ?", [ARCHIVE_SCHEMA]).fetchone():
+        if not create and not archive_file.exists():
+            return False
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", [str(archive_file)])
+    if create:
+        _ensure_archive_tables(conn)
+
+    for table in ARCHIVED_TABLES:
+        live = [name for name, _ in _columns(conn, "main", table)]
+        archived = {name for name, _ in _columns(conn, ARCHIVE_SCHEMA, table)}
+        view = f"SELECT {', '.join(live)} FROM main.{table}"
+        if archived:
+            # Columns added by a migration after the archive was last written are NULL for archived rows
+            from_archive = ", ".join(name if name in archived else f"NULL AS {name}" for name in live)
+            view += f" UNION ALL SELECT {from_archive} FROM {ARCHIVE_SCHEMA}.{table}"
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}{WITH_ARCHIVE_SUFFIX}")
+        conn.execute(f"CREATE TEMP VIEW {table}{WITH_ARCHIVE_SUFFIX} AS {view}")
+    _skip_archived_ids(conn)
+    return True
+
+
+def _skip_archived_ids(conn: Connection) -> None:
+    """Move each table's AUTOINCREMENT counter past the ids in the archive.
+
+    Rows archived before migration 0015 may hold ids above the highest live one, which the migration could not
+    see. Only writes when a counter is behind, so normally this is a few index lookups.
+    """
+    behind = []
+    for table, column in _ID_COLUMNS.items():
+        if not _columns(conn, ARCHIVE_SCHEMA, table):
+            continue
+        (archived,) = conn.execute(f"SELECT MAX({column}) FROM {ARCHIVE_SCHEMA}.{table}").fetchone()
+        seq = conn.execute("SELECT seq FROM main.sqlite_sequence WHERE name = ?", [table]).fetchone()
+        if archived is not None and (seq is None or seq[0] < archived):
+            behind.append((table, archived, seq is None))
+    for table, archived, missing in behind:
+        if missing:
+            conn.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)", [table, archived])
+        else:
+            conn.execute("UPDATE main.sqlite_sequence SET seq = ? WHERE name = ?", [archived, table])
+    if behind:
+        conn.commit()
+
+
+class ArchiveStorage(BaseStorage):
+    """Moves rows nobody reads day to day out of the live database into the attached archive.
+
+    Each batch copies the rows into the archive and deletes them from the live tables (their children going
+    with them through ON DELETE CASCADE) in one transaction. With the live database in WAL mode a commit is
+    atomic per database file only, so after a crash a batch may be found in both; the copy skips rows already
+    archived unchanged, and running the archiver again finishes the move. A different archived row with the
+    same key is never overwritten: the copy fails and the batch stays live.
+    """
+
+    def archive_inactive_patients(self, *, inactive_months: int, batch_size: int = 200) -> int:
+        """Archive patients whose most recent check is older than `inactive_months`; returns how many.
+
+        Patients without any check are left alone, as they are usually newly registered.
+        """
+        return self._archive_in_batches(
+            """
+            SELECT patient_id
+            FROM main.medical_checks
+            GROUP BY patient_id
+            HAVING MAX(check_date) < date('now', ?)
+            LIMIT ?
+            """,
+            [f"-{int(inactive_months)} months"],
+            _PATIENT_ROWS,
+            delete="DELETE FROM main.patients WHERE patient_id IN ({ids})",
+            batch_size=batch_size,
+        )
+
+    def archive_ai_requests(self, *, older_than_months: int, batch_size: int = 200) -> int:
+        """Archive AI requests (and their responses) older than `older_than_months`; returns how many.
+
+        Each patient's latest request stays live, as the patient page shows its summary.
+        """
+        return self._archive_in_batches(
+            """
+            SELECT r.id
+            FROM main.ai_requests r
+            WHERE r.created_at < datetime('now', ?)
+              AND EXISTS (SELECT 1 FROM main.ai_requests n WHERE n.patient_id = r.patient_id AND n.id > r.id)
+            LIMIT ?
+            """,
+            [f"-{int(older_than_months)} months"],
+            _AI_REQUEST_ROWS,
+            delete="DELETE FROM main.ai_requests WHERE id IN ({ids})",
+            batch_size=batch_size,
+        )
+
+    def _archive_in_batches(
+        self, select_ids: str, params: list, rows: dict[str, str], *, delete: str, batch_size: int
+    ) -> int:
+        archived = 0
+        while ids := [row[0] for row in self.conn.execute(select_ids, [*params, batch_size])]:
+            placeholders = ", ".join("?" * len(ids))
+            try:
+                for table, where in rows.items():
+                    names = [name for name, _ in _columns(self.conn, "main", table)]
+                    columns = ", ".join(names)
+                    same_row = " AND ".join(f"a.{name} IS live.{name}" for name in names)
+                    self.conn.execute(
+                        f"""
+                        INSERT INTO {ARCHIVE_SCHEMA}.{table} ({columns})
+                        SELECT {columns}
+                        FROM main.{table} live
+                        WHERE {where.format(ids=placeholders)}
+                          AND NOT EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.{table} a WHERE {same_row})
+                        """,
+                        ids * where.count("{ids}"),
+                    )
+                self.conn.execute(delete.format(ids=placeholders), ids)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            archived += len(ids)
+            if identity_map := self._identity_map:
+                identity_map.clear()
+        return archived
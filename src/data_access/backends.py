@@ -0,0 +1,343 @@
+"""The databases DbStorage runs on: a SQLite file (the default), or PostgreSQL when several app nodes share data.
+
+Storages are written once, in SQL both backends accept. The little that differs is in `Dialect`, and
+`PostgresConnection` gives PostgreSQL the sqlite3.Connection interface the storages were written against,
+which `Connection` describes.
+"""
+
+import re
+import sqlite3
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Protocol, Self
+
+POSTGRES_SCHEMES = ("postgresql://", "postgres://")
+
+
+class Cursor(Protocol):
+    """The parts of sqlite3.Cursor the storages use, which psycopg's cursors have too."""
+
+    @property
+    def description(self) -> Any: ...
+
+    @property
+    def rowcount(self) -> int: ...
+
+    @property
+    def lastrowid(self) -> int | None: ...
+
+    def execute(self, sql: str, params: Any = (), /) -> Any: ...
+
+    def executemany(self, sql: str, params_seq: Any, /) -> Any: ...
+
+    def fetchone(self) -> Any: ...
+
+    def fetchmany(self, size: int = 1, /) -> list[Any]: ...
+
+    def fetchall(self) -> list[Any]: ...
+
+    def close(self) -> None: ...
+
+    def __iter__(self) -> Iterator[Any]: ...
+
+
+class Connection(Protocol):
+    """A sqlite3.Connection or a PostgresConnection: what storages and migrations may rely on.
+
+    SQLite-only code, such as the PRAGMAs and the cold archive, takes one too but is only reached with a
+    SQLite database.
+    """
+
+    @property
+    def in_transaction(self) -> bool: ...
+
+    def cursor(self) -> Cursor: ...
+
+    def execute(self, sql: str, params: Any = (), /) -> Cursor: ...
+
+    def executemany(self, sql: str, params_seq: Any, /) -> Cursor: ...
+
+    def set_trace_callback(self, trace: Callable[[str], object] | None, /) -> None: ...
+
+    def commit(self) -> None: ...
+
+    def rollback(self) -> None: ...
+
+    def close(self) -> None: ...
+
+    def __enter__(self) -> Self: ...
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: TracebackType | None, /
+    ) -> bool | None: ...
+
+
+def is_postgres(database: Path | str) -> bool:
+    return isinstance(database, str) and database.startswith(POSTGRES_SCHEMES)
+
+
+@dataclass(frozen=True)
+class Dialect:
+    name: str
+    # The current UTC time, comparable with the DATETIME columns
+    now: str
+    # The current UTC time shifted by one parameter such as '+30.000 seconds'
+    now_plus: str
+    # Seconds elapsed since the DATETIME expression substituted for {}
+    seconds_since: str
+    # Ends a SELECT whose rows are about to be updated, so concurrent writers pass over them
+    skip_locked: str = ""
+
+
+SQLITE = Dialect(
+    "sqlite",
+    now="strftime('%Y-%m-%d %H:%M:%f', 'now')",
+    now_plus="strftime('%Y-%m-%d %H:%M:%f', 'now', ?)",
+    seconds_since="(julianday('now') - julianday({})) * 86400",
+)
+# Connections run with TimeZone=UTC, so timestamps match SQLite's CURRENT_TIMESTAMP
+POSTGRES = Dialect(
+    "postgresql",
+    now="LOCALTIMESTAMP",
+    now_plus="LOCALTIMESTAMP + CAST(? AS interval)",
+    seconds_since="EXTRACT(EPOCH FROM LOCALTIMESTAMP - {})",
+    skip_locked="FOR UPDATE SKIP LOCKED",
+)
+
+
+def dialect_of(conn: Any) -> Dialect:
+    return getattr(conn, "dialect", SQLITE)
+
+
+# Statements the sqlite3 module opens a transaction for
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_QMARK_OR_PERCENT = re.compile(r"'(?:[^']|'')*'|\?|%")
+
+
+@lru_cache(maxsize=1024)
+def to_pyformat(sql: str) -> str:
+    """Rewrite `?` placeholders as psycopg's `%s`, leaving question marks in string literals alone."""
+
+    def replace(match: re.Match) -> str:
+        token = match.group()
+        if token == "?":
+            return "%s"
+        return token.replace("%", "%%")
+
+    return _QMARK_OR_PERCENT.sub(replace, sql)
+
+
+@cache
+def _driver() -> tuple[Any, Any, type]:
+    """psycopg, its ConnectionPool and the `?` cursor, imported on first use: psycopg is slow to load.
+
+    They are optional, only needed with a postgresql:// DATABASE_URL.
+    """
+    try:
+        import psycopg
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        raise RuntimeError("A postgresql:// DATABASE_URL needs the psycopg and psycopg-pool packages") from None
+    idle = psycopg.pq.TransactionStatus.IDLE
+
+    class QmarkCursor(psycopg.ClientCursor):
+        """A cursor taking `?` placeholders, which opens a transaction before writes as sqlite3 does.
+
+        Parameters are bound client side, like SQLite's, so `? IS NULL` needs no casts.
+        """
+
+        trace: Callable[[str], object] | None = None
+
+        def execute(self, query, params=None, **kwargs):
+            if self.trace:
+                self.trace(query)
+            if _WRITE.match(query) and self.connection.info.transaction_status == idle:
+                self.connection.execute("BEGIN")
+            return super().execute(to_pyformat(query), params or (), **kwargs)
+
+        def executemany(self, query, params_seq, **kwargs):
+            if self.trace:
+                self.trace(query)
+            if _WRITE.match(query) and self.connection.info.transaction_status == idle:
+                self.connection.execute("BEGIN")
+            return super().executemany(to_pyformat(query), params_seq, **kwargs)
+
+    return psycopg, ConnectionPool, QmarkCursor
+
+
+_pools: dict[str, Any] = {}
+_pools_lock = threading.Lock()
+
+
+def _configure(conn: Any) -> None:
+    conn.execute("SET TIME ZONE 'UTC'")
+
+
+def postgres_pool(url: str, *, min_size: int = 1, max_size: int = 10) -> Any:
+    """The process-wide psycopg_pool.ConnectionPool for `url`, opened on first use."""
+    _, ConnectionPool, QmarkCursor = _driver()
+    with _pools_lock:
+        if (pool := _pools.get(url)) is None:
+            pool = _pools[url] = ConnectionPool(
+                url,
+                min_size=min_size,
+                max_size=max_size,
+                # Autocommit, so reads outside a write never leave the connection idle in a transaction
+                kwargs={"autocommit": True, "cursor_factory": QmarkCursor},
+                configure=_configure,
+                check=ConnectionPool.check_connection,
+                name="storage",
+                open=True,
+            )
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        while _pools:
+            _pools.popitem()[1].close()
+
+
+class StorageConnection(sqlite3.Connection):
+    """The sqlite3.Connection of a DbStorage: commit() waits while DbStorage.atomic() runs a block."""
+
+    commits_held = 0
+
+    def commit(self) -> None:
+        if not self.commits_held:
+            super().commit()
+
+
+class PostgresConnection:
+    """The pool of a postgresql:// database, with the parts of the sqlite3.Connection interface the storages use.
+
+    A statement outside a transaction borrows a connection from the pool and hands it straight back, so
+    requests sharing a DbStorage run on connections of their own. As with sqlite3, a transaction starts with
+    the first INSERT, UPDATE or DELETE, and the thread that started it keeps its connection until commit() or
+    rollback().
+    """
+
+    dialect = POSTGRES
+    # As StorageConnection's
+    commits_held = 0
+
+    def __init__(self, url: str, *, min_size: int = 1, max_size: int = 10) -> None:
+        self._pool = postgres_pool(url, min_size=min_size, max_size=max_size)
+        # The connection of the transaction each thread has open
+        self._local = threading.local()
+        self._trace: Callable[[str], object] | None = None
+
+    @property
+    def _held(self) -> Any:
+        return getattr(self._local, "conn", None)
+
+    @property
+    def in_transaction(self) -> bool:
+        conn = self._held
+        return conn is not None and conn.info.transaction_status != _driver()[0].pq.TransactionStatus.IDLE
+
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        """The thread's transaction's connection, or else one from the pool, kept if a transaction opens."""
+        if (conn := self._held) is not None:
+            yield conn
+            return
+        conn = self._pool.getconn()
+        try:
+            yield conn
+        finally:
+            if conn.info.transaction_status == _driver()[0].pq.TransactionStatus.IDLE:
+                self._pool.putconn(conn)
+            else:
+                self._local.conn = conn
+
+    def _release(self) -> None:
+        if (conn := self._held) is not None:
+            self._local.conn = None
+            self._pool.putconn(conn)
+
+    def set_trace_callback(self, trace: Callable[[str], object] | None) -> None:
+        self._trace = trace
+
+    def cursor(self) -> Any:
+        return _PooledCursor(self)
+
+    def execute(self, sql: str, params: Any = ()) -> Any:
+        # Results are fetched with the statement, so the cursor can be read once the connection is back
+        with self._connection() as conn:
+            cur = conn.cursor()
+            cur.trace = self._trace
+            return cur.execute(sql, params)
+
+    def executemany(self, sql: str, params_seq: Any) -> Any:
+        with self._connection() as conn:
+            cur = conn.cursor()
+            cur.trace = self._trace
+            cur.executemany(sql, params_seq)
+            return cur
+
+    def commit(self) -> None:
+        if self.commits_held:
+            return
+        if self.in_transaction:
+            self._held.execute("COMMIT")
+        self._release()
+
+    def rollback(self) -> None:
+        if self.in_transaction:
+            self._held.execute("ROLLBACK")
+        self._release()
+
+    def close(self) -> None:
+        self.rollback()
+
+    def __enter__(self) -> Self:
+        # Unlike sqlite3, the block is one transaction from the start, so the DDL of a migration is atomic too
+        if not self.in_transaction:
+            self.execute("BEGIN")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class _PooledCursor:
+    """What PostgresConnection.cursor() returns: each execute() runs as PostgresConnection.execute() does."""
+
+    def __init__(self, connection: PostgresConnection) -> None:
+        self._connection = connection
+        self._cursor: Any = None
+
+    def execute(self, sql: str, params: Any = ()) -> Self:
+        self._cursor = self._connection.execute(sql, params)
+        return self
+
+    def executemany(self, sql: str, params_seq: Any) -> Self:
+        self._cursor = self._connection.executemany(sql, params_seq)
+        return self
+
+    def close(self) -> None:
+        if self._cursor is not None:
+            self._cursor.close()
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str) -> Any:
+        # description, rowcount, fetchone() and the rest, of the last statement
+        return getattr(self._cursor, name)
+
+
+def connect(database: Path | str) -> Connection:
+    """A plain connection to `database`, a SQLite file or a postgresql:// URL, e.g. for migrations."""
+    if is_postgres(database):
+        return PostgresConnection(str(database))
+    return sqlite3.connect(str(database))
@@ -1,20 +1,41 @@
 from __future__ import annotations
 
-import sqlite3
 from typing import Any
 
+from src.data_access.backends import Connection, Cursor, dialect_of
+from src.data_access.identity_map import IdentityMap, identity_map_for
+
+# Schema name of the attached cold archive database, and suffix of the temp views reading it together with main
+ARCHIVE_SCHEMA = "archive"
+WITH_ARCHIVE_SUFFIX = "_with_archive"
+
 
 class BaseStorage:
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         self.conn = conn
+        self.dialect = dialect_of(conn)
+
+    @property
+    def _identity_map(self) -> IdentityMap | None:
+        return identity_map_for(self.conn)
+
+    def _table(self, name: str, include_archived: bool = False) -> str:
+        """Table to read `name` from: with include_archived, a view over it and its archived rows, if attached."""
+        if (
+            include_archived
+            and self.dialect.name == "sqlite"
+            and self.conn.execute("SELECT 1 FROM pragma_database_list WHERE name = ?", [ARCHIVE_SCHEMA]).fetchone()
+        ):
+            return f"{name}{WITH_ARCHIVE_SUFFIX}"
+        return name
 
     @staticmethod
-    def _fetch_all_dicts(cur: sqlite3.Cursor) -> list[dict[str, Any]]:
+    def _fetch_all_dicts(cur: Cursor) -> list[dict[str, Any]]:
         cols: list[str] = [d[0] for d in cur.description]
         return [dict(zip(cols, row)) for row in cur.fetchall()]
 
     @staticmethod
-    def _fetch_one_dict(cur: sqlite3.Cursor) -> dict[str, Any] | None:
+    def _fetch_one_dict(cur: Cursor) -> dict[str, Any] | None:
         desc = cur.description
         if not desc:
             return None
@@ -0,0 +1,368 @@
+"""Where attachments and voice recordings are kept: a local directory, or an S3-compatible bucket.
+
+Keys are relative paths such as attachments/12/2024-01-01/letter.pdf or voice_recordings/12/2024-01-01_0930.webm;
+the database stores them relative to their attachments/ or voice_recordings/ root. With S3BlobStore the app
+nodes share no disk, so any number of them can run behind a load balancer.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from functools import lru_cache, partial
+from itertools import chain
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, BinaryIO
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+if TYPE_CHECKING:
+    import httpx
+
+CHUNK_SIZE = 64 * 1024
+# S3 rejects parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 2**20
+_UNSAFE_KEY = re.compile(r"(^|/)\.{1,2}(/|$)|\\|\x00|^/|//")
+
+
+class BlobNotFoundError(LookupError):
+    pass
+
+
+def check_key(key: str) -> str:
+    """`key`, if it is a plain relative path that cannot escape the store; raises ValueError otherwise."""
+    if not key or _UNSAFE_KEY.search(key):
+        raise ValueError(f"Invalid blob key: {key!r}")
+    return key
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    key: str
+    size: int
+    # A strong HTTP entity tag derived from the content: a SHA-256 for local files, S3's ETag in a bucket
+    etag: str | None = None
+    content_type: str | None = None
+
+
+class BlobStore(ABC):
+    """The operations the app needs from a store: streamed writes, ranged reads and direct downloads.
+
+    Backends implement the abstract methods; the others have defaults they may improve on.
+    """
+
+    @abstractmethod
+    def put(self, key: str, data: BinaryIO, content_type: str | None = None) -> BlobInfo:
+        """Store everything `data` has left to read under `key`, replacing what was there, without holding it all."""
+
+    @abstractmethod
+    def stat(self, key: str) -> BlobInfo | None:
+        """The size and validators of `key`, or None when there is no such blob."""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        """The bytes of `key` from `start` up to and including `end` (the last byte when None), in chunks."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove `key`; nothing happens when there is no such blob."""
+
+    def open(self, key: str) -> IO[bytes]:
+        """A readable, seekable copy of `key`, for libraries that want a file."""
+        spooled = tempfile.SpooledTemporaryFile(max_size=MIN_PART_SIZE)  # noqa: SIM115 - returned open
+        for chunk in self.iter_range(key):
+            spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
+
+    def local_path(self, key: str) -> Path | None:
+        """The file holding `key`, when the store has one the app can send with sendfile."""
+        return None
+
+    def presigned_url(
+        self, key: str, *, content_type: str | None = None, content_disposition: str | None = None
+    ) -> str | None:
+        """A short-lived URL the browser can download `key` from directly, when the store offers one.
+
+        The download is sent with `content_type` and `content_disposition` when given, whatever the upload said.
+        """
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root`, e.g. the working directory or a practice's directory."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / check_key(key)
+
+    def put(self, key: str, data: BinaryIO, content_type: str | None = None) -> BlobInfo:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed into place, so readers never see half a file
+        fd, partial = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".partial")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(data, f, CHUNK_SIZE)
+            os.replace(partial, path)
+        except BaseException:
+            Path(partial).unlink(missing_ok=True)
+            raise
+        return BlobInfo(key, path.stat().st_size, content_type=content_type)
+
+    def stat(self, key: str) -> BlobInfo | None:
+        path = self._path(key)
+        if not path.is_file():
+            return None
+        st = path.stat()
+        return BlobInfo(key, st.st_size, f'"{_file_digest(path, st.st_size, st.st_mtime_ns)}"')
+
+    def iter_range(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        try:
+            f = self._path(key).open("rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise BlobNotFoundError(key) from None
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def open(self, key: str) -> IO[bytes]:
+        try:
+            return self._path(key).open("rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise BlobNotFoundError(key) from None
+
+    def local_path(self, key: str) -> Path | None:
+        path = self._path(key)
+        return path if path.is_file() else None
+
+
+@lru_cache(maxsize=4096)
+def _file_digest(path: Path, size: int, mtime_ns: int) -> str:
+    """SHA-256 of a file, hashed once per version of it: a rewritten file has a new size or mtime."""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def _query_string(query: dict[str, str]) -> str:
+    # The canonical form SigV4 signs, also used verbatim in the URL so the two cannot differ
+    return "&".join(f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in sorted(query.items()))
+
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3-compatible bucket (AWS S3, MinIO, Ceph, ...), under `prefix`.
+
+    Requests are signed with AWS Signature Version 4 and use path-style URLs, which every S3-compatible
+    server accepts. Objects larger than `part_size` go up as multipart uploads, one part in memory at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        endpoint: str | None = None,
+        region: str = "us-east-1",
+        prefix: str = "",
+        part_size: int = 8 * 2**20,
+        presign_seconds: int = 300,
+        client: httpx.Client | None = None,
+    ) -> None:
+        self.endpoint = (endpoint or f"https://s3.{region}.amazonaws.com").rstrip("/")
+        self.bucket = bucket
+        self.region = region
+        self.prefix = prefix
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.presign_seconds = presign_seconds
+        self._access_key = access_key
+        self._secret_key = secret_key
+        import httpx  # imported on first use, it is slow to load
+
+        self._client = client or httpx.Client(timeout=httpx.Timeout(30.0, connect=5.0))
+
+    def _path(self, key: str) -> str:
+        return f"/{self.bucket}/" + quote(self.prefix + check_key(key), safe="/~")
+
+    def _scope(self, now: datetime) -> tuple[str, str, bytes]:
+        day = now.strftime("%Y%m%d")
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        key = _hmac(f"AWS4{self._secret_key}".encode(), day)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        return scope, now.strftime("%Y%m%dT%H%M%SZ"), key
+
+    def _signature(
+        self, method: str, path: str, query: dict[str, str], headers: dict[str, str], payload: str, now: datetime
+    ) -> str:
+        """The SigV4 signature of a request; `headers` are the signed ones, with lower-case names."""
+        scope, stamp, signing_key = self._scope(now)
+        canonical_headers = "".join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers))
+        canonical = "\n".join(
+            [method, path, _query_string(query), canonical_headers, ";".join(sorted(headers)), payload]
+        )
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", stamp, scope, _sha256(canonical.encode())])
+        return hmac.new(signing_key, to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def _url(self, path: str, query: dict[str, str]) -> str:
+        return self.endpoint + path + (f"?{_query_string(query)}" if query else "")
+
+    @property
+    def _host(self) -> str:
+        import httpx
+
+        return httpx.URL(self.endpoint).netloc.decode()
+
+    def _request(
+        self,
+        method: str,
+        key: str,
+        *,
+        query: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+        stream: bool = False,
+    ) -> httpx.Response:
+        path, query = self._path(key), query or {}
+        now = datetime.now(UTC)
+        payload = _sha256(body)
+        headers = {
+            **(headers or {}),
+            "host": self._host,
+            "x-amz-content-sha256": payload,
+            "x-amz-date": now.strftime("%Y%m%dT%H%M%SZ"),
+        }
+        signature = self._signature(method, path, query, headers, payload, now)
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{self._scope(now)[0]}, "
+            f"SignedHeaders={';'.join(sorted(headers))}, Signature={signature}"
+        )
+        request = self._client.build_request(method, self._url(path, query), headers=headers, content=body or None)
+        response = self._client.send(request, stream=stream)
+        if response.status_code == 404 and method in ("GET", "HEAD"):
+            response.close()
+            raise BlobNotFoundError(key)
+        if response.is_error:
+            response.read()
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def put(self, key: str, data: BinaryIO, content_type: str | None = None) -> BlobInfo:
+        headers = {"content-type": content_type} if content_type else {}
+        first = data.read(self.part_size)
+        part = data.read(self.part_size) if len(first) == self.part_size else b""
+        if not part:
+            resp = self._request("PUT", key, headers=headers, body=first)
+            return BlobInfo(key, len(first), resp.headers.get("etag"), content_type)
+
+        created = self._request("POST", key, query={"uploads": ""}, headers=headers)
+        upload_id = _xml_text(created.content, "UploadId")
+        etags: list[str] = []
+        size = 0
+        try:
+            for chunk in chain((first, part), iter(partial(data.read, self.part_size), b"")):
+                etags.append(self._upload_part(key, upload_id, len(etags) + 1, chunk))
+                size += len(chunk)
+            parts = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in enumerate(etags, 1)
+            )
+            body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode()
+            completed = self._request("POST", key, query={"uploadId": upload_id}, body=body)
+        except BaseException:
+            # Abandoned parts are billed until the upload is aborted
+            import httpx
+
+            with suppress(httpx.HTTPError):
+                self._request("DELETE", key, query={"uploadId": upload_id})
+            raise
+        return BlobInfo(key, size, _xml_text(completed.content, "ETag"), content_type)
+
+    def _upload_part(self, key: str, upload_id: str, number: int, chunk: bytes) -> str:
+        query = {"partNumber": str(number), "uploadId": upload_id}
+        return self._request("PUT", key, query=query, body=chunk).headers["etag"]
+
+    def stat(self, key: str) -> BlobInfo | None:
+        try:
+            resp = self._request("HEAD", key)
+        except BlobNotFoundError:
+            return None
+        return BlobInfo(
+            key, int(resp.headers["content-length"]), resp.headers.get("etag"), resp.headers.get("content-type")
+        )
+
+    def iter_range(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        headers = {"range": f"bytes={start}-{'' if end is None else end}"} if start or end is not None else {}
+        resp = self._request("GET", key, headers=headers, stream=True)
+        try:
+            yield from resp.iter_bytes(CHUNK_SIZE)
+        finally:
+            resp.close()
+
+    def delete(self, key: str) -> None:
+        self._request("DELETE", key)
+
+    def presigned_url(
+        self, key: str, *, content_type: str | None = None, content_disposition: str | None = None
+    ) -> str | None:
+        if self.presign_seconds <= 0:
+            return None
+        path, now = self._path(key), datetime.now(UTC)
+        scope, stamp, _ = self._scope(now)
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self._access_key}/{scope}",
+            "X-Amz-Date": stamp,
+            "X-Amz-Expires": str(self.presign_seconds),
+            "X-Amz-SignedHeaders": "host",
+        }
+        # S3 answers with these in place of the headers stored with the object
+        if content_type:
+            query["response-content-type"] = content_type
+        if content_disposition:
+            query["response-content-disposition"] = content_disposition
+        signature = self._signature("GET", path, query, {"host": self._host}, "UNSIGNED-PAYLOAD", now)
+        return self._url(path, {**query, "X-Amz-Signature": signature})
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def _xml_text(document: bytes, tag: str) -> str:
+    """The text of the first `tag` element of an S3 XML response, whatever its namespace."""
+    for element in ElementTree.fromstring(document).iter():
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text or ""
+    raise ValueError(f"No {tag} in the S3 response")
@@ -1,13 +1,23 @@
 import sqlite3
-from contextlib import suppress
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
 from datetime import date, datetime
 from pathlib import Path
 
+from settings import Settings, SqliteProfile
+from src.data_access.ai_batch_jobs import AiBatchJobsStorage
 from src.data_access.ai_requests import AiRequestsStorage
 from src.data_access.ai_responses import AiResponsesStorage
+from src.data_access.archive import ArchiveStorage, attach_archive
+from src.data_access.backends import Connection, PostgresConnection, StorageConnection, is_postgres
+from src.data_access.blob_store import BlobStore, LocalBlobStore
+from src.data_access.identity_map import identity_map_for
+from src.data_access.jobs import JobsStorage
 from src.data_access.medical_check_templates import MedicalCheckTemplatesStorage
 from src.data_access.medical_checks import MedicalChecksStorage
 from src.data_access.patients import PatientsStorage
+from src.data_access.search import SearchStorage
+from src.data_access.sqlite_tuning import MaintenanceReport, apply_profile, run_maintenance
 from src.data_access.voice_recordings import VoiceRecordingsStorage
 
 
@@ -37,16 +47,110 @@ sqlite3.register_converter("DATETIME", convert_datetime)
 
 
 class DbStorage:
-    def __init__(self, db_file: Path) -> None:
-        self._conn = sqlite3.connect(str(db_file), detect_types=sqlite3.PARSE_DECLTYPES)
-        self._conn.execute("PRAGMA foreign_keys = ON;")
+    def __init__(
+        self,
+        db_file: Path | str,
+        *,
+        factory: type[StorageConnection] = StorageConnection,
+        profile: SqliteProfile | None = None,
+        read_only: bool = False,
+        blobs: BlobStore | None = None,
+    ) -> None:
+        """`db_file` is a SQLite file, or a postgresql:// URL (see Settings.database).
+
+        `profile` defaults to the one named by the SQLITE_PROFILE setting.
+
+        `blobs` holds the attachments/ and voice_recordings/ the database refers to; by default the working
+        directory.
+
+        With read_only, e.g. for reporting on a backup snapshot, the file is opened with mode=ro and any write
+        raises sqlite3.OperationalError. Otherwise the cold archive is attached when it exists, for reads
+        with include_archived=True.
+
+        On PostgreSQL the connection comes from a pool shared by the process, and the SQLite-only parts (the
+        profile, the cold archive, full-text search's FTS5 index and maintenance) are left to the server.
+        """
+        settings = Settings()
+        self.blobs = blobs or LocalBlobStore(Path())
+        self.archive_file: Path | None = None
+        self._conn: StorageConnection | PostgresConnection
+        if is_postgres(db_file):
+            self._conn = PostgresConnection(
+                str(db_file), min_size=settings.postgres.pool_min_size, max_size=settings.postgres.pool_max_size
+            )
+        else:
+            database = f"{Path(db_file).absolute().as_uri()}?mode=ro" if read_only else str(db_file)
+            self._conn = sqlite3.connect(database, detect_types=sqlite3.PARSE_DECLTYPES, factory=factory, uri=read_only)
+            self._conn.execute("PRAGMA foreign_keys = ON;")
+            apply_profile(self._conn, profile or settings.sqlite.pragmas, read_only=read_only)
+            self.archive_file = settings.archive.path_for(Path(db_file), sharded=settings.tenancy.enabled)
+            if not read_only:
+                attach_archive(self._conn, self.archive_file)
         self.patients = PatientsStorage(self._conn)
-        self.medical_checks = MedicalChecksStorage(self._conn)
         self.medical_check_templates = MedicalCheckTemplatesStorage(self._conn)
+        self.medical_checks = MedicalChecksStorage(self._conn, templates=self.medical_check_templates)
         self.ai_requests = AiRequestsStorage(self._conn)
         self.ai_responses = AiResponsesStorage(self._conn)
         self.voice_recordings = VoiceRecordingsStorage(self._conn)
+        self.ai_batch_jobs = AiBatchJobsStorage(self._conn)
+        self.search = SearchStorage(self._conn)
+        self.jobs = JobsStorage(self._conn)
+        self.archive = ArchiveStorage(self._conn)
+
+    @property
+    def connection(self) -> Connection:
+        return self._conn
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        """Run the block as one transaction: the storages' own commits wait for its end, and an exception
+        rolls back everything it wrote. Nested blocks roll back to where they started.
+        """
+        conn = self._conn
+        outermost = not conn.commits_held
+        savepoint = f"atomic_{conn.commits_held}"
+        if outermost and not conn.in_transaction:
+            conn.execute("BEGIN")
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        conn.commits_held += 1
+        try:
+            yield
+        except BaseException:
+            conn.commits_held -= 1
+            if outermost:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        conn.commits_held -= 1
+        if outermost:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE {savepoint}")
+
+    def discard_loaded(self) -> None:
+        """Forget the entities loaded in the current unit of work, e.g. after they were changed on another connection."""
+        if (identity_map := identity_map_for(self._conn)) is not None:
+            identity_map.clear()
+
+    def run_maintenance(self, *, vacuum_pages: int) -> MaintenanceReport:
+        if isinstance(self._conn, PostgresConnection):
+            # PostgreSQL's autovacuum keeps statistics and free space in order
+            return MaintenanceReport(0, 0)
+        return run_maintenance(self._conn, vacuum_pages=vacuum_pages)
 
     def close(self) -> None:
+        self.blobs.close()
+        if isinstance(self._conn, PostgresConnection):
+            self._conn.close()
+            return
+        with suppress(Exception):
+            # Cheap unless this connection's queries showed statistics worth refreshing
+            self._conn.execute("PRAGMA optimize").fetchall()
         with suppress(Exception):
             self._conn.close()
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+from src.data_access.backends import StorageConnection
+from src.data_access.db_storage import DbStorage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Write = Callable[[DbStorage], T]
+
+
+@dataclass
+class GroupCommitStats:
+    """Counters for tuning the group commit window, served at /admin/metrics."""
+
+    batches: int = 0
+    writes: int = 0
+    failed_writes: int = 0
+    max_batch_size: int = 0
+    commit_seconds: float = 0.0
+    max_commit_seconds: float = 0.0
+    # Number of batches by how many writes they held
+    batch_sizes: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.writes / self.batches if self.batches else 0.0
+
+    @property
+    def mean_commit_seconds(self) -> float:
+        return self.commit_seconds / self.batches if self.batches else 0.0
+
+    def record(self, size: int, failed: int, commit_seconds: float) -> None:
+        self.batches += 1
+        self.writes += size
+        self.failed_writes += failed
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.commit_seconds += commit_seconds
+        self.max_commit_seconds = max(self.max_commit_seconds, commit_seconds)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+
+
+class _GroupConnection(StorageConnection):
+    """Connection of the writer thread: storages' own commit() calls are ignored, the batch commits once."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # No implicit BEGIN: the writer opens the batch transaction and a savepoint per write itself
+        self.isolation_level = None
+
+    def commit(self) -> None:
+        pass
+
+
+@dataclass
+class _PendingWrite:
+    fn: Write[Any]
+    future: Future[Any]
+
+
+class DirectWriter:
+    """Runs each write straight away on the request's storage, as one transaction.
+
+    A write that raises is rolled back whole, and the entities the request has loaded are dropped, as they
+    may hold its changes.
+    """
+
+    def __init__(self, storage: DbStorage) -> None:
+        self.storage = storage
+
+    async def run(self, fn: Write[T]) -> T:
+        try:
+            with self.storage.atomic():
+                return fn(self.storage)
+        except BaseException:
+            self.storage.discard_loaded()
+            raise
+
+
+class GroupedWriter:
+    """Runs a request's writes through the shared GroupCommitWriter.
+
+    The writes happen on the writer's connection, so entities the request has already loaded are dropped
+    afterwards and read again with the changes.
+    """
+
+    def __init__(self, writer: GroupCommitWriter, storage: DbStorage) -> None:
+        self.writer = writer
+        self.storage = storage
+
+    async def run(self, fn: Write[T]) -> T:
+        try:
+            return await self.writer.run(fn)
+        finally:
+            self.storage.discard_loaded()
+
+
+class GroupCommitWriter:
+    """Runs writes submitted by concurrent requests on one thread and commits them in batches.
+
+    The writer waits up to `window_seconds` after the first write of a batch (or until `max_batch` writes
+    are queued) and then runs them all in one transaction, so a peak of small writes costs one fsync per
+    batch instead of one per write. Each write gets a DbStorage on the writer's own connection and runs in
+    its own savepoint: a write that raises is rolled back and its caller gets the exception, while the
+    rest of the batch still commits. Callers get their result once the batch has committed.
+    """
+
+    def __init__(self, db_file: Path, *, window_seconds: float = 0.002, max_batch: int = 64) -> None:
+        self.db_file = db_file
+        self.window_seconds = window_seconds
+        self.max_batch = max(max_batch, 1)
+        self.stats = GroupCommitStats()
+        self._queue: queue.SimpleQueue[_PendingWrite | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        """Commit what is queued, then stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def submit(self, fn: Write[T]) -> Future[T]:
+        future: Future[T] = Future()
+        self._queue.put(_PendingWrite(fn, future))
+        return future
+
+    async def run(self, fn: Write[T]) -> T:
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def _run(self) -> None:
+        # Created here: sqlite connections may only be used on the thread that opened them
+        db = DbStorage(self.db_file, factory=_GroupConnection)
+        try:
+            stopping = False
+            while not stopping:
+                if (first := self._queue.get()) is None:
+                    break
+                batch = [first]
+                deadline = time.monotonic() + self.window_seconds
+                while len(batch) < self.max_batch:
+                    try:
+                        pending = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if pending is None:
+                        stopping = True
+                        break
+                    batch.append(pending)
+                self._commit_batch(db, batch)
+        finally:
+            db.close()
+
+    def _commit_batch(self, db: DbStorage, batch: list[_PendingWrite]) -> None:
+        conn = db.connection
+        outcomes: list[tuple[_PendingWrite, Any]] = []
+        failed = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            self.stats.record(len(batch), len(batch), 0.0)
+            return
+
+        for pending in batch:
+            if not pending.future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT write")
+            try:
+                outcomes.append((pending, pending.fn(db)))
+            except Exception as e:  # noqa: BLE001 - handed back to the caller
+                conn.execute("ROLLBACK TO write")
+                pending.future.set_exception(e)
+                failed += 1
+            finally:
+                conn.execute("RELEASE write")
+
+        started = time.perf_counter()
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.exception("Group commit failed")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for pending, _ in outcomes:
+                pending.future.set_exception(e)
+            failed += len(outcomes)
+        else:
+            for pending, result in outcomes:
+                pending.future.set_result(result)
+        self.stats.record(len(batch), failed, time.perf_counter() - started)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from collections.abc import Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from src.data_access.backends import Connection
+
+
+class IdentityMap:
+    """Entities loaded during one unit of work, keyed by kind and id."""
+
+    def __init__(self) -> None:
+        self._entities: dict[tuple[str, Hashable], Any] = {}
+
+    def get(self, kind: str, key: Hashable) -> Any | None:
+        return self._entities.get((kind, key))
+
+    def add(self, kind: str, key: Hashable, entity: Any) -> None:
+        self._entities[(kind, key)] = entity
+
+    def discard(self, kind: str, key: Hashable) -> None:
+        self._entities.pop((kind, key), None)
+
+    def clear(self) -> None:
+        self._entities.clear()
+
+    def discard_kind(self, kind: str) -> None:
+        for entity_key in [k for k in self._entities if k[0] == kind]:
+            del self._entities[entity_key]
+
+
+# One map per connection, so storages opened on different databases never share entities
+_scope: ContextVar[dict[int, IdentityMap] | None] = ContextVar("identity_maps", default=None)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[None]:
+    """Load each entity at most once inside this block.
+
+    Outside a unit of work storages behave as before and hit the database on every call.
+    """
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def identity_map_for(conn: Connection) -> IdentityMap | None:
+    if (maps := _scope.get()) is None:
+        return None
+    return maps.setdefault(id(conn), IdentityMap())
@@ -0,0 +1,256 @@
+import json
+from typing import Any
+
+from src.data_access.backends import Connection
+from src.data_access.base import BaseStorage
+from src.models.enums import JobKind, JobStatus
+from src.models.job import Job
+
+
+def _seconds(seconds: float) -> str:
+    return f"{seconds:+.3f} seconds"
+
+
+class JobsStorage(BaseStorage):
+    """Durable queue of work run by the worker process (`python -m src.worker`).
+
+    A job is leased by one worker at a time. The lease has to be renewed with `heartbeat`; once it lapses,
+    `requeue_expired` hands the job to another worker, so work survives crashes and deploys. Failed jobs
+    are retried after a delay until `max_attempts` is reached and are then kept as dead letters.
+    """
+
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+
+    def enqueue(
+        self,
+        kind: JobKind,
+        payload: dict[str, Any] | None = None,
+        *,
+        dedupe_key: str | None = None,
+        max_attempts: int = 5,
+        delay_seconds: float = 0.0,
+    ) -> int:
+        """Queue a job and return its id. With a dedupe_key already queued, returns that job's id instead."""
+        cur = self.conn.execute(
+            f"""
+            INSERT INTO jobs (kind, payload_json, dedupe_key, max_attempts, run_at)
+            VALUES (?, ?, ?, ?, {self.dialect.now_plus})
+            ON CONFLICT DO NOTHING
+            RETURNING job_id
+            """,
+            [kind.value, json.dumps(payload or {}), dedupe_key, max_attempts, _seconds(delay_seconds)],
+        )
+        if row := cur.fetchone():
+            job_id = int(row[0])
+        else:
+            row = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE dedupe_key = ? AND status = ?", [dedupe_key, JobStatus.QUEUED.value]
+            ).fetchone()
+            job_id = int(row[0])
+        self.conn.commit()
+        return job_id
+
+    def lease(self, owner: str, lease_seconds: float) -> Job | None:
+        """Claim the oldest due job for `owner`, or None when nothing is due."""
+        # Checking the status again, as on PostgreSQL another worker may have claimed the job in the meantime
+        cur = self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = ?, lease_owner = ?, lease_expires_at = {self.dialect.now_plus}, attempts = attempts + 1
+            WHERE job_id = (
+                SELECT job_id
+                FROM jobs
+                WHERE status = ?
+                  AND run_at <= {self.dialect.now}
+                ORDER BY run_at, job_id
+                LIMIT 1
+                {self.dialect.skip_locked}
+            )
+              AND status = ?
+            RETURNING *
+            """,
+            [
+                JobStatus.RUNNING.value,
+                owner,
+                _seconds(lease_seconds),
+                JobStatus.QUEUED.value,
+                JobStatus.QUEUED.value,
+            ],
+        )
+        row = self._fetch_one_dict(cur)
+        self.conn.commit()
+        return _row_to_job(row) if row else None
+
+    def heartbeat(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        """Extend the lease; False if `owner` no longer holds it and should stop working on the job."""
+        cur = self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET lease_expires_at = {self.dialect.now_plus}
+            WHERE job_id = ?
+              AND lease_owner = ?
+              AND status = ?
+            """,
+            [_seconds(lease_seconds), job_id, owner, JobStatus.RUNNING.value],
+        )
+        self.conn.commit()
+        return cur.rowcount == 1
+
+    def complete(self, job_id: int, owner: str) -> None:
+        self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = ?, lease_owner = NULL, lease_expires_at = NULL, finished_at = {self.dialect.now}
+            WHERE job_id = ?
+              AND lease_owner = ?
+            """,
+            [JobStatus.DONE.value, job_id, owner],
+        )
+        self.conn.commit()
+
+    def fail(self, job_id: int, owner: str, error: str, *, retry_in_seconds: float | None) -> JobStatus | None:
+        """Queue the job again after `retry_in_seconds`, or dead-letter it when out of attempts or not retryable.
+
+        Returns the new status, or None if `owner` had lost the lease.
+        """
+        if retry_in_seconds is not None:
+            self._fold_queued_duplicates(
+                "job_id = ? AND lease_owner = ? AND status = ? AND attempts < max_attempts",
+                [job_id, owner, JobStatus.RUNNING.value],
+            )
+        cur = self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = CASE WHEN ? IS NULL OR attempts >= max_attempts THEN ? ELSE ? END,
+                run_at = {self.dialect.now_plus},
+                finished_at = CASE WHEN ? IS NULL OR attempts >= max_attempts THEN {self.dialect.now} END,
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                last_error = ?
+            WHERE job_id = ?
+              AND lease_owner = ?
+              AND status = ?
+            RETURNING status
+            """,
+            [
+                retry_in_seconds,
+                JobStatus.DEAD.value,
+                JobStatus.QUEUED.value,
+                _seconds(retry_in_seconds or 0.0),
+                retry_in_seconds,
+                error,
+                job_id,
+                owner,
+                JobStatus.RUNNING.value,
+            ],
+        )
+        row = cur.fetchone()
+        self.conn.commit()
+        return JobStatus(row[0]) if row else None
+
+    def requeue_expired(self) -> int:
+        """Return jobs whose worker stopped renewing its lease to the queue; returns how many were released."""
+        now = self.dialect.now
+        requeued = f"status = ? AND lease_expires_at < {now} AND attempts < max_attempts"
+        self._fold_queued_duplicates(requeued, [JobStatus.RUNNING.value])
+        # Of expired jobs for the same work, the latest is kept
+        self.conn.execute(
+            f"""
+            DELETE FROM jobs
+            WHERE {requeued}
+              AND EXISTS (
+                SELECT 1
+                FROM jobs later
+                WHERE later.dedupe_key = jobs.dedupe_key
+                  AND later.job_id > jobs.job_id
+                  AND later.status = ?
+                  AND later.lease_expires_at < {now}
+                  AND later.attempts < later.max_attempts
+              )
+            """,
+            [JobStatus.RUNNING.value, JobStatus.RUNNING.value],
+        )
+        cur = self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN {self.dialect.now} END,
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                last_error = 'Lease expired'
+            WHERE status = ?
+              AND lease_expires_at < {now}
+            """,
+            [JobStatus.DEAD.value, JobStatus.QUEUED.value, JobStatus.RUNNING.value],
+        )
+        self.conn.commit()
+        return cur.rowcount
+
+    def retry(self, job_id: int) -> Job | None:
+        """Queue a dead job again with a fresh set of attempts."""
+        self._fold_queued_duplicates("job_id = ? AND status = ?", [job_id, JobStatus.DEAD.value])
+        cur = self.conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = ?, attempts = 0, run_at = {self.dialect.now}, finished_at = NULL
+            WHERE job_id = ?
+              AND status = ?
+            RETURNING *
+            """,
+            [JobStatus.QUEUED.value, job_id, JobStatus.DEAD.value],
+        )
+        row = self._fetch_one_dict(cur)
+        self.conn.commit()
+        return _row_to_job(row) if row else None
+
+    def _fold_queued_duplicates(self, where: str, params: list) -> None:
+        """Delete the queued jobs sharing a dedupe_key with the jobs matching `where`, about to be queued again.
+
+        Only one job per dedupe_key may be queued, so the same work queued again meanwhile is folded into the
+        job being requeued (what UPDATE OR REPLACE did, which PostgreSQL lacks). Runs in the caller's
+        transaction, before its UPDATE.
+        """
+        self.conn.execute(
+            f"""
+            DELETE FROM jobs
+            WHERE status = ?
+              AND dedupe_key IN (SELECT dedupe_key FROM jobs WHERE dedupe_key IS NOT NULL AND {where})
+            """,
+            [JobStatus.QUEUED.value, *params],
+        )
+
+    def get_job(self, job_id: int) -> Job | None:
+        cur = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", [job_id])
+        row = self._fetch_one_dict(cur)
+        return _row_to_job(row) if row else None
+
+    def get_jobs(self, status: JobStatus | None = None, limit: int = 100) -> list[Job]:
+        """Most recent jobs first, optionally only those with `status`."""
+        cur = self.conn.execute(
+            """
+            SELECT *
+            FROM jobs
+            WHERE ? IS NULL OR status = ?
+            ORDER BY job_id DESC
+            LIMIT ?
+            """,
+            [status and status.value, status and status.value, limit],
+        )
+        return [_row_to_job(r) for r in self._fetch_all_dicts(cur)]
+
+    def count_running(self, dedupe_key: str) -> int:
+        """How many jobs for the same work are leased right now, the caller's own included."""
+        (count,) = self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE dedupe_key = ? AND status = ?", [dedupe_key, JobStatus.RUNNING.value]
+        ).fetchone()
+        return int(count)
+
+    def count_by_status(self) -> dict[str, int]:
+        cur = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: count for status, count in cur.fetchall()}
+
+
+def _row_to_job(row: dict[str, Any]) -> Job:
+    row["payload"] = json.loads(row.pop("payload_json") or "{}")
+    return Job(**row)
@@ -1,12 +1,12 @@
-import sqlite3
 import uuid
 
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.medical_check_item import MedicalCheckItem
 
 
 class MedicalCheckItemsStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         super().__init__(conn)
 
     def insert_items(self, *, check_id: int, medical_check_items: list[MedicalCheckItem]) -> None:
@@ -20,13 +20,13 @@ class MedicalCheckItemsStorage(BaseStorage):
                 [check_item_id, check_id, item.name, item.units or "", str(item.value)],
             )
 
-    def get_items_by_check_id(self, *, check_id: int) -> list[MedicalCheckItem]:
+    def get_items_by_check_id(self, *, check_id: int, include_archived: bool = False) -> list[MedicalCheckItem]:
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
+                f"""
                 SELECT check_item_id, name, units, value
-                FROM medical_check_items
+                FROM {self._table("medical_check_items", include_archived)}
                 WHERE check_id = ?
                 ORDER BY check_item_id
                 """,
@@ -60,7 +60,7 @@ class MedicalCheckItemsStorage(BaseStorage):
                 JOIN medical_checks mc ON mci.check_id = mc.check_id
                 JOIN medical_check_templates n ON n.template_id = mc.template_id
                 WHERE mc.patient_id = ?
-                  AND n.name = ? COLLATE NOCASE
+                  AND lower(n.name) = lower(?)
                   AND mci.name = ?
                 ORDER BY mc.check_date, mc.check_id, mci.check_item_id
                 """,
@@ -1,19 +1,83 @@
 from __future__ import annotations
 
-import sqlite3
+import string
 
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.medical_check_template import (
     MedicalCheckTemplate,
     MedicalCheckTemplateItem,
 )
 
+CATALOGUE_NAME = "medical_check_templates"
+# SQLite's NOCASE only folds A-Z, so "Ärzte" and "ärzte" stay different names
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class _TemplateCatalogue:
+    def __init__(self, version: int, templates: list[MedicalCheckTemplate]):
+        self.version = version
+        self.templates = templates
+        self.by_id = {t.template_id: t for t in templates}
+        # Lowest template_id wins for names differing only in case, as the COLLATE NOCASE lookup did
+        self.id_by_name: dict[str, int] = {}
+        for t in sorted(templates, key=lambda t: t.template_id or 0):
+            if t.template_id is not None:
+                self.id_by_name.setdefault(_name_key(t.name), t.template_id)
+
+
+def _name_key(name: str) -> str:
+    return name.translate(_ASCII_LOWER)
+
 
 class MedicalCheckTemplatesStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    """Template storage backed by an in-process catalogue.
+
+    Reads are served from the catalogue, which is reloaded when `catalogue_versions` shows that the
+    template tables changed (the version is bumped by triggers, so writes from other processes count)
+    and dropped by this storage's own writes. Inside a unit of work the version is checked once, on the
+    first read. Returned templates are shared and must not be mutated.
+    """
+
+    def __init__(self, conn: Connection):
         super().__init__(conn)
+        self._catalogue: _TemplateCatalogue | None = None
+
+    @property
+    def catalogue_version(self) -> int:
+        return self._get_catalogue().version
+
+    def invalidate(self) -> None:
+        self._catalogue = None
+        if identity_map := self._identity_map:
+            identity_map.discard("template_catalogue", CATALOGUE_NAME)
 
     def list_medical_check_templates(self) -> list[MedicalCheckTemplate]:
+        return list(self._get_catalogue().templates)
+
+    def get_template(self, *, template_id: int) -> MedicalCheckTemplate | None:
+        return self._get_catalogue().by_id.get(template_id)
+
+    def get_template_id_by_name(self, name: str) -> int | None:
+        """Case-insensitive lookup of a template id by name."""
+        return self._get_catalogue().id_by_name.get(_name_key(name))
+
+    def _get_catalogue(self) -> _TemplateCatalogue:
+        identity_map = self._identity_map
+        if identity_map and (checked := identity_map.get("template_catalogue", CATALOGUE_NAME)):
+            return checked
+        version = self._read_version()
+        if self._catalogue is None or self._catalogue.version != version:
+            self._catalogue = _TemplateCatalogue(version, self._load_templates())
+        if identity_map:
+            identity_map.add("template_catalogue", CATALOGUE_NAME, self._catalogue)
+        return self._catalogue
+
+    def _read_version(self) -> int:
+        row = self.conn.execute("SELECT version FROM catalogue_versions WHERE name = ?", [CATALOGUE_NAME]).fetchone()
+        return int(row[0]) if row else 0
+
+    def _load_templates(self) -> list[MedicalCheckTemplate]:
         cur = self.conn.cursor()
         try:
             cur.execute(
@@ -28,7 +92,7 @@ class MedicalCheckTemplatesStorage(BaseStorage):
                     i.placeholder                     AS item_placeholder
                 FROM medical_check_templates t
                 LEFT JOIN medical_check_template_items i ON i.template_id = t.template_id
-                ORDER BY t.name COLLATE NOCASE ASC, t.template_id ASC, i.rowid ASC
+                ORDER BY lower(t.name) ASC, t.template_id ASC, i.rowid ASC
                 """
             )
 
@@ -67,51 +131,6 @@ class MedicalCheckTemplatesStorage(BaseStorage):
 
         return list(check_templates_by_id.values())
 
-    def get_template(self, *, template_id: int) -> MedicalCheckTemplate | None:
-        cur = self.conn.cursor()
-        try:
-            cur.execute(
-                """
-                SELECT template_id,
-                       name,
-                       is_active
-                FROM medical_check_templates
-                WHERE template_id = ?
-                """,
-                [template_id],
-            )
-            header = self._fetch_one_dict(cur)
-            if not header:
-                return None
-
-            cur.execute(
-                """
-                SELECT name, units, input_type, placeholder
-                FROM medical_check_template_items
-                WHERE template_id = ?
-                ORDER BY rowid ASC
-                """,
-                [template_id],
-            )
-            items = [
-                MedicalCheckTemplateItem(
-                    name=(r[0] or ""),
-                    units=(r[1] or ""),
-                    input_type=(r[2] or "number"),
-                    placeholder=(r[3] or ""),
-                )
-                for r in cur.fetchall()
-            ]
-        finally:
-            cur.close()
-
-        return MedicalCheckTemplate(
-            template_id=header.get("template_id", 0),
-            name=header.get("name", "Unknown"),
-            is_active=bool(header.get("is_active")),
-            items=items,
-        )
-
     def upsert(
         self,
         *,
@@ -125,12 +144,11 @@ class MedicalCheckTemplatesStorage(BaseStorage):
             VALUES (?, ?) ON CONFLICT(template_id) DO
             UPDATE SET
                 name = excluded.name
+            RETURNING template_id
             """,
             [template_id, check_name],
         )
-
-        if template_id is None:
-            template_id = int(cur.lastrowid or 0)
+        template_id = int(cur.fetchone()[0])
 
         self.conn.execute(
             "DELETE FROM medical_check_template_items WHERE template_id = ?",
@@ -152,6 +170,7 @@ class MedicalCheckTemplatesStorage(BaseStorage):
             )
 
         self.conn.commit()
+        self.invalidate()
         return template_id
 
     def set_active_status(self, *, template_id: int, is_active: bool) -> None:
@@ -160,3 +179,4 @@ class MedicalCheckTemplatesStorage(BaseStorage):
             [1 if is_active else 0, template_id],
         )
         self.conn.commit()
+        self.invalidate()
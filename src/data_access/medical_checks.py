@@ -1,17 +1,30 @@
 import datetime
-import sqlite3
+from collections.abc import Collection
 
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.data_access.medical_check_items import MedicalCheckItemsStorage
-from src.models.enums import MedicalCheckStatus
+from src.data_access.medical_check_templates import MedicalCheckTemplatesStorage
+from src.models.enums import MedicalCheckStatus, Projection
 from src.models.medical_check import MedicalCheck, MedicalCheckAttachment, VoiceRecording
 from src.models.medical_check_item import MedicalCheckItem
 
+# Large text columns are only selected for the full projection
+_ATTACHMENT_COLUMNS = {
+    Projection.SUMMARY: "attachment_id, check_id, filename, content_type, file_path",
+    Projection.FULL: "attachment_id, check_id, filename, content_type, file_path, parsed_content, summary",
+}
+_VOICE_RECORDING_COLUMNS = {
+    Projection.SUMMARY: "voice_recording_id, check_id, file_path",
+    Projection.FULL: "voice_recording_id, check_id, file_path, full_text, summary",
+}
+
 
 class MedicalChecksStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection, templates: MedicalCheckTemplatesStorage | None = None):
         super().__init__(conn)
         self.items = MedicalCheckItemsStorage(conn)
+        self.templates = templates or MedicalCheckTemplatesStorage(conn)
 
     def save(
         self,
@@ -28,90 +41,145 @@ class MedicalChecksStorage(BaseStorage):
         template_id: int
         if isinstance(check_template, int):
             template_id = check_template
+        elif (cached_id := self.templates.get_template_id_by_name(check_template)) is not None:
+            template_id = cached_id
         else:
-            cur_lookup = self.conn.execute(
+            # Auto-insert missing medical_check_template for convenience
+            cur_ins = self.conn.execute(
                 """
-                SELECT template_id
-                FROM medical_check_templates
-                WHERE name = ? COLLATE NOCASE
+                INSERT INTO medical_check_templates (name)
+                VALUES (?)
+                RETURNING template_id
                 """,
                 [check_template],
             )
-
-            if row := cur_lookup.fetchone():
-                template_id = int(row[0])
-            else:
-                # Auto-insert missing medical_check_template for convenience
-                cur_ins = self.conn.execute(
-                    """
-                    INSERT INTO medical_check_templates (name)
-                    VALUES (?)
-                    """,
-                    [check_template],
-                )
-                template_id = int(cur_ins.lastrowid) if cur_ins.lastrowid else 0
+            template_id = int(cur_ins.fetchone()[0])
+            self.templates.invalidate()
 
         cur = self.conn.execute(
             """
             INSERT INTO medical_checks (patient_id, template_id, check_date, status, notes)
             VALUES (?, ?, ?, ?, ?)
+            RETURNING check_id
             """,
             [patient_id, template_id, check_date, status, notes],
         )
-
-        check_id = int(cur.lastrowid) if cur.lastrowid else 0
+        check_id = int(cur.fetchone()[0])
 
         self.items.insert_items(check_id=check_id, medical_check_items=medical_check_items)
 
         if attachments:
-            for attachment in attachments:
-                self.conn.execute(
-                    """
-                    INSERT INTO medical_check_attachments (check_id, filename, content_type, file_path, parsed_content)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    [
-                        check_id,
-                        attachment["filename"],
-                        attachment["content_type"],
-                        attachment["file_path"],
-                        attachment.get("parsed_content"),
-                    ],
-                )
+            self._insert_attachments(check_id=check_id, attachments=attachments)
 
         self.conn.commit()
         return check_id
 
-    def get_medical_checks(self, patient_id: int) -> list[MedicalCheck]:
+    def add_attachments(self, *, check_id: int, attachments: list[dict[str, str | None]]) -> None:
+        self._insert_attachments(check_id=check_id, attachments=attachments)
+        self.conn.commit()
+        self._forget(check_id)
+
+    def exists(self, *, patient_id: int, check_id: int) -> bool:
+        if (identity_map := self._identity_map) and (mc := identity_map.get("medical_check", check_id)):
+            return mc.patient_id == patient_id
+        row = self.conn.execute(
+            "SELECT 1 FROM medical_checks WHERE patient_id = ? AND check_id = ?", [patient_id, check_id]
+        ).fetchone()
+        return row is not None
+
+    def _forget(self, check_id: int) -> None:
+        if identity_map := self._identity_map:
+            identity_map.discard("medical_check", check_id)
+
+    def _insert_attachments(self, *, check_id: int, attachments: list[dict[str, str | None]]) -> None:
+        for attachment in attachments:
+            self.conn.execute(
+                """
+                INSERT INTO medical_check_attachments (
+                    check_id, filename, content_type, file_path, parsed_content, summary
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    check_id,
+                    attachment["filename"],
+                    attachment["content_type"],
+                    attachment["file_path"],
+                    attachment.get("parsed_content"),
+                    attachment.get("summary"),
+                ],
+            )
+
+    def get_medical_checks(
+        self,
+        patient_id: int,
+        *,
+        projection: Projection = Projection.FULL,
+        fields: Collection[str] | None = None,
+        limit: int | None = None,
+        before: tuple[datetime.date, int] | None = None,
+        include_archived: bool = False,
+    ) -> list[MedicalCheck]:
+        """Load a patient's checks, newest first.
+
+        `projection=SUMMARY` skips the large text columns (attachment parsed_content/summary, transcript
+        full_text/summary). When `fields` is given, child collections not listed in it are not loaded.
+        `limit` and `before` (the check_date and check_id of the last check already seen) page through
+        the list; children are then only loaded for the checks on the page. The checks of archived patients
+        are only found with include_archived.
+        """
+        where = "mc.patient_id = ?"
+        params: list[int | str] = [patient_id]
+        if before is not None:
+            where += " AND (mc.check_date < ? OR (mc.check_date = ? AND mc.check_id < ?))"
+            params += [str(before[0]), str(before[0]), before[1]]
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
+                f"""
                 SELECT mc.check_id,
                        mc.patient_id,
                        n.name AS check_template,
                        mc.check_date,
                        mc.status,
                        mc.notes
-                FROM medical_checks mc
+                FROM {self._table("medical_checks", include_archived)} mc
                 JOIN medical_check_templates n ON n.template_id = mc.template_id
-                WHERE mc.patient_id = ?
+                WHERE {where}
                 ORDER BY mc.check_date DESC, mc.check_id DESC
+                {"LIMIT ?" if limit is not None else ""}
                 """,
-                [patient_id],
+                [*params, limit] if limit is not None else params,
             )
             raw_rows = self._fetch_all_dicts(cur)
         finally:
             cur.close()
 
+        def wanted(field: str) -> bool:
+            return fields is None or field in fields
+
+        page = [row["check_id"] for row in raw_rows] if limit is not None or before is not None else None
+        attachments = (
+            self._get_attachments_by_patient(patient_id, projection, page, include_archived)
+            if wanted("attachments")
+            else {}
+        )
+        recordings = (
+            self._get_voice_recordings_by_patient(patient_id, projection, page, include_archived)
+            if wanted("voice_recordings")
+            else {}
+        )
+
         records: list[MedicalCheck] = []
         for row in raw_rows:
             check_id = row.get("check_id")
             if check_id is None:
                 continue
-            items = self.items.get_items_by_check_id(check_id=check_id)
-            attachments = self.get_attachments_by_check_id(check_id=check_id)
-            voice_recordings = self._get_voice_recordings(check_id=check_id)
+            items = (
+                self.items.get_items_by_check_id(check_id=check_id, include_archived=include_archived)
+                if wanted("medical_check_items")
+                else []
+            )
             medical_check = MedicalCheck(
                 check_id=check_id,
                 patient_id=row.get("patient_id", 0),
@@ -120,14 +188,18 @@ class MedicalChecksStorage(BaseStorage):
                 status=MedicalCheckStatus(row.get("status", MedicalCheckStatus.GREEN.value)),
                 notes=row.get("notes"),
                 medical_check_items=items,
-                attachments=attachments,
-                voice_recordings=voice_recordings,
+                attachments=attachments.get(check_id, []),
+                voice_recordings=recordings.get(check_id, []),
             )
             records.append(medical_check)
 
         return records
 
     def get_medical_check(self, *, patient_id: int, check_id: int) -> MedicalCheck | None:
+        identity_map = self._identity_map
+        if identity_map and (cached := identity_map.get("medical_check", check_id)):
+            return cached if cached.patient_id == patient_id else None
+
         cur = self.conn.cursor()
         try:
             cur.execute(
@@ -166,16 +238,21 @@ class MedicalChecksStorage(BaseStorage):
             attachments=attachments,
             voice_recordings=voice_recordings,
         )
+        if identity_map:
+            identity_map.add("medical_check", check_id, medical_check)
         return medical_check
 
-    def get_attachments_by_check_id(self, check_id: int) -> list[MedicalCheckAttachment]:
+    def get_attachments_by_check_id(
+        self, check_id: int, projection: Projection = Projection.FULL
+    ) -> list[MedicalCheckAttachment]:
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
-                SELECT attachment_id, check_id, filename, content_type, file_path, parsed_content
+                f"""
+                SELECT {_ATTACHMENT_COLUMNS[projection]}
                 FROM medical_check_attachments
                 WHERE check_id = ?
+                ORDER BY attachment_id
                 """,
                 [check_id],
             )
@@ -184,14 +261,37 @@ class MedicalChecksStorage(BaseStorage):
         finally:
             cur.close()
 
-    def _get_voice_recordings(self, check_id: int) -> list[VoiceRecording]:
+    def find_attachment(self, *, patient_id: int, file_path: str) -> MedicalCheckAttachment | None:
+        """The attachment stored at `file_path` on one of the patient's checks, archived ones included."""
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
-                SELECT voice_recording_id, check_id, file_path, full_text, summary
+                f"""
+                SELECT {_ATTACHMENT_COLUMNS[Projection.SUMMARY]}
+                FROM {self._table("medical_check_attachments", include_archived=True)}
+                WHERE file_path = ?
+                  AND check_id IN (
+                      SELECT check_id FROM {self._table("medical_checks", include_archived=True)} WHERE patient_id = ?
+                  )
+                ORDER BY attachment_id DESC
+                LIMIT 1
+                """,
+                [file_path, patient_id],
+            )
+            row = self._fetch_one_dict(cur)
+            return MedicalCheckAttachment(**row) if row else None
+        finally:
+            cur.close()
+
+    def _get_voice_recordings(self, check_id: int, projection: Projection = Projection.FULL) -> list[VoiceRecording]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT {_VOICE_RECORDING_COLUMNS[projection]}
                 FROM voice_recordings
                 WHERE check_id = ?
+                ORDER BY voice_recording_id
                 """,
                 [check_id],
             )
@@ -200,12 +300,77 @@ class MedicalChecksStorage(BaseStorage):
         finally:
             cur.close()
 
+    def _get_attachments_by_patient(
+        self,
+        patient_id: int,
+        projection: Projection,
+        check_ids: list[int] | None = None,
+        include_archived: bool = False,
+    ) -> dict[int, list[MedicalCheckAttachment]]:
+        checks = self._table("medical_checks", include_archived)
+        if check_ids is None:
+            scope, params = f"SELECT check_id FROM {checks} WHERE patient_id = ?", [patient_id]
+        elif not check_ids:
+            return {}
+        else:
+            scope, params = ", ".join("?" * len(check_ids)), check_ids
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT {_ATTACHMENT_COLUMNS[projection]}
+                FROM {self._table("medical_check_attachments", include_archived)}
+                WHERE check_id IN ({scope})
+                ORDER BY attachment_id
+                """,
+                params,
+            )
+            by_check: dict[int, list[MedicalCheckAttachment]] = {}
+            for row in self._fetch_all_dicts(cur):
+                by_check.setdefault(row["check_id"], []).append(MedicalCheckAttachment(**row))
+            return by_check
+        finally:
+            cur.close()
+
+    def _get_voice_recordings_by_patient(
+        self,
+        patient_id: int,
+        projection: Projection,
+        check_ids: list[int] | None = None,
+        include_archived: bool = False,
+    ) -> dict[int, list[VoiceRecording]]:
+        checks = self._table("medical_checks", include_archived)
+        if check_ids is None:
+            scope, params = f"SELECT check_id FROM {checks} WHERE patient_id = ?", [patient_id]
+        elif not check_ids:
+            return {}
+        else:
+            scope, params = ", ".join("?" * len(check_ids)), check_ids
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT {_VOICE_RECORDING_COLUMNS[projection]}
+                FROM {self._table("voice_recordings", include_archived)}
+                WHERE check_id IN ({scope})
+                ORDER BY voice_recording_id
+                """,
+                params,
+            )
+            by_check: dict[int, list[VoiceRecording]] = {}
+            for row in self._fetch_all_dicts(cur):
+                by_check.setdefault(row["check_id"], []).append(VoiceRecording(**row))
+            return by_check
+        finally:
+            cur.close()
+
     def update_status(self, *, check_id: int, status: str) -> None:
         self.conn.execute(
             "UPDATE medical_checks SET status = ? WHERE check_id = ?",
             [status, check_id],
         )
         self.conn.commit()
+        self._forget(check_id)
 
     def update_notes(self, *, check_id: int, notes: str | None) -> None:
         self.conn.execute(
@@ -213,12 +378,14 @@ class MedicalChecksStorage(BaseStorage):
             [notes, check_id],
         )
         self.conn.commit()
+        self._forget(check_id)
 
     def delete(self, *, check_id: int) -> None:
         # Ensure child rows are removed first due to FK constraints
         self.conn.execute("DELETE FROM medical_check_items WHERE check_id = ?", [check_id])
         self.conn.execute("DELETE FROM medical_checks WHERE check_id = ?", [check_id])
         self.conn.commit()
+        self._forget(check_id)
 
     def get_chartable_options(self, *, patient_id: int) -> list[dict]:
         cur = self.conn.cursor()
@@ -235,11 +402,11 @@ class MedicalChecksStorage(BaseStorage):
                       ON mc.template_id = n.template_id
                 JOIN medical_check_items mci
                       ON mci.check_id = mc.check_id
-                    AND mci.name = ti.name COLLATE NOCASE
+                    AND lower(mci.name) = lower(ti.name)
                 WHERE mc.patient_id = ?
                     AND LOWER(ti.input_type) = 'number'
                 GROUP BY n.name, ti.name
-                ORDER BY label COLLATE NOCASE
+                ORDER BY lower(n.name || ' -> ' || ti.name)
                 """,
                 [patient_id],
             )
@@ -1,7 +1,9 @@
-import sqlite3
+from collections.abc import Iterator
+from datetime import datetime
 from typing import Any
 
 from src.data_access.addresses import AddressesStorage
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.address import Address
 from src.models.address_utils import build_address
@@ -9,7 +11,7 @@ from src.models.patient import Patient
 
 
 class PatientsStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         super().__init__(conn)
         self._addresses = AddressesStorage(conn)
 
@@ -31,6 +33,7 @@ class PatientsStorage(BaseStorage):
                 email = excluded.email,
                 phone = excluded.phone,
                 notes = excluded.notes
+            RETURNING patient_id
             """,
             [
                 patient.patient_id,
@@ -46,45 +49,88 @@ class PatientsStorage(BaseStorage):
             ],
         )
 
-        if patient.patient_id is None and cur.lastrowid is not None:
-            patient.patient_id = int(cur.lastrowid)
+        (patient_id,) = cur.fetchone()
+        if patient.patient_id is None:
+            patient.patient_id = int(patient_id)
 
         if patient.patient_id is not None:
             self._addresses.upsert_for_patient(patient.patient_id, patient.address)
         self.conn.commit()
+        if identity_map := self._identity_map:
+            identity_map.discard("patient", patient.patient_id)
         return patient
 
-    def get_all_patients(self) -> list[Patient]:
+    def exists(self, patient_id: int) -> bool:
+        if (identity_map := self._identity_map) and identity_map.get("patient", patient_id):
+            return True
+        return self.conn.execute("SELECT 1 FROM patients WHERE patient_id = ?", [patient_id]).fetchone() is not None
+
+    def get_all_patients(self, *, include_archived: bool = False) -> list[Patient]:
+        return list(self.iter_patients(include_archived=include_archived))
+
+    def iter_patients(self, batch_size: int = 500, *, include_archived: bool = False) -> Iterator[Patient]:
+        """Yield every patient, newest first, reading `batch_size` rows at a time from an open cursor.
+
+        Unlike get_all_patients, memory use does not grow with the number of patients. Archived patients
+        are only included with include_archived.
+        """
         cur = self.conn.cursor()
-        query = """
+        try:
+            cur.execute(
+                f"""
                 SELECT p.*, a.line_1, a.line_2, a.town, a.postcode, a.country
-                FROM patients p
-                LEFT JOIN addresses a ON a.patient_id = p.patient_id
+                FROM {self._table("patients", include_archived)} p
+                LEFT JOIN {self._table("addresses", include_archived)} a ON a.patient_id = p.patient_id
                 ORDER BY p.patient_id DESC
-              """
-
-        try:
-            cur.execute(query)
-            return [_row_to_patient(row) for row in self._fetch_all_dicts(cur)]
+                """
+            )
+            cols = [d[0] for d in cur.description]
+            while rows := cur.fetchmany(batch_size):
+                for row in rows:
+                    yield _row_to_patient(dict(zip(cols, row)))
         finally:
             cur.close()
 
-    def get_patient(self, patient_id: int) -> Patient | None:
+    def get_version(self, patient_id: int) -> tuple[int, datetime | None] | None:
+        """Change version and last change time of everything stored for a patient; None if no such patient.
+
+        The version is bumped by triggers on every table holding patient data, so it also moves when
+        another process writes.
+        """
+        row = self.conn.execute(
+            """
+            SELECT coalesce(v.version, 0), v.updated_at
+            FROM patients p
+            LEFT JOIN patient_versions v ON v.patient_id = p.patient_id
+            WHERE p.patient_id = ?
+            """,
+            [patient_id],
+        ).fetchone()
+        return (int(row[0]), row[1]) if row else None
+
+    def get_patient(self, patient_id: int, *, include_archived: bool = False) -> Patient | None:
+        identity_map = self._identity_map
+        if identity_map and (patient := identity_map.get("patient", patient_id)):
+            return patient
+
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
+                f"""
                 SELECT p.patient_id, p.title, p.first_name, p.middle_name, p.last_name,
                        p.sex, p.dob, p.email, p.phone, p.notes,
                        a.line_1, a.line_2, a.town, a.postcode, a.country
-                FROM patients p
-                LEFT JOIN addresses a ON a.patient_id = p.patient_id
+                FROM {self._table("patients", include_archived)} p
+                LEFT JOIN {self._table("addresses", include_archived)} a ON a.patient_id = p.patient_id
                 WHERE p.patient_id = ?
                 """,
                 [patient_id],
             )
             if r := self._fetch_one_dict(cur):
-                return _row_to_patient(r)
+                patient = _row_to_patient(r)
+                if identity_map:
+                    identity_map.add("patient", patient_id, patient)
+                return patient
             return None
         finally:
             cur.close()
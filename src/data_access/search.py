@@ -0,0 +1,129 @@
+import html
+import re
+from collections.abc import Iterator
+
+from src.data_access.backends import Connection
+from src.data_access.base import BaseStorage
+from src.models.search import SearchResult
+
+SNIPPET_TOKENS = 12
+# Text search configuration of the PostgreSQL search indexes (see db_migrations/postgresql)
+SEARCH_CONFIG = "english"
+# Control characters cannot occur in indexed text, so they are safe to mark matches before escaping
+_MATCH_START, _MATCH_END = "\x02", "\x03"
+
+
+def _terms(text: str) -> Iterator[tuple[str, bool]]:
+    """The phrases and words of `text` worth searching for, each with whether it is a prefix search."""
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        value = (phrase or word.rstrip("*")).strip()
+        if any(c.isalnum() for c in value):
+            yield value, word.endswith("*")
+
+
+def to_fts_query(text: str) -> str | None:
+    """Turn free text into an FTS5 query that cannot raise a syntax error.
+
+    Double-quoted phrases are kept as phrases, every other word must match, and a trailing `*` makes a
+    word a prefix search. Returns None when nothing searchable is left.
+    """
+    terms = ['"' + value.replace('"', '""') + '"' + ("*" if prefix else "") for value, prefix in _terms(text)]
+    return " ".join(terms) or None
+
+
+def to_tsquery(text: str) -> str | None:
+    """The PostgreSQL to_tsquery() equivalent of to_fts_query(): the same phrases, words and prefixes."""
+    terms = []
+    for value, prefix in _terms(text):
+        if words := re.findall(r"\w+", value):
+            terms.append(" <-> ".join(f"'{word}'" for word in words) + (":*" if prefix else ""))
+    return " & ".join(terms) or None
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+class SearchStorage(BaseStorage):
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+
+    def search(self, query: str, *, patient_id: int | None = None, limit: int, offset: int = 0) -> list[SearchResult]:
+        """Rank notes, attachment text and transcripts matching `query` by bm25, best match first."""
+        if self.dialect.name == "postgresql":
+            return self._search_postgres(query, patient_id=patient_id, limit=limit, offset=offset)
+        if not (fts_query := to_fts_query(query)):
+            return []
+
+        match = f"body : ({fts_query})"
+        if patient_id is not None:
+            match = f'patient_id : "{int(patient_id)}" AND {match}'
+
+        cur = self.conn.cursor()
+        try:
+            # Rank and page inside the FTS query so SQLite only joins the rows it returns
+            cur.execute(
+                """
+                SELECT d.patient_id,
+                       d.check_id,
+                       d.source,
+                       d.source_id,
+                       mc.check_date,
+                       t.name AS template_name,
+                       d.snippet,
+                       d.rank
+                FROM (
+                    SELECT patient_id, check_id, source, source_id, rank,
+                           snippet(search_documents, 0, ?, ?, '…', ?) AS snippet
+                    FROM search_documents
+                    WHERE search_documents MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                ) d
+                LEFT JOIN medical_checks mc ON mc.check_id = d.check_id
+                LEFT JOIN medical_check_templates t ON t.template_id = mc.template_id
+                ORDER BY d.rank
+                """,
+                [_MATCH_START, _MATCH_END, SNIPPET_TOKENS, match, limit, offset],
+            )
+            rows = self._fetch_all_dicts(cur)
+        finally:
+            cur.close()
+
+        return [SearchResult(**{**row, "snippet": _highlight(row["snippet"])}) for row in rows]
+
+    def _search_postgres(self, query: str, *, patient_id: int | None, limit: int, offset: int) -> list[SearchResult]:
+        """As search(), over the search_documents view and its GIN indexes; ranked by ts_rank_cd, negated."""
+        if not (ts_query := to_tsquery(query)):
+            return []
+
+        patient_filter = "AND d.patient_id = ?" if patient_id is not None else ""
+        headline = f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords={SNIPPET_TOKENS}, MinWords=3"
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT d.patient_id,
+                       d.check_id,
+                       d.source,
+                       d.source_id,
+                       mc.check_date,
+                       t.name AS template_name,
+                       ts_headline('{SEARCH_CONFIG}', d.body, q, ?) AS snippet,
+                       -ts_rank_cd(to_tsvector('{SEARCH_CONFIG}', d.body), q) AS rank
+                FROM search_documents d
+                CROSS JOIN to_tsquery('{SEARCH_CONFIG}', ?) q
+                LEFT JOIN medical_checks mc ON mc.check_id = d.check_id
+                LEFT JOIN medical_check_templates t ON t.template_id = mc.template_id
+                WHERE to_tsvector('{SEARCH_CONFIG}', d.body) @@ q
+                  {patient_filter}
+                ORDER BY rank, d.source, d.source_id
+                LIMIT ? OFFSET ?
+                """,
+                [headline, ts_query, *([patient_id] if patient_id is not None else []), limit, offset],
+            )
+            rows = self._fetch_all_dicts(cur)
+        finally:
+            cur.close()
+
+        return [SearchResult(**{**row, "snippet": _highlight(row["snippet"])}) for row in rows]
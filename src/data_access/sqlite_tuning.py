@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from logging import getLogger
+
+from settings import SqliteProfile
+from src.data_access.backends import Connection
+
+logger = getLogger(__name__)
+
+# Rows ANALYZE samples per index during maintenance, so statistics stay cheap to refresh on large tables
+ANALYSIS_LIMIT = 1000
+# PRAGMA optimize mask: the default checks (0xfffe without the debug bit) applied to every table, not only
+# those this connection has queried, as the worker's connection has seen few of the app's queries
+OPTIMIZE_ALL_TABLES = 0x10002
+
+
+@dataclass
+class MaintenanceReport:
+    freelist_pages_before: int
+    freelist_pages_after: int
+
+    @property
+    def vacuumed_pages(self) -> int:
+        return self.freelist_pages_before - self.freelist_pages_after
+
+
+def apply_profile(conn: Connection, profile: SqliteProfile, *, read_only: bool = False) -> None:
+    # busy_timeout first, so switching the journal mode waits for other connections instead of failing
+    conn.execute(f"PRAGMA busy_timeout = {int(profile.busy_timeout_ms)}")
+    if not read_only:
+        # journal_mode is stored in the database file for WAL; for the others it is per connection
+        conn.execute(f"PRAGMA journal_mode = {profile.journal_mode}").fetchone()
+    conn.execute(f"PRAGMA synchronous = {profile.synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(profile.cache_size)}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}").fetchone()
+    conn.execute(f"PRAGMA temp_store = {profile.temp_store}")
+
+
+def run_maintenance(conn: Connection, *, vacuum_pages: int) -> MaintenanceReport:
+    """Refresh query planner statistics where they are stale and hand up to `vacuum_pages` free pages back.
+
+    Free pages are only given back on databases with auto_vacuum = INCREMENTAL (migration 0014); elsewhere
+    the freelist is reused by later inserts instead.
+    """
+    freelist_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}").fetchone()
+    # Runs ANALYZE only on the tables whose statistics are missing or out of date
+    conn.execute(f"PRAGMA optimize = {OPTIMIZE_ALL_TABLES}").fetchall()
+    if freelist_before and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # incremental_vacuum frees one page per step, so the statement must be stepped to the end
+        conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+    conn.commit()
+    report = MaintenanceReport(freelist_before, conn.execute("PRAGMA freelist_count").fetchone()[0])
+    logger.info(f"Database maintenance done; {report.vacuumed_pages} free pages returned")
+    return report
@@ -1,11 +1,10 @@
-import sqlite3
-
+from src.data_access.backends import Connection
 from src.data_access.base import BaseStorage
 from src.models.medical_check import VoiceRecording
 
 
 class VoiceRecordingsStorage(BaseStorage):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, conn: Connection):
         super().__init__(conn)
 
     def insert_recording(self, *, check_id: int, file_path: str) -> int:
@@ -13,10 +12,14 @@ class VoiceRecordingsStorage(BaseStorage):
             """
             INSERT INTO voice_recordings (check_id, file_path)
             VALUES (?, ?)
+            RETURNING voice_recording_id
             """,
             [check_id, file_path],
         )
-        return int(cur.lastrowid) if cur.lastrowid else 0
+        (voice_recording_id,) = cur.fetchone()
+        if identity_map := self._identity_map:
+            identity_map.discard("medical_check", check_id)
+        return int(voice_recording_id)
 
     def get_recordings_by_check_id(self, check_id: int) -> list[VoiceRecording]:
         cur = self.conn.cursor()
@@ -34,6 +37,27 @@ class VoiceRecordingsStorage(BaseStorage):
         finally:
             cur.close()
 
+    def get_recording(self, *, patient_id: int, check_id: int, voice_recording_id: int) -> VoiceRecording | None:
+        """The recording, if it belongs to that check of that patient; archived ones included."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                f"""
+                SELECT voice_recording_id, check_id, file_path
+                FROM {self._table("voice_recordings", include_archived=True)}
+                WHERE voice_recording_id = ?
+                  AND check_id = ?
+                  AND check_id IN (
+                      SELECT check_id FROM {self._table("medical_checks", include_archived=True)} WHERE patient_id = ?
+                  )
+                """,
+                [voice_recording_id, check_id, patient_id],
+            )
+            row = self._fetch_one_dict(cur)
+            return VoiceRecording(**row) if row else None
+        finally:
+            cur.close()
+
     def update_transcription(self, *, voice_recording_id: int, full_text: str, summary: str | None = None) -> None:
         self.conn.execute(
             """
@@ -44,3 +68,6 @@ class VoiceRecordingsStorage(BaseStorage):
             [full_text, summary, voice_recording_id],
         )
         self.conn.commit()
+        # Only the recording id is known here, so drop every cached check rather than look it up
+        if identity_map := self._identity_map:
+            identity_map.discard_kind("medical_check")
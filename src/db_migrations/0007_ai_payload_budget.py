@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+
+@with_logging
+def _add_summary_to_attachments(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE medical_check_attachments ADD COLUMN summary TEXT;")
+
+
+@with_logging
+def _add_token_counts_to_ai_requests(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE ai_requests ADD COLUMN token_counts_json JSON;")
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _add_summary_to_attachments(conn)
+    _add_token_counts_to_ai_requests(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    for table, column in (("ai_requests", "token_counts_json"), ("medical_check_attachments", "summary")):
+        try:
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN {column};")
+        except sqlite3.OperationalError:
+            logger.warning(
+                f"Could not drop column '{column}' from '{table}' table. This might be due to an older SQLite version."
+            )
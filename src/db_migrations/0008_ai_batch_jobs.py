@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+
+@with_logging
+def _add_payload_hash_to_ai_requests(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE ai_requests ADD COLUMN payload_hash TEXT;")
+
+
+@with_logging
+def _create_ai_batch_jobs(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_batch_jobs (
+            job_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+            status      TEXT    NOT NULL DEFAULT 'pending',
+            created_at  DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at  DATETIME,
+            finished_at DATETIME
+        );
+        """)
+
+
+# No FK to patients: unknown or since-deleted patients are recorded as failed items instead
+@with_logging
+def _create_ai_batch_job_items(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_batch_job_items (
+            job_id     INTEGER NOT NULL,
+            patient_id INTEGER NOT NULL,
+            position   INTEGER NOT NULL,
+            status     TEXT    NOT NULL DEFAULT 'pending',
+            attempts   INTEGER NOT NULL DEFAULT 0,
+            error      TEXT,
+            updated_at DATETIME,
+            PRIMARY KEY (job_id, patient_id),
+            FOREIGN KEY (job_id)
+                REFERENCES ai_batch_jobs (job_id)
+                ON DELETE CASCADE
+                ON UPDATE CASCADE
+        );
+        """)
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_ai_batch_job_items_job_id_status
+            ON ai_batch_job_items(job_id, status);
+        """
+    )
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _add_payload_hash_to_ai_requests(conn)
+    _create_ai_batch_jobs(conn)
+    _create_ai_batch_job_items(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS ai_batch_job_items;")
+    conn.execute("DROP TABLE IF EXISTS ai_batch_jobs;")
+    try:
+        conn.execute("ALTER TABLE ai_requests DROP COLUMN payload_hash;")
+    except sqlite3.OperationalError:
+        logger.warning(
+            "Could not drop column 'payload_hash' from 'ai_requests' table. This might be due to an older SQLite version."
+        )
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+_TEMPLATE_TABLES = ("medical_check_templates", "medical_check_template_items")
+_EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+@with_logging
+def _create_catalogue_versions(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalogue_versions (
+            name    TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        """)
+    conn.execute("INSERT OR IGNORE INTO catalogue_versions (name, version) VALUES ('medical_check_templates', 0);")
+
+
+# Any write to the template tables, from any connection or process, bumps the version that
+# MedicalCheckTemplatesStorage compares against before serving its cached catalogue
+@with_logging
+def _create_template_version_triggers(conn: sqlite3.Connection) -> None:
+    for table in _TEMPLATE_TABLES:
+        for event in _EVENTS:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE catalogue_versions SET version = version + 1 WHERE name = 'medical_check_templates';
+                END;
+                """)
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _create_catalogue_versions(conn)
+    _create_template_version_triggers(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    for table in _TEMPLATE_TABLES:
+        for event in _EVENTS:
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event.lower()}_version;")
+    conn.execute("DROP TABLE IF EXISTS catalogue_versions;")
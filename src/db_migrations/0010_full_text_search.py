@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+# rowid = source id * SOURCE_COUNT + source code, so each trigger can address its document by rowid.
+# Keep in sync with src/data_access/search.py
+SOURCE_COUNT = 3
+CHECK_NOTES, ATTACHMENT, VOICE_RECORDING = 0, 1, 2
+
+
+# A single index (rather than one per source) keeps bm25 statistics comparable across notes,
+# letters and transcripts; the text is stored in the index so snippet() works without joins.
+# patient_id is indexed so a patient filter is a posting-list intersection rather than a scan of
+# every match, and weighted 0 so it never affects ranking
+@with_logging
+def _create_search_documents(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5(
+            body,
+            patient_id,
+            source     UNINDEXED,
+            source_id  UNINDEXED,
+            check_id   UNINDEXED,
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        );
+        """)
+    conn.execute("INSERT INTO search_documents (search_documents, rank) VALUES ('rank', 'bm25(1.0, 0.0)');")
+
+
+@with_logging
+def _create_medical_check_triggers(conn: sqlite3.Connection) -> None:
+    rowid = f"{{row}}.check_id * {SOURCE_COUNT} + {CHECK_NOTES}"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_medical_checks_search_insert
+        AFTER INSERT ON medical_checks
+        WHEN new.notes IS NOT NULL AND new.notes != ''
+        BEGIN
+            INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+            VALUES ({rowid.format(row="new")}, new.notes, 'check_notes', new.check_id, new.check_id, new.patient_id);
+        END;
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_medical_checks_search_update
+        AFTER UPDATE OF notes ON medical_checks
+        BEGIN
+            DELETE FROM search_documents WHERE rowid = {rowid.format(row="old")};
+            INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+            SELECT {rowid.format(row="new")}, new.notes, 'check_notes', new.check_id, new.check_id, new.patient_id
+            WHERE new.notes IS NOT NULL AND new.notes != '';
+        END;
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_medical_checks_search_delete
+        AFTER DELETE ON medical_checks
+        BEGIN
+            DELETE FROM search_documents WHERE rowid = {rowid.format(row="old")};
+        END;
+        """)
+
+
+# Transcripts are stored as diarized JSON; index the plain "text" field when there is one
+TRANSCRIPT_TEXT = (
+    "CASE WHEN json_valid({column}) THEN coalesce(json_extract({column}, '$.text'), {column}) ELSE {column} END"
+)
+
+
+def _create_child_triggers(
+    conn: sqlite3.Connection,
+    *,
+    table: str,
+    id_column: str,
+    text_column: str,
+    source: str,
+    code: int,
+    body: str = "{column}",
+) -> None:
+    rowid = f"{{row}}.{id_column} * {SOURCE_COUNT} + {code}"
+    insert_select = f"""
+        INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+        SELECT {rowid.format(row="new")}, {body.format(column=f"new.{text_column}")}, '{source}',
+               new.{id_column}, new.check_id, mc.patient_id
+        FROM medical_checks mc
+        WHERE mc.check_id = new.check_id
+          AND new.{text_column} IS NOT NULL AND new.{text_column} != '';
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_search_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            {insert_select}
+        END;
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update
+        AFTER UPDATE OF {text_column} ON {table}
+        BEGIN
+            DELETE FROM search_documents WHERE rowid = {rowid.format(row="old")};
+            {insert_select}
+        END;
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM search_documents WHERE rowid = {rowid.format(row="old")};
+        END;
+        """)
+
+
+@with_logging
+def _create_attachment_triggers(conn: sqlite3.Connection) -> None:
+    _create_child_triggers(
+        conn,
+        table="medical_check_attachments",
+        id_column="attachment_id",
+        text_column="parsed_content",
+        source="attachment",
+        code=ATTACHMENT,
+    )
+
+
+@with_logging
+def _create_voice_recording_triggers(conn: sqlite3.Connection) -> None:
+    _create_child_triggers(
+        conn,
+        table="voice_recordings",
+        id_column="voice_recording_id",
+        text_column="full_text",
+        source="voice_recording",
+        code=VOICE_RECORDING,
+        body=TRANSCRIPT_TEXT,
+    )
+
+
+@with_logging
+def _index_existing_documents(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+        SELECT check_id * {SOURCE_COUNT} + {CHECK_NOTES}, notes, 'check_notes', check_id, check_id, patient_id
+        FROM medical_checks
+        WHERE notes IS NOT NULL AND notes != '';
+        """)
+    conn.execute(f"""
+        INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+        SELECT a.attachment_id * {SOURCE_COUNT} + {ATTACHMENT}, a.parsed_content, 'attachment',
+               a.attachment_id, a.check_id, mc.patient_id
+        FROM medical_check_attachments a
+        JOIN medical_checks mc ON mc.check_id = a.check_id
+        WHERE a.parsed_content IS NOT NULL AND a.parsed_content != '';
+        """)
+    conn.execute(f"""
+        INSERT INTO search_documents (rowid, body, source, source_id, check_id, patient_id)
+        SELECT v.voice_recording_id * {SOURCE_COUNT} + {VOICE_RECORDING}, {TRANSCRIPT_TEXT.format(column="v.full_text")},
+               'voice_recording', v.voice_recording_id, v.check_id, mc.patient_id
+        FROM voice_recordings v
+        JOIN medical_checks mc ON mc.check_id = v.check_id
+        WHERE v.full_text IS NOT NULL AND v.full_text != '';
+        """)
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _create_search_documents(conn)
+    _create_medical_check_triggers(conn)
+    _create_attachment_triggers(conn)
+    _create_voice_recording_triggers(conn)
+    _index_existing_documents(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    for table in ("medical_checks", "medical_check_attachments", "voice_recordings"):
+        for event in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_search_{event};")
+    conn.execute("DROP TABLE IF EXISTS search_documents;")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+# Tables whose rows belong to a patient, and how to find that patient from a NEW/OLD row
+_PATIENT_OF = {
+    "patients": "{row}.patient_id",
+    "addresses": "{row}.patient_id",
+    "medical_checks": "{row}.patient_id",
+    "medical_check_items": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "medical_check_attachments": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "voice_recordings": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "ai_requests": "{row}.patient_id",
+    "ai_responses": "(SELECT patient_id FROM ai_requests WHERE id = {row}.request_id)",
+}
+_EVENTS = {"INSERT": "new", "UPDATE": "new", "DELETE": "old"}
+
+
+@with_logging
+def _create_patient_versions(conn: sqlite3.Connection) -> None:
+    # No FK to patients: versions must keep increasing even if a patient row is deleted and its id reused
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS patient_versions (
+            patient_id INTEGER PRIMARY KEY,
+            version    INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME
+        );
+        """)
+    conn.execute("""
+        INSERT OR IGNORE INTO patient_versions (patient_id, version, updated_at)
+        SELECT patient_id, 1, CURRENT_TIMESTAMP FROM patients;
+        """)
+
+
+@with_logging
+def _create_patient_version_triggers(conn: sqlite3.Connection) -> None:
+    for table, patient_of in _PATIENT_OF.items():
+        for event, row in _EVENTS.items():
+            patient_id = patient_of.format(row=row)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_patient_version
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO patient_versions (patient_id, version, updated_at)
+                    SELECT {patient_id}, 1, CURRENT_TIMESTAMP
+                    WHERE {patient_id} IS NOT NULL
+                    ON CONFLICT(patient_id) DO UPDATE SET
+                        version = version + 1,
+                        updated_at = excluded.updated_at;
+                END;
+                """)
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _create_patient_versions(conn)
+    _create_patient_version_triggers(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    for table in _PATIENT_OF:
+        for event in _EVENTS:
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event.lower()}_patient_version;")
+    conn.execute("DROP TABLE IF EXISTS patient_versions;")
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+from src.models.ai_summary import AiSummary
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+
+@with_logging
+def _create_ai_summaries(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_summaries (
+            response_id   INTEGER PRIMARY KEY,
+            sections_json JSON    NOT NULL,
+            charts_json   JSON    NOT NULL DEFAULT '[]',
+            FOREIGN KEY (response_id)
+                REFERENCES ai_responses (id)
+                ON DELETE CASCADE
+                ON UPDATE CASCADE
+        );
+        """)
+
+
+# Responses saved before this migration are parsed here, so reads never have to write
+@with_logging
+def _summarise_existing_responses(conn: sqlite3.Connection) -> None:
+    rows = conn.execute("SELECT id, response_json FROM ai_responses").fetchall()
+    for response_id, response_json in rows:
+        data = AiSummary.from_response_json(response_json, response_id=response_id).model_dump(mode="json")
+        conn.execute(
+            "INSERT OR IGNORE INTO ai_summaries (response_id, sections_json, charts_json) VALUES (?, ?, ?)",
+            [response_id, json.dumps(data["sections"]), json.dumps(data["charts"])],
+        )
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _create_ai_summaries(conn)
+    _summarise_existing_responses(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS ai_summaries;")
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+
+# Times are stored with milliseconds so retry backoff and leases are not rounded to whole seconds
+@with_logging
+def _create_jobs(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind             TEXT     NOT NULL,
+            payload_json     JSON     NOT NULL DEFAULT '{}',
+            dedupe_key       TEXT,
+            status           TEXT     NOT NULL DEFAULT 'queued',
+            attempts         INTEGER  NOT NULL DEFAULT 0,
+            max_attempts     INTEGER  NOT NULL DEFAULT 5,
+            run_at           DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            lease_owner      TEXT,
+            lease_expires_at DATETIME,
+            last_error       TEXT,
+            created_at       DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            finished_at      DATETIME
+        );
+        """)
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at
+            ON jobs(status, run_at);
+        """
+    )
+    # At most one queued job per dedupe key: enqueueing the same work again before it has started is a no-op
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_queued_dedupe_key
+            ON jobs(dedupe_key)
+            WHERE status = 'queued' AND dedupe_key IS NOT NULL;
+        """
+    )
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _create_jobs(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS jobs;")
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sqlite3
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+
+def _vacuum(conn: sqlite3.Connection) -> None:
+    # VACUUM cannot run inside a transaction, and auto_vacuum only changes on an existing database by
+    # rebuilding it. This rewrites the whole file once, so it takes a while on a large database.
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("VACUUM")
+
+
+# With INCREMENTAL, pages freed by deletes (dead jobs, archived rows, FTS merges) can be handed back to the OS
+# a bounded number at a time by the worker's maintenance job, instead of only by a full VACUUM
+@with_logging
+def _enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+    _vacuum(conn)
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _enable_incremental_vacuum(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA auto_vacuum = NONE;")
+    _vacuum(conn)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+from collections.abc import Callable
+from logging import getLogger
+
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+# Without AUTOINCREMENT SQLite hands the highest id out again once its row is gone. When that row was moved to
+# the archive, the new row would share its id with the archived one, and reads with include_archived would mix
+# the two up
+_ID_COLUMNS = {
+    "patients": "patient_id",
+    "medical_checks": "check_id",
+    "medical_check_attachments": "attachment_id",
+}
+
+
+def _with_autoincrement(sql: str, column: str) -> str:
+    return re.sub(
+        rf"\b({column}\s+INTEGER\s+PRIMARY\s+KEY)\b(?!\s+AUTOINCREMENT)", r"\1 AUTOINCREMENT", sql, flags=re.IGNORECASE
+    )
+
+
+def _without_autoincrement(sql: str, column: str) -> str:
+    return re.sub(rf"\b({column}\s+INTEGER\s+PRIMARY\s+KEY)\s+AUTOINCREMENT\b", r"\1", sql, flags=re.IGNORECASE)
+
+
+def _rebuild(conn: sqlite3.Connection, table: str, sql: str) -> None:
+    """Recreate `table` with the CREATE TABLE statement `sql`, keeping its rows, indexes and triggers."""
+    dependents = [
+        row[0]
+        for row in conn.execute(
+            "SELECT sql FROM sqlite_schema WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+            [table],
+        )
+    ]
+    conn.execute(re.sub(rf"^CREATE TABLE\s+[\"'`]?{table}[\"'`]?", f"CREATE TABLE {table}_rebuilt", sql))
+    conn.execute(f"INSERT INTO {table}_rebuilt SELECT * FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_rebuilt RENAME TO {table}")
+    for statement in dependents:
+        conn.execute(statement)
+
+
+def _rebuild_id_tables(conn: sqlite3.Connection, rewrite: Callable[[str, str], str]) -> None:
+    # With foreign keys enforced, dropping a parent table deletes every child row through ON DELETE CASCADE, and
+    # enforcement can only be switched off outside a transaction. legacy_alter_table keeps the rename from
+    # rewriting other tables' foreign keys and trigger bodies, which already name the table being rebuilt.
+    if conn.in_transaction:
+        conn.commit()
+    (foreign_keys,) = conn.execute("PRAGMA foreign_keys").fetchone()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("BEGIN")
+        # Rows that already broke a foreign key, e.g. from before enforcement was switched on, are left as they are
+        existing = set(conn.execute("PRAGMA foreign_key_check").fetchall())
+        for table, column in _ID_COLUMNS.items():
+            (sql,) = conn.execute("SELECT sql FROM sqlite_schema WHERE type = 'table' AND name = ?", [table]).fetchone()
+            _rebuild(conn, table, rewrite(sql, column))
+        if problems := set(conn.execute("PRAGMA foreign_key_check").fetchall()) - existing:
+            raise RuntimeError(f"Rebuilding {', '.join(_ID_COLUMNS)} broke foreign keys: {sorted(problems)[:5]}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+        conn.execute(f"PRAGMA foreign_keys = {int(foreign_keys)}")
+
+
+# Copying the rows in records each table's highest id in sqlite_sequence
+@with_logging
+def _use_autoincrement_ids(conn: sqlite3.Connection) -> None:
+    _rebuild_id_tables(conn, _with_autoincrement)
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    _use_autoincrement_ids(conn)
+
+
+@with_logging
+def downgrade(conn: sqlite3.Connection) -> None:
+    _rebuild_id_tables(conn, _without_autoincrement)
+    conn.execute("DELETE FROM sqlite_sequence WHERE name IN (?, ?, ?)", list(_ID_COLUMNS))
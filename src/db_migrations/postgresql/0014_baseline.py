@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+from logging import getLogger
+
+from src.data_access.backends import PostgresConnection
+from src.db_migrations.utils import with_logging
+
+logger = getLogger(__name__)
+logger.setLevel("INFO")
+
+# The schema the SQLite migrations up to 0014 build, for PostgreSQL. Later migrations come in pairs with the
+# same stem, one per backend. JSON is kept as TEXT as the storages read and write it as strings, and
+# DATETIME columns hold UTC like SQLite's CURRENT_TIMESTAMP.
+_UTC_NOW = "(now() AT TIME ZONE 'UTC')"
+
+_TABLES = {
+    "patients": """
+        patient_id  BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        title       TEXT   NOT NULL,
+        first_name  TEXT   NOT NULL,
+        middle_name TEXT,
+        last_name   TEXT   NOT NULL,
+        sex         TEXT   NOT NULL,
+        dob         DATE   NOT NULL,
+        email       TEXT   NOT NULL,
+        phone       TEXT   NOT NULL,
+        notes       TEXT
+    """,
+    "addresses": """
+        patient_id BIGINT PRIMARY KEY REFERENCES patients (patient_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        line_1     TEXT   NOT NULL,
+        line_2     TEXT,
+        town       TEXT   NOT NULL,
+        postcode   TEXT   NOT NULL,
+        country    TEXT   NOT NULL
+    """,
+    "medical_check_templates": """
+        template_id BIGINT  GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        name        TEXT    NOT NULL,
+        is_active   INTEGER NOT NULL DEFAULT 1
+    """,
+    "medical_checks": """
+        check_id    BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        patient_id  BIGINT NOT NULL REFERENCES patients (patient_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        template_id BIGINT NOT NULL REFERENCES medical_check_templates (template_id) ON UPDATE CASCADE,
+        check_date  DATE   NOT NULL,
+        status      TEXT   NOT NULL,
+        notes       TEXT
+    """,
+    "medical_check_items": """
+        check_item_id TEXT   PRIMARY KEY,
+        check_id      BIGINT NOT NULL REFERENCES medical_checks (check_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        name          TEXT   NOT NULL,
+        units         TEXT,
+        value         TEXT   NOT NULL
+    """,
+    # rowid stands in for SQLite's implicit one, which keeps template items in the order they were saved
+    "medical_check_template_items": """
+        rowid       BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        template_id BIGINT NOT NULL
+            REFERENCES medical_check_templates (template_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        name        TEXT,
+        units       TEXT,
+        input_type  TEXT,
+        placeholder TEXT
+    """,
+    "ai_requests": f"""
+        id                   BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        patient_id           BIGINT NOT NULL REFERENCES patients (patient_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        model_name           TEXT   NOT NULL,
+        model_url            TEXT   NOT NULL,
+        system_prompt_text   TEXT   NOT NULL,
+        request_payload_json TEXT   NOT NULL,
+        created_at           TIMESTAMP DEFAULT {_UTC_NOW},
+        token_counts_json    TEXT,
+        payload_hash         TEXT
+    """,
+    "ai_responses": f"""
+        id            BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        request_id    BIGINT NOT NULL REFERENCES ai_requests (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        response_json TEXT   NOT NULL,
+        created_at    TIMESTAMP DEFAULT {_UTC_NOW}
+    """,
+    "medical_check_attachments": """
+        attachment_id  BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        check_id       BIGINT NOT NULL REFERENCES medical_checks (check_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        filename       TEXT   NOT NULL,
+        content_type   TEXT,
+        file_path      TEXT   NOT NULL,
+        parsed_content TEXT,
+        summary        TEXT
+    """,
+    "voice_recordings": """
+        voice_recording_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        check_id           BIGINT NOT NULL REFERENCES medical_checks (check_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        file_path          TEXT   NOT NULL,
+        full_text          TEXT,
+        summary            TEXT
+    """,
+    "ai_batch_jobs": f"""
+        job_id      BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        status      TEXT   NOT NULL DEFAULT 'pending',
+        created_at  TIMESTAMP DEFAULT {_UTC_NOW},
+        started_at  TIMESTAMP,
+        finished_at TIMESTAMP
+    """,
+    "ai_batch_job_items": """
+        job_id     BIGINT  NOT NULL REFERENCES ai_batch_jobs (job_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        patient_id BIGINT  NOT NULL,
+        position   INTEGER NOT NULL,
+        status     TEXT    NOT NULL DEFAULT 'pending',
+        attempts   INTEGER NOT NULL DEFAULT 0,
+        error      TEXT,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (job_id, patient_id)
+    """,
+    "catalogue_versions": """
+        name    TEXT    PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    """,
+    "patient_versions": """
+        patient_id BIGINT  PRIMARY KEY,
+        version    INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP
+    """,
+    "ai_summaries": """
+        response_id   BIGINT PRIMARY KEY REFERENCES ai_responses (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        sections_json TEXT   NOT NULL,
+        charts_json   TEXT   NOT NULL DEFAULT '[]'
+    """,
+    "jobs": f"""
+        job_id           BIGINT  GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        kind             TEXT    NOT NULL,
+        payload_json     TEXT    NOT NULL DEFAULT '{{}}',
+        dedupe_key       TEXT,
+        status           TEXT    NOT NULL DEFAULT 'queued',
+        attempts         INTEGER NOT NULL DEFAULT 0,
+        max_attempts     INTEGER NOT NULL DEFAULT 5,
+        run_at           TIMESTAMP NOT NULL DEFAULT {_UTC_NOW},
+        lease_owner      TEXT,
+        lease_expires_at TIMESTAMP,
+        last_error       TEXT,
+        created_at       TIMESTAMP NOT NULL DEFAULT {_UTC_NOW},
+        finished_at      TIMESTAMP
+    """,
+}
+
+_INDEXES = (
+    "CREATE INDEX ix_medical_checks_patient_id ON medical_checks (patient_id)",
+    "CREATE INDEX ix_medical_checks_patient_id_date ON medical_checks (patient_id, check_date)",
+    "CREATE INDEX ix_medical_check_items_check_id ON medical_check_items (check_id)",
+    "CREATE INDEX ix_medical_check_items_name ON medical_check_items (name)",
+    "CREATE INDEX ix_mct_template_items_template_id ON medical_check_template_items (template_id)",
+    "CREATE INDEX ix_ai_requests_patient_id ON ai_requests (patient_id)",
+    "CREATE INDEX ix_ai_responses_request_id ON ai_responses (request_id)",
+    "CREATE INDEX ix_medical_check_attachments_check_id ON medical_check_attachments (check_id)",
+    "CREATE INDEX ix_voice_recordings_check_id ON voice_recordings (check_id)",
+    "CREATE INDEX ix_ai_batch_job_items_job_id_status ON ai_batch_job_items (job_id, status)",
+    "CREATE INDEX ix_jobs_status_run_at ON jobs (status, run_at)",
+    "CREATE UNIQUE INDEX ux_jobs_queued_dedupe_key ON jobs (dedupe_key) WHERE status = 'queued' AND dedupe_key IS NOT NULL",
+)
+
+# Tables whose rows belong to a patient, and how to find that patient from a NEW/OLD row
+_PATIENT_OF = {
+    "patients": "{row}.patient_id",
+    "addresses": "{row}.patient_id",
+    "medical_checks": "{row}.patient_id",
+    "medical_check_items": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "medical_check_attachments": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "voice_recordings": "(SELECT patient_id FROM medical_checks WHERE check_id = {row}.check_id)",
+    "ai_requests": "{row}.patient_id",
+    "ai_responses": "(SELECT patient_id FROM ai_requests WHERE id = {row}.request_id)",
+}
+_TEMPLATE_TABLES = ("medical_check_templates", "medical_check_template_items")
+# Upserts pass NULL for a new row's id, which SQLite turns into the next rowid
+_NULL_ID_TABLES = {"patients": "patient_id", "medical_check_templates": "template_id"}
+_SEARCH_CONFIG = "english"
+
+
+@with_logging
+def _create_tables(conn: PostgresConnection) -> None:
+    for table, columns in _TABLES.items():
+        conn.execute(f"CREATE TABLE {table} ({columns})")
+    for index in _INDEXES:
+        conn.execute(index)
+    conn.execute("INSERT INTO catalogue_versions (name, version) VALUES ('medical_check_templates', 0)")
+
+
+@with_logging
+def _create_null_id_triggers(conn: PostgresConnection) -> None:
+    conn.execute("""
+        CREATE FUNCTION fill_null_id() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF to_jsonb(NEW) ->> TG_ARGV[0] IS NULL THEN
+                NEW := jsonb_populate_record(NEW, jsonb_build_object(
+                    TG_ARGV[0], nextval(pg_get_serial_sequence(TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, TG_ARGV[0]))
+                ));
+            END IF;
+            RETURN NEW;
+        END $$
+        """)
+    for table, id_column in _NULL_ID_TABLES.items():
+        conn.execute(f"""
+            CREATE TRIGGER trg_{table}_fill_null_id
+            BEFORE INSERT ON {table}
+            FOR EACH ROW EXECUTE FUNCTION fill_null_id('{id_column}')
+            """)
+
+
+@with_logging
+def _create_template_version_triggers(conn: PostgresConnection) -> None:
+    conn.execute("""
+        CREATE FUNCTION bump_template_catalogue_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE catalogue_versions SET version = version + 1 WHERE name = 'medical_check_templates';
+            RETURN NULL;
+        END $$
+        """)
+    # Once per statement: the version only has to change, not count rows
+    for table in _TEMPLATE_TABLES:
+        conn.execute(f"""
+            CREATE TRIGGER trg_{table}_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_template_catalogue_version()
+            """)
+
+
+@with_logging
+def _create_patient_version_triggers(conn: PostgresConnection) -> None:
+    conn.execute(f"""
+        CREATE FUNCTION bump_patient_version(changed_patient_id BIGINT) RETURNS void LANGUAGE sql AS $$
+            INSERT INTO patient_versions (patient_id, version, updated_at)
+            SELECT changed_patient_id, 1, {_UTC_NOW}
+            WHERE changed_patient_id IS NOT NULL
+            ON CONFLICT (patient_id) DO UPDATE SET
+                version = patient_versions.version + 1,
+                updated_at = excluded.updated_at
+        $$
+        """)
+    for table, patient_of in _PATIENT_OF.items():
+        conn.execute(f"""
+            CREATE FUNCTION {table}_patient_version() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM bump_patient_version({patient_of.format(row="OLD")});
+                ELSE
+                    PERFORM bump_patient_version({patient_of.format(row="NEW")});
+                END IF;
+                RETURN NULL;
+            END $$
+            """)
+        conn.execute(f"""
+            CREATE TRIGGER trg_{table}_patient_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_patient_version()
+            """)
+
+
+# Stands in for SQLite's FTS5 index: one view over notes, attachment text and transcripts, read through
+# expression indexes on each source table
+@with_logging
+def _create_search_documents(conn: PostgresConnection) -> None:
+    conn.execute("""
+        CREATE FUNCTION transcript_text(full_text TEXT) RETURNS TEXT LANGUAGE plpgsql IMMUTABLE AS $$
+        BEGIN
+            RETURN COALESCE(full_text::jsonb ->> 'text', full_text);
+        EXCEPTION WHEN invalid_text_representation THEN
+            RETURN full_text;
+        END $$
+        """)
+    conn.execute("""
+        CREATE VIEW search_documents AS
+        SELECT mc.notes AS body, 'check_notes' AS source, mc.check_id AS source_id, mc.check_id, mc.patient_id
+        FROM medical_checks mc
+        WHERE mc.notes <> ''
+        UNION ALL
+        SELECT a.parsed_content, 'attachment', a.attachment_id, a.check_id, mc.patient_id
+        FROM medical_check_attachments a
+        JOIN medical_checks mc ON mc.check_id = a.check_id
+        WHERE a.parsed_content <> ''
+        UNION ALL
+        SELECT transcript_text(v.full_text), 'voice_recording', v.voice_recording_id, v.check_id, mc.patient_id
+        FROM voice_recordings v
+        JOIN medical_checks mc ON mc.check_id = v.check_id
+        WHERE v.full_text <> ''
+        """)
+    for table, body in (
+        ("medical_checks", "notes"),
+        ("medical_check_attachments", "parsed_content"),
+        ("voice_recordings", "transcript_text(full_text)"),
+    ):
+        conn.execute(f"CREATE INDEX ix_{table}_search ON {table} USING gin (to_tsvector('{_SEARCH_CONFIG}', {body}))")
+
+
+def upgrade(conn: PostgresConnection) -> None:
+    _create_tables(conn)
+    _create_null_id_triggers(conn)
+    _create_template_version_triggers(conn)
+    _create_patient_version_triggers(conn)
+    _create_search_documents(conn)
+
+
+@with_logging
+def downgrade(conn: PostgresConnection) -> None:
+    conn.execute("DROP VIEW IF EXISTS search_documents")
+    for table in reversed(_TABLES):
+        conn.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+    for function in (
+        "transcript_text(TEXT)",
+        "bump_patient_version(BIGINT)",
+        "bump_template_catalogue_version()",
+        "fill_null_id()",
+        *(f"{table}_patient_version()" for table in _PATIENT_OF),
+    ):
+        conn.execute(f"DROP FUNCTION IF EXISTS {function}")
@@ -4,15 +4,53 @@ from fastapi import Request
 
 from settings import Settings
 from src.data_access.db_storage import DbStorage
+from src.data_access.group_commit import DirectWriter, GroupedWriter
+from src.fragment_cache import FragmentCache, ScopedFragmentCache
+from src.services.ai_batch_service import AiBatchService
 from src.services.ai_service import AiService
 from src.services.mock_ai_service import MockAiService
+from src.tenancy import Shard
+
+
+def get_shard(request: Request) -> Shard:
+    """The database of the request's practice, checked out by PracticeMiddleware."""
+    return request.state.shard
 
 
 def get_storage(request: Request) -> DbStorage:
-    return request.app.storage
+    return get_shard(request).storage
 
 
-def get_ai_service(request: Request) -> AiService:
+def get_fragment_cache(request: Request) -> FragmentCache:
+    return request.app.state.fragment_cache
+
+
+def get_practice_fragments(request: Request) -> ScopedFragmentCache:
+    """The shared fragment cache, with keys kept apart per practice."""
+    return ScopedFragmentCache(request.app.state.fragment_cache, get_shard(request).practice.practice_id)
+
+
+Writer = DirectWriter | GroupedWriter
+
+
+def get_writer(request: Request) -> Writer:
+    """Where a request runs its writes: batched by the group commit writer when it is enabled."""
+    shard = get_shard(request)
+    if shard.writer:
+        return GroupedWriter(shard.writer, shard.storage)
+    return DirectWriter(shard.storage)
+
+
+def build_ai_service(storage: DbStorage) -> AiService:
     if os.getenv("AI_MOCK_MODE") in ("record", "playback"):
-        return MockAiService(request.app.storage, Settings().openai)
-    return AiService(request.app.storage, Settings().openai)
+        return MockAiService(storage, Settings().openai)
+    return AiService(storage, Settings().openai)
+
+
+def get_ai_service(request: Request) -> AiService:
+    return build_ai_service(get_storage(request))
+
+
+def get_ai_batch_service(request: Request) -> AiBatchService:
+    storage = get_storage(request)
+    return AiBatchService(storage, build_ai_service(storage), concurrency=Settings().openai.batch_concurrency)
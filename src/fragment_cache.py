@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from threading import Lock
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """LRU cache of rendered HTML fragments, bounded by the total length of the cached HTML.
+
+    Keys must contain everything the fragment depends on (typically an entity id plus its version),
+    so entries never need invalidating; stale ones simply age out.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries: OrderedDict[Hashable, Markup] = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        with self._lock:
+            if (fragment := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        fragment = Markup(render())
+        if len(fragment) > self.max_chars:
+            return fragment
+
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self._size -= len(previous)
+            self._entries[key] = fragment
+            self._size += len(fragment)
+            while self._size > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return fragment
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class ScopedFragmentCache:
+    """A FragmentCache seen through a key prefix, e.g. one per practice sharing the overall size bound."""
+
+    def __init__(self, cache: FragmentCache, scope: Hashable):
+        self.cache = cache
+        self.scope = scope
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        return self.cache.get_or_render((self.scope, key), render)
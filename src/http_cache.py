@@ -0,0 +1,87 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from email.utils import format_datetime
+
+from fastapi import Request, Response
+
+from src.data_access.db_storage import DbStorage
+from src.templating import TEMPLATES_DIR
+
+
+def _templates_fingerprint() -> str:
+    """Changes whenever a deploy changes the HTML templates, so cached pages are not reused across releases."""
+    digest = hashlib.sha256()
+    for path in sorted(TEMPLATES_DIR.glob("*.html")):
+        digest.update(path.name.encode())
+        digest.update(str(path.stat().st_mtime_ns).encode())
+    return digest.hexdigest()[:8]
+
+
+_TEMPLATES_FINGERPRINT = _templates_fingerprint()
+
+
+@dataclass(frozen=True)
+class PatientValidators:
+    """ETag and Last-Modified for a response derived from one patient's data."""
+
+    etag: str
+    last_modified: datetime | None
+    patient_version: int
+    catalogue_version: int
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "ETag": self.etag,
+            # Clinical data: the browser may keep it but must revalidate before every reuse
+            "Cache-Control": "private, no-cache",
+            "Vary": "Accept, HX-Request, X-Practice-Id",
+        }
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified.replace(tzinfo=UTC), usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """Weak comparison against If-None-Match, as RFC 9110 requires for GET."""
+        if not (header := request.headers.get("if-none-match")):
+            return False
+        if header.strip() == "*":
+            return True
+        own = self.etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == own for tag in header.split(","))
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers())
+
+    def apply(self, response: Response) -> Response:
+        response.headers.update(self.headers())
+        return response
+
+
+def patient_validators(
+    storage: DbStorage, patient_id: int, *, variant: str, daily: bool = False
+) -> PatientValidators | None:
+    """Validators for `variant` (e.g. "html" or "json") of a patient resource; None if the patient does not exist.
+
+    The tag combines the patient's change version with the template catalogue version, since check
+    lists show template names. `daily` also ties it to today's date, for pages showing the patient's age.
+    """
+    if (version := storage.patients.get_version(patient_id)) is None:
+        return None
+
+    patient_version, updated_at = version
+    catalogue_version = storage.medical_check_templates.catalogue_version
+    parts = [
+        f"p{patient_id}.{patient_version}",
+        f"t{catalogue_version}",
+        variant,
+        _TEMPLATES_FINGERPRINT,
+    ]
+    if daily:
+        parts.append(date.today().isoformat())
+    return PatientValidators(
+        etag=f'W/"{"-".join(parts)}"',
+        last_modified=updated_at,
+        patient_version=patient_version,
+        catalogue_version=catalogue_version,
+    )
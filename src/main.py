@@ -1,13 +1,15 @@
 from contextlib import asynccontextmanager
 
 import logging
-import uvicorn
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 
 from settings import Settings
-from src.data_access.db_storage import DbStorage
-from src.routes import medical_check_templates, medical_checks, patients, root
+from src.fragment_cache import FragmentCache
+from src.middleware import CompressionMiddleware, CompressionStats, UnitOfWorkMiddleware
+from src.routes import ai_batch_jobs, jobs, medical_check_templates, medical_checks, metrics, patients, root, search
+from src.static_assets import STATIC_DIR, STATIC_URL, StaticAssets
+from src.templating import configure_templates, precompile_templates
+from src.tenancy import PracticeMiddleware, ShardPool
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -16,24 +18,40 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    db_path = Settings().db_file
-    app.storage = storage = DbStorage(db_path)  # type: ignore
+    precompile_templates()
+    # Practice databases are opened on their first request; with sharding off there is just the one
+    app.state.shards = shards = ShardPool(Settings())
     yield
-    storage.close()
+    shards.close()
 
 
 def create_app() -> FastAPI:
+    settings = Settings()
+    configure_templates(
+        auto_reload=settings.template_auto_reload, bytecode_cache_dir=settings.template_bytecode_cache_dir
+    )
     app = FastAPI(lifespan=lifespan)
+    app.state.fragment_cache = FragmentCache(settings.fragment_cache_max_chars)
+    app.state.compression_stats = CompressionStats()
+    app.add_middleware(UnitOfWorkMiddleware)
+    app.add_middleware(PracticeMiddleware)
+    app.add_middleware(CompressionMiddleware, settings=settings.compression, stats=app.state.compression_stats)
     logger.info("Starting Medical Electronic System API")
-    app.mount("/static", StaticFiles(directory="src/static"), name="static")
+    app.mount(STATIC_URL, StaticAssets(directory=STATIC_DIR), name="static")
     app.include_router(root.router)
     app.include_router(patients.router, prefix="/patients")
     app.include_router(medical_checks.router, prefix="/patients/{patient_id}/medical_checks")
     app.include_router(medical_check_templates.router, prefix="/admin")
+    app.include_router(ai_batch_jobs.router, prefix="/admin")
+    app.include_router(jobs.router, prefix="/admin")
+    app.include_router(metrics.router, prefix="/admin")
+    app.include_router(search.router, prefix="/search")
     return app
 
 
 app = create_app()
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("src.main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,119 @@
+import asyncio
+import mimetypes
+import re
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+
+from src.data_access.blob_store import BlobStore, check_key
+
+_SINGLE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+# Types a browser shows without running anything. Any other upload, e.g. HTML or SVG sent as a "letter", could
+# run script on the app's own origin, so it is downloaded as opaque bytes instead
+_INLINE_TYPES = ("application/pdf", "text/plain")
+_INLINE_PREFIXES = ("image/", "audio/")
+_SCRIPTABLE_TYPES = ("image/svg+xml",)
+
+
+def served_as(content_type: str | None, filename: str) -> tuple[str, str]:
+    """The media type to serve an upload with, and whether it is shown `inline` or downloaded as `attachment`."""
+    media_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    essence = media_type.split(";", 1)[0].strip().lower()
+    if essence not in _SCRIPTABLE_TYPES and (essence in _INLINE_TYPES or essence.startswith(_INLINE_PREFIXES)):
+        return media_type, "inline"
+    return "application/octet-stream", "attachment"
+
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _headers(etag: str, filename: str, disposition: str) -> dict[str, str]:
+    headers = {
+        "ETag": etag,
+        # Clinical data: the browser may keep it but must revalidate before every reuse, which the strong
+        # ETag makes a cheap 304
+        "Cache-Control": "private, no-cache",
+        "Vary": "X-Practice-Id",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(disposition, filename),
+        # Uploads are served from the app's own origin, so never let the browser guess an HTML type
+        "X-Content-Type-Options": "nosniff",
+    }
+    if disposition == "attachment":
+        # Should a browser show a download anyway, it runs in a sandbox of an origin of its own. Not on the
+        # inline types, which run no script, as Chromium's PDF viewer renders nothing in a sandbox
+        headers["Content-Security-Policy"] = "sandbox"
+    return headers
+
+
+def _matches(etag: str, header: str) -> bool:
+    """Weak comparison against If-None-Match, as RFC 9110 requires for GET."""
+    own = etag.removeprefix("W/")
+    return header.strip() == "*" or any(tag.strip().removeprefix("W/") == own for tag in header.split(","))
+
+
+def byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """The first and last byte a single-range `Range` header asks for; None to send the whole blob.
+
+    Multiple ranges and malformed headers get the whole blob, which RFC 9110 allows. A range starting past
+    the end raises a 416.
+    """
+    if not header or not (match := _SINGLE_RANGE.fullmatch(header.strip())) or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last `last` bytes
+        if int(last) == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+async def media_response(
+    request: Request, blobs: BlobStore, key: str, *, filename: str, content_type: str | None = None
+) -> Response:
+    """Serve a stored attachment or recording with validators and byte ranges, for seeking in media players.
+
+    Buckets hand out a presigned URL and do the rest themselves. Local files go through FileResponse, which
+    answers ranges and uses the server's zero-copy `http.response.pathsend` where it offers one. Other stores
+    are streamed, one range at a time.
+    """
+    try:
+        check_key(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found") from None
+    media_type, disposition = served_as(content_type, filename)
+    if url := blobs.presigned_url(
+        key, content_type=media_type, content_disposition=_content_disposition(disposition, filename)
+    ):
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-store"})
+
+    info = await asyncio.to_thread(blobs.stat, key)
+    if info is None or info.etag is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    if content_type is None and info.content_type:
+        media_type, disposition = served_as(info.content_type, filename)
+    headers = _headers(info.etag, filename, disposition)
+    if (if_none_match := request.headers.get("if-none-match")) and _matches(info.etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if path := blobs.local_path(key):
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    if_range = request.headers.get("if-range")
+    selected = byte_range(request.headers.get("range"), info.size) if if_range in (None, info.etag) else None
+    if selected is None:
+        headers["Content-Length"] = str(info.size)
+        return StreamingResponse(blobs.iter_range(key), media_type=media_type, headers=headers)
+    first, last = selected
+    headers["Content-Range"] = f"bytes {first}-{last}/{info.size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        blobs.iter_range(key, first, last), status_code=206, media_type=media_type, headers=headers
+    )
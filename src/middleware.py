@@ -0,0 +1,162 @@
+import time
+import zlib
+from dataclasses import dataclass, field
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings import CompressionSettings
+from src.data_access.identity_map import unit_of_work
+from src.static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+
+class UnitOfWorkMiddleware:
+    """Run each HTTP request, including its background tasks, inside its own identity map."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with unit_of_work():
+            await self.app(scope, receive, send)
+
+
+@dataclass
+class EncodingStats:
+    responses: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_seconds: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size as a fraction of the original; lower is better."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+
+@dataclass
+class CompressionStats:
+    """Counters for tuning the CompressionMiddleware levels, served at /admin/metrics."""
+
+    encodings: dict[str, EncodingStats] = field(default_factory=dict)
+    skipped: int = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        stats = self.encodings.setdefault(encoding, EncodingStats())
+        stats.responses += 1
+        stats.bytes_in += bytes_in
+        stats.bytes_out += bytes_out
+        stats.cpu_seconds += cpu_seconds
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder that flushes after every chunk, so streamed pages keep streaming."""
+
+    def __init__(self, encoding: str, settings: CompressionSettings):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, *, last: bool) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if last else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Compress text responses (HTML, JSON, ...) with brotli or gzip, whichever the client accepts.
+
+    Responses that are small, already encoded, partial (Range requests) or of a type missing from
+    `settings.content_types` pass through unchanged; that keeps attachments and voice recordings as they are.
+    """
+
+    def __init__(self, app: ASGIApp, settings: CompressionSettings, stats: CompressionStats | None = None) -> None:
+        self.app = app
+        self.settings = settings
+        self.stats = stats if stats is not None else CompressionStats()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.settings.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(scope)
+        encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+        if "range" in Headers(scope=scope):
+            encoding = None
+
+        start: Message = {}
+        compressor: _Compressor | None = None
+        passthrough = False
+        bytes_in = bytes_out = 0
+        cpu_seconds = 0.0
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough, bytes_in, bytes_out, cpu_seconds
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # held back until the first body chunk shows whether to compress
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start)
+                if self._compressible(start["status"], headers):
+                    headers.add_vary_header("Accept-Encoding")
+                    size = int(headers.get("content-length", len(body)))
+                    if encoding is not None and (more_body or size >= self.settings.minimum_size):
+                        compressor = self._start(encoding, headers, streaming=more_body)
+                if compressor is None:
+                    passthrough = True
+                    self.stats.skipped += 1
+                    await send(start)
+                    await send(message)
+                    return
+
+            started = time.thread_time()
+            compressed = compressor.compress(body, last=not more_body)
+            cpu_seconds += time.thread_time() - started
+            bytes_in += len(body)
+            bytes_out += len(compressed)
+
+            if start:
+                if not more_body and "content-length" in MutableHeaders(scope=start):
+                    MutableHeaders(scope=start)["Content-Length"] = str(len(compressed))
+                await send(start)
+                start = {}
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            if not more_body:
+                self.stats.record(compressor.encoding, bytes_in, bytes_out, cpu_seconds)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return content_type in self.settings.content_types
+
+    def _start(self, encoding: str, headers: MutableHeaders, *, streaming: bool) -> _Compressor:
+        headers["Content-Encoding"] = encoding
+        if streaming:
+            del headers["Content-Length"]
+        if (etag := headers.get("etag")) and not etag.startswith("W/"):
+            # The encoded bytes differ from the original, so a strong validator no longer holds
+            headers["ETag"] = f"W/{etag}"
+        return _Compressor(encoding, self.settings)
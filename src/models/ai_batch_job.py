@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from src.models.enums import AiBatchJobStatus
+
+
+class AiBatchJob(BaseModel):
+    job_id: int
+    status: AiBatchJobStatus
+    total: int = Field(0, description="Number of patients in the job")
+    pending: int = Field(0, description="Patients not yet processed")
+    done: int = Field(0, description="Patients summarised")
+    skipped: int = Field(0, description="Patients skipped because their payload was unchanged")
+    failed: int = Field(0, description="Patients whose summary failed")
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    eta_seconds: float | None = Field(None, description="Estimated time to finish, based on the current run's pace")
@@ -10,4 +10,6 @@ class AiRequest(BaseModel):
     model_url: str
     system_prompt_text: str
     request_payload_json: str
+    token_counts_json: str | None = None
+    payload_hash: str | None = None
     created_at: datetime | None = None
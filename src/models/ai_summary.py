@@ -0,0 +1,61 @@
+import json
+from typing import Any, Self
+
+from pydantic import BaseModel, Field
+
+
+class AiSummarySection(BaseModel):
+    title: str | None = Field(default=None, description="Section heading; None for an unstructured summary")
+    html: str | None = Field(default=None, description="Trusted HTML provided by the model, rendered as-is")
+    text: str | None = None
+
+
+class AiSummary(BaseModel):
+    """The displayable content of an AI response, parsed once when the response is saved."""
+
+    response_id: int | None = None
+    sections: list[AiSummarySection] = Field(default_factory=list)
+    charts: list[Any] = Field(default_factory=list, description="Chart specs such as 'blood.Glucose'")
+
+    @classmethod
+    def from_response_json(cls, response_json: str, response_id: int | None = None) -> Self:
+        content: Any = _loads_or_none(response_json)
+        if content is None:
+            content = response_json
+        elif isinstance(content, dict) and (message := _first_message(content)) is not None:
+            content = message.get("content")
+            if isinstance(content, str) and content.strip().startswith(("{", "[")):
+                parsed = _loads_or_none(content)
+                content = content if parsed is None else parsed
+
+        if not isinstance(content, dict):
+            return cls(response_id=response_id, sections=[AiSummarySection(text=str(content))])
+
+        sections = []
+        for key, value in content.items():
+            if key.lower() == "charts":
+                continue
+            if isinstance(value, dict) and value.get("html"):
+                sections.append(AiSummarySection(title=key, html=value["html"]))
+            else:
+                text = value["text"] if isinstance(value, dict) and value.get("text") else value
+                sections.append(AiSummarySection(title=key, text=str(text)))
+
+        charts = content.get("Charts") or content.get("charts") or []
+        return cls(response_id=response_id, sections=sections, charts=charts if isinstance(charts, list) else [charts])
+
+
+def _loads_or_none(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_message(response: dict[str, Any]) -> dict[str, Any] | None:
+    choices = response.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        message = choices[0].get("message")
+        if isinstance(message, dict) and message:
+            return message
+    return None
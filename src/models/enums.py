@@ -27,6 +27,47 @@ class MedicalCheckStatus(StrEnum):
     GREEN = "Green"
 
 
+class AiBatchJobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+class AiBatchItemStatus(StrEnum):
+    PENDING = "pending"
+    DONE = "done"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    # Out of attempts; kept for inspection and never retried automatically
+    DEAD = "dead"
+
+
+class JobKind(StrEnum):
+    AI_SUMMARY = "ai_summary"
+    TRANSCRIBE_RECORDINGS = "transcribe_recordings"
+    AI_BATCH = "ai_batch"
+    DB_MAINTENANCE = "db_maintenance"
+
+
+class Projection(StrEnum):
+    """How much of a medical check to load: `summary` leaves out parsed attachment text and transcripts."""
+
+    SUMMARY = "summary"
+    FULL = "full"
+
+
+class SearchSource(StrEnum):
+    CHECK_NOTES = "check_notes"
+    ATTACHMENT = "attachment"
+    VOICE_RECORDING = "voice_recording"
+
+
 class AllergySeverity(str, Enum):
     MILD = "mild"
     MODERATE = "moderate"
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from src.models.enums import JobKind, JobStatus
+
+
+class Job(BaseModel):
+    job_id: int
+    kind: JobKind
+    payload: dict[str, Any] = Field(default_factory=dict)
+    dedupe_key: str | None = None
+    status: JobStatus
+    attempts: int = Field(0, description="Times the job has been leased, including the current run")
+    max_attempts: int
+    run_at: datetime | None = Field(None, description="Not leased before this time; pushed back after a failure")
+    lease_owner: str | None = None
+    lease_expires_at: datetime | None = None
+    last_error: str | None = None
+    created_at: datetime | None = None
+    finished_at: datetime | None = None
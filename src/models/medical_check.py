@@ -13,6 +13,7 @@ class MedicalCheckAttachment(BaseModel):
     content_type: str | None = Field(None, description="MIME type")
     file_path: str = Field(..., description="Local path to the file")
     parsed_content: str | None = Field(None, description="Extracted and parsed file content")
+    summary: str | None = Field(default=None, description="Condensed parsed content, computed once at upload")
 
 
 class VoiceRecording(BaseModel):
@@ -1,6 +1,6 @@
 from datetime import date
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 from src.models.address import Address
 from src.models.enums import Sex, Title
@@ -42,3 +42,7 @@ class Patient(BaseModel):
     @classmethod
     def convert_sex(cls, v: str | Sex) -> Sex:
         return Sex(v) if isinstance(v, str) else v
+
+
+class Patients(BaseModel):
+    records: list[Patient] = Field(default_factory=list)
@@ -0,0 +1,24 @@
+from datetime import date
+
+from pydantic import BaseModel, Field
+
+from src.models.enums import SearchSource
+
+
+class SearchResult(BaseModel):
+    patient_id: int
+    check_id: int
+    source: SearchSource
+    source_id: int = Field(..., description="check_id, attachment_id or voice_recording_id, depending on source")
+    check_date: date | None = None
+    template_name: str | None = None
+    snippet: str = Field(..., description="HTML-escaped excerpt with matches wrapped in <mark> tags")
+    rank: float = Field(..., description="bm25 score; lower is a better match")
+
+
+class SearchResults(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    has_more: bool = False
+    records: list[SearchResult] = Field(default_factory=list)
@@ -0,0 +1,58 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from src.data_access.db_storage import DbStorage
+from src.dependencies import get_ai_batch_service, get_storage
+from src.models.ai_batch_job import AiBatchJob
+from src.services.ai_batch_service import AiBatchService
+from src.services.job_worker import enqueue_ai_batch
+
+router = APIRouter()
+
+
+# JSON API: queue a batch of AI summaries (all patients when patient_ids is omitted) for the worker
+@router.post("/ai_batch_jobs")
+async def create_ai_batch_job(
+    request: Request,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    batch_service: Annotated[AiBatchService, Depends(get_ai_batch_service)],
+) -> JSONResponse:
+    data = await request.json() if "application/json" in (request.headers.get("content-type") or "") else {}
+
+    patient_ids = data.get("patient_ids")
+    if patient_ids is not None and not (isinstance(patient_ids, list) and all(isinstance(p, int) for p in patient_ids)):
+        raise HTTPException(status_code=422, detail="Field 'patient_ids' must be a list of integers")
+
+    job = batch_service.create_job(patient_ids)
+    enqueue_ai_batch(storage, job.job_id)
+
+    headers = {"Location": f"/admin/ai_batch_jobs/{job.job_id}"}
+    return JSONResponse(status_code=202, content=job.model_dump(mode="json"), headers=headers)
+
+
+# JSON API: progress report with ETA
+@router.get("/ai_batch_jobs/{job_id}")
+async def get_ai_batch_job(
+    job_id: int,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+) -> AiBatchJob:
+    if job := storage.ai_batch_jobs.get_job(job_id):
+        return job
+
+    raise HTTPException(status_code=404, detail=f"AI batch job with job_id={job_id} not found")
+
+
+# JSON API: queue an interrupted job again, optionally retrying failed patients
+@router.post("/ai_batch_jobs/{job_id}/resume")
+async def resume_ai_batch_job(
+    job_id: int,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    retry_failed: bool = False,
+) -> JSONResponse:
+    if not (job := storage.ai_batch_jobs.get_job(job_id)):
+        raise HTTPException(status_code=404, detail=f"AI batch job with job_id={job_id} not found")
+
+    enqueue_ai_batch(storage, job_id, retry_failed=retry_failed)
+    return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
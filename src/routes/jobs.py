@@ -0,0 +1,43 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.data_access.db_storage import DbStorage
+from src.dependencies import get_storage
+from src.models.enums import JobStatus
+from src.models.job import Job
+
+router = APIRouter()
+
+
+# JSON API: recent background jobs, e.g. ?status=dead for the dead letters
+@router.get("/jobs")
+async def list_jobs(
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    status: JobStatus | None = None,
+    limit: int = 100,
+) -> list[Job]:
+    return storage.jobs.get_jobs(status, limit=limit)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: int,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+) -> Job:
+    if job := storage.jobs.get_job(job_id):
+        return job
+
+    raise HTTPException(status_code=404, detail=f"Job with job_id={job_id} not found")
+
+
+# JSON API: queue a dead job again with a fresh set of attempts
+@router.post("/jobs/{job_id}/retry")
+async def retry_job(
+    job_id: int,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+) -> Job:
+    if job := storage.jobs.retry(job_id):
+        return job
+
+    raise HTTPException(status_code=409, detail=f"Job with job_id={job_id} is not a dead job")
@@ -2,14 +2,13 @@ from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 
 from src.data_access.db_storage import DbStorage
 from src.dependencies import get_storage
 from src.models.medical_check_template import MedicalCheckTemplate, MedicalCheckTemplateItem
+from src.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="src/templates")
 
 
 @router.get("/medical_check_templates", include_in_schema=False)
@@ -1,56 +1,56 @@
+import asyncio
 import datetime
 import json
 import logging
+import re
 from contextlib import suppress
-from pathlib import Path
-from typing import Annotated, Any
+from pathlib import Path, PurePosixPath
+from typing import Annotated, Any, BinaryIO
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pypdf import PdfReader
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 
+from src.data_access.blob_store import check_key
 from src.data_access.db_storage import DbStorage
-from src.dependencies import get_ai_service, get_storage
-from src.models.enums import MedicalCheckStatus
+from src.dependencies import Writer, get_practice_fragments, get_storage, get_writer
+from src.fragment_cache import ScopedFragmentCache
+from src.http_cache import patient_validators
+from src.media import media_response
+from src.models.enums import JobKind, MedicalCheckStatus, Projection
 from src.models.medical_check import MedicalCheck, MedicalChecks
 from src.models.medical_check_item import MedicalCheckItem
-from src.services.ai_service import AiService
+from src.services.job_worker import enqueue_ai_summary
+from src.services.payload_builder import summarise_attachment_text
+from src.templating import templates
 
 
 logger = logging.getLogger(__name__)
 
 
-def safe_json_decode(value: str) -> Any:
-    try:
-        return json.loads(value)
-    except (ValueError, TypeError):
-        return None
+TILES_PAGE_SIZE = 20
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
 
+_LISTABLE_FIELDS = {name for name, field in MedicalCheck.model_fields.items() if not field.exclude}
 
 router = APIRouter()
-templates = Jinja2Templates(directory="src/templates")
-templates.env.add_extension("jinja2.ext.loopcontrols")
-templates.env.filters["json_decode"] = safe_json_decode
-
 
-def _read_attachment_content(file_path: Path) -> str | None:
-    """Reads text content of an attachment if it is a text file or PDF."""
-    if not file_path.exists() or not file_path.is_file():
-        return None
 
-    suffix = file_path.suffix.lower()
+def _read_attachment_content(filename: str, file: BinaryIO) -> str | None:
+    """Reads text content of an uploaded attachment if it is a text file or PDF."""
+    suffix = Path(filename).suffix.lower()
 
     # Handle PDF files
     if suffix == ".pdf":
+        from pypdf import PdfReader  # imported on first use, it is slow to load
+
         try:
-            reader = PdfReader(file_path)
+            reader = PdfReader(file)
             text = ""
             for page in reader.pages:
                 text += page.extract_text() + "\n"
             return text.strip()
         except Exception as e:
-            logger.error(f"Error reading PDF attachment {file_path}: {e}")
+            logger.error(f"Error reading PDF attachment {filename}: {e}")
             return None
 
     # Simple check for text files by extension
@@ -60,12 +60,17 @@ def _read_attachment_content(file_path: Path) -> str | None:
 
     try:
         # We assume UTF-8 for now.
-        return file_path.read_text(encoding="utf-8", errors="replace")
+        return file.read().decode("utf-8", errors="replace")
     except Exception as e:
-        logger.error(f"Error reading text attachment {file_path}: {e}")
+        logger.error(f"Error reading text attachment {filename}: {e}")
         return None
 
 
+def _hx_trigger(event: str, **detail: Any) -> dict[str, str]:
+    """Headers raising `event` (with `detail`) on the client once HTMX has swapped the response in."""
+    return {"HX-Trigger": json.dumps({event: detail})}
+
+
 # Todo: refactor this?
 def _resolve_template_name(raw_name: str) -> str:
     """Resolve a user-submitted check template to a canonical string.
@@ -95,30 +100,36 @@ def _resolve_template_name(raw_name: str) -> str:
 
 @router.get("", response_model=MedicalChecks)
 async def list_medical_checks(
+    request: Request,
     patient_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> MedicalChecks:
-    if not storage.patients.get_patient(patient_id=patient_id):
+    projection: Projection = Projection.FULL,
+    fields: Annotated[
+        str | None, Query(description="Comma-separated check fields to return, e.g. check_id,status")
+    ] = None,
+) -> Response:
+    if not (validators := patient_validators(storage, patient_id, variant="json")):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
-
-    checks = storage.medical_checks.get_medical_checks(patient_id)
-
-    return MedicalChecks(records=checks)
-
-
-async def _transcribe_recordings_task(check_id: int, storage: DbStorage, ai_service: AiService) -> None:
-    """Background task to transcribe all voice recordings for a medical check."""
-    recordings = storage.voice_recordings.get_recordings_by_check_id(check_id)
-    for rec in recordings:
-        if not rec.file_path:
-            continue
-        # file_path in DB is relative to voice_recordings/
-        full_path = Path("voice_recordings") / rec.file_path
-        if full_path.exists():
-            transcript_json = await ai_service.transcribe_voice_recording(full_path)
-            storage.voice_recordings.update_transcription(
-                voice_recording_id=rec.voice_recording_id, full_text=transcript_json
-            )
+    if validators.matches(request):
+        return validators.not_modified()
+
+    selected = {f.strip() for f in (fields or "").split(",") if f.strip()} or None
+    if selected and (unknown := selected - _LISTABLE_FIELDS):
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    checks = storage.medical_checks.get_medical_checks(patient_id, projection=projection, fields=selected)
+
+    exclude: dict[str, Any] = {}
+    if projection == Projection.SUMMARY:
+        exclude = {
+            "attachments": {"__all__": {"parsed_content", "summary"}},
+            "voice_recordings": {"__all__": {"full_text", "summary"}},
+        }
+    content = MedicalChecks(records=checks).model_dump_json(
+        include={"records": {"__all__": selected}} if selected is not None else None,
+        exclude={"records": {"__all__": exclude}} if exclude else None,
+    )
+    return validators.apply(Response(content=content, media_type="application/json"))
 
 
 @router.post("", response_model=None)
@@ -126,8 +137,7 @@ async def create_medical_check(
     patient_id: int,
     request: Request,
     storage: Annotated[DbStorage, Depends(get_storage)],
-    ai_service: Annotated[AiService, Depends(get_ai_service)],
-    background_tasks: BackgroundTasks,
+    writer: Annotated[Writer, Depends(get_writer)],
     check_type: Annotated[str, Form(alias="type")],
     check_date: Annotated[datetime.date, Form(alias="date")],
     status: Annotated[str, Form(...)],
@@ -135,7 +145,7 @@ async def create_medical_check(
     param_count: Annotated[int | None, Form()] = None,
     attachments: list[UploadFile] = File(None),
     voice_recordings: list[UploadFile] = File(None),
-) -> JSONResponse | RedirectResponse:
+) -> JSONResponse | HTMLResponse | RedirectResponse:
     if not (patient := storage.patients.get_patient(patient_id=patient_id)):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
 
@@ -157,17 +167,19 @@ async def create_medical_check(
         except Exception as e:
             raise HTTPException(status_code=422, detail=f"Invalid payload: {e}")
 
-        check_id = storage.medical_checks.save(
-            patient_id=patient_id,
-            check_template=mc.template_name,
-            check_date=mc.check_date,
-            status=mc.status.value,
-            medical_check_items=mc.medical_check_items,
-            notes=mc.notes,
-        )
+        def save_json(db: DbStorage) -> int:
+            check_id = db.medical_checks.save(
+                patient_id=patient_id,
+                check_template=mc.template_name,
+                check_date=mc.check_date,
+                status=mc.status.value,
+                medical_check_items=mc.medical_check_items,
+                notes=mc.notes,
+            )
+            enqueue_ai_summary(db, patient_id)
+            return check_id
 
-        # Trigger AI analysis in background
-        background_tasks.add_task(ai_service.prepare_and_send_request, patient_id)
+        check_id = await writer.run(save_json)
 
         created = storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id)
         headers = {"Location": f"/patients/{patient_id}/medical_checks/{check_id}"}
@@ -206,98 +218,86 @@ async def create_medical_check(
         medical_check_items=medical_check_items_list,
     )
 
-    # Handle attachments
+    # Files are stored first, so the database writes below can run as one transaction. Uploads are spooled
+    # to disk by the form parser and streamed into the blob store from there, off the event loop.
     processed_attachments = []
     if attachments:
-        # directory structure: attachments/{iso-check-date}/{check_id}
+        # key structure: attachments/{patient_id}/{iso-date}/{file_name}
         iso_date = mc.check_date.isoformat()
-        # use a temporary structure or just save after creating the medical check
-        # But wait, I need the check_id to create the directory.
-        # So I'll create the check first, then save files, then update the check (or just add attachments to DB).
-        pass
-
-    check_id = storage.medical_checks.save(
-        patient_id=patient_id,
-        check_template=mc.template_name,
-        check_date=mc.check_date,
-        status=mc.status.value,
-        medical_check_items=mc.medical_check_items,
-        notes=mc.notes,
-    )
-
-    if attachments:
-        # directory structure: attachments/{patient_id}/{iso-date}/{file_name}
-        iso_date = mc.check_date.isoformat()
-        upload_dir = Path("attachments") / str(patient_id) / iso_date
-        upload_dir.mkdir(parents=True, exist_ok=True)
 
         for attachment in attachments:
-            if not attachment.filename:
+            if not attachment.filename or not attachment.size:
                 continue
 
-            file_path = upload_dir / attachment.filename
-            content = await attachment.read()
-            if not content:
-                continue
-
-            with open(file_path, "wb") as f:
-                f.write(content)
-
-            parsed_content = _read_attachment_content(file_path)
-
             db_file_path = f"{patient_id}/{iso_date}/{attachment.filename}"
+            try:
+                check_key(db_file_path)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid attachment name: {attachment.filename}")
+
+            parsed_content = _read_attachment_content(attachment.filename, attachment.file)
+            attachment.file.seek(0)
+            await asyncio.to_thread(
+                storage.blobs.put, f"attachments/{db_file_path}", attachment.file, attachment.content_type
+            )
+
             processed_attachments.append(
                 {
                     "filename": attachment.filename,
                     "content_type": attachment.content_type,
                     "file_path": db_file_path,
                     "parsed_content": parsed_content,
+                    # Computed once here so AI payloads can fall back to it without re-reading the file
+                    "summary": summarise_attachment_text(parsed_content),
                 }
             )
 
-        if processed_attachments:
-            for att in processed_attachments:
-                storage.medical_checks.conn.execute(
-                    """
-                    INSERT INTO medical_check_attachments (check_id, filename, content_type, file_path, parsed_content)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    [
-                        check_id,
-                        att["filename"],
-                        att["content_type"],
-                        att["file_path"],
-                        att.get("parsed_content"),
-                    ],
-                )
-            storage.medical_checks.conn.commit()
-
+    recording_paths: list[str] = []
     if voice_recordings:
         iso_date = mc.check_date.isoformat()
-        upload_dir = Path("voice_recordings") / str(patient_id)
-        upload_dir.mkdir(parents=True, exist_ok=True)
 
         for recording in voice_recordings:
-            timestamp = datetime.datetime.now().strftime("%H%M%S_%f")
-            filename = f"{iso_date}_{timestamp}.webm"
-            file_path = upload_dir / filename
-
-            content = await recording.read()
-            if not content:
+            if not recording.size:
                 continue
 
-            with open(file_path, "wb") as f:
-                f.write(content)
-
-            db_file_path = f"{patient_id}/{filename}"
-            storage.voice_recordings.insert_recording(check_id=check_id, file_path=db_file_path)
+            timestamp = datetime.datetime.now().strftime("%H%M%S_%f")
+            db_file_path = f"{patient_id}/{iso_date}_{timestamp}.webm"
+            await asyncio.to_thread(
+                storage.blobs.put, f"voice_recordings/{db_file_path}", recording.file, recording.content_type
+            )
+            recording_paths.append(db_file_path)
 
-        storage.voice_recordings.conn.commit()
-        # Trigger transcription in background
-        background_tasks.add_task(_transcribe_recordings_task, check_id, storage, ai_service)
+    def save(db: DbStorage) -> int:
+        check_id = db.medical_checks.save(
+            patient_id=patient_id,
+            check_template=mc.template_name,
+            check_date=mc.check_date,
+            status=mc.status.value,
+            medical_check_items=mc.medical_check_items,
+            notes=mc.notes,
+            attachments=processed_attachments or None,
+        )
+        for db_file_path in recording_paths:
+            db.voice_recordings.insert_recording(check_id=check_id, file_path=db_file_path)
 
-    # Trigger AI analysis in background
-    background_tasks.add_task(ai_service.prepare_and_send_request, patient_id)
+        if voice_recordings:
+            # The transcription job queues the AI summary itself once the transcripts are in
+            db.jobs.enqueue(JobKind.TRANSCRIBE_RECORDINGS, {"check_id": check_id, "patient_id": patient_id})
+        else:
+            enqueue_ai_summary(db, patient_id)
+        return check_id
+
+    check_id = await writer.run(save)
+
+    # Saved from the form inside the patient details page: send just the new tile
+    if request.headers.get("HX-Target") == "checksTiles" and (
+        created := storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id)
+    ):
+        return HTMLResponse(
+            content=templates.get_template("_medical_check_tile.html").render(r=created, patient_id=patient_id),
+            status_code=201,
+            headers=_hx_trigger("medicalCheckCreated", checkId=check_id, status=created.status.value),
+        )
 
     return RedirectResponse(url=f"/patients/{patient.patient_id}?check_added=1", status_code=303)
 
@@ -345,9 +345,11 @@ async def new_medical_check(
             }
         )
 
+    # Requested by the patient details page, which shows the form in place
+    page = "_new_medical_check_panel.html" if request.headers.get("HX-Target") == "newCheckPanel" else None
     return templates.TemplateResponse(
         request,
-        "create_medical_check_generic.html",
+        page or "create_medical_check_generic.html",
         {
             "patient": patient,
             "check_template": selected_template.name,
@@ -356,18 +358,23 @@ async def new_medical_check(
     )
 
 
-@router.get("/timeseries")
+@router.get("/timeseries", response_model=None)
 async def get_timeseries(
+    request: Request,
+    response: Response,
     patient_id: int,
     check_template: str,
     item_name: str,
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> dict[str, Any]:
+) -> Response | dict[str, Any]:
     """Return item value over time for a given patient, check type and item name.
     Response example: {"records": [{"date": "2025-01-01", "value": "72.5", "units": "kg"}, ...]}
     """
-    if not storage.patients.get_patient(patient_id=patient_id):
+    if not (validators := patient_validators(storage, patient_id, variant="json")):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
 
     series = storage.medical_checks.items.get_time_series(
         patient_id=patient_id, check_template=check_template, item_name=item_name
@@ -380,13 +387,18 @@ async def get_timeseries(
 async def get_chartable_options(
     request: Request,
     patient_id: int,
+    response: Response,
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> HTMLResponse | dict[str, Any]:
+) -> Response | dict[str, Any]:
     """
     Return list of chartable numeric options available for the patient.
     """
-    if not storage.patients.get_patient(patient_id=patient_id):
+    variant = "html" if request.headers.get("HX-Request") else "json"
+    if not (validators := patient_validators(storage, patient_id, variant=variant)):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
 
     rows = storage.medical_checks.get_chartable_options(patient_id=patient_id)
 
@@ -398,13 +410,51 @@ async def get_chartable_options(
                     for r in rows
                 ]
             )
-            return HTMLResponse(content=options_html)
+            return validators.apply(HTMLResponse(content=options_html))
         else:
-            return HTMLResponse(content='<option value="">No chartable data</option>')
+            return validators.apply(HTMLResponse(content='<option value="">No chartable data</option>'))
 
     return {"records": rows}
 
 
+@router.get("/tiles", include_in_schema=False, response_model=None)
+async def get_medical_check_tiles(
+    request: Request,
+    patient_id: int,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    fragments: Annotated[ScopedFragmentCache, Depends(get_practice_fragments)],
+    before_date: datetime.date | None = None,
+    before_id: int | None = None,
+) -> Response:
+    """One page of the patient's check tiles, newest first; the last tile loads the next page when revealed."""
+    if not (validators := patient_validators(storage, patient_id, variant="html")):
+        raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
+    if validators.matches(request):
+        return validators.not_modified()
+
+    before = (before_date, before_id) if before_date is not None and before_id is not None else None
+
+    def render() -> str:
+        # Tiles only show dates, statuses, attachment counts and template names
+        records = storage.medical_checks.get_medical_checks(
+            patient_id, projection=Projection.SUMMARY, fields={"attachments"}, limit=TILES_PAGE_SIZE, before=before
+        )
+        next_url = None
+        if len(records) == TILES_PAGE_SIZE:
+            last = records[-1]
+            next_url = (
+                f"/patients/{patient_id}/medical_checks/tiles?before_date={last.check_date}&before_id={last.check_id}"
+            )
+        return templates.get_template("_medical_checks_list.html").render(
+            records=records, patient_id=patient_id, next_url=next_url, first_page=before is None
+        )
+
+    html = fragments.get_or_render(
+        ("medical_check_tiles", patient_id, validators.patient_version, validators.catalogue_version, before), render
+    )
+    return validators.apply(HTMLResponse(content=html))
+
+
 # Details page or JSON depending on Accept header
 @router.get("/{check_id}", include_in_schema=False, response_model=None)
 async def medical_check_details(
@@ -435,14 +485,16 @@ async def medical_check_details(
 
 
 # Legacy form status update endpoint
-@router.post("/{check_id}/status", include_in_schema=False)
+@router.post("/{check_id}/status", include_in_schema=False, response_model=None)
 async def update_medical_check_status(
+    request: Request,
     patient_id: int,
     check_id: int,
     status: Annotated[str, Form(...)],
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> RedirectResponse:
-    if not storage.patients.get_patient(patient_id=patient_id):
+    writer: Annotated[Writer, Depends(get_writer)],
+) -> HTMLResponse | RedirectResponse:
+    if not storage.patients.exists(patient_id):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
 
     try:
@@ -450,7 +502,16 @@ async def update_medical_check_status(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid status value")
 
-    storage.medical_checks.update_status(check_id=check_id, status=new_status.value)
+    await writer.run(lambda db: db.medical_checks.update_status(check_id=check_id, status=new_status.value))
+
+    # HTMX forms only swap the status block of the details page
+    if request.headers.get("HX-Request"):
+        if not (mc := storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id)):
+            raise HTTPException(status_code=404, detail="Medical check not found")
+        return HTMLResponse(
+            content=templates.get_template("_check_status.html").render(check=mc, patient_id=patient_id),
+            headers=_hx_trigger("medicalCheckUpdated", checkId=check_id, status=new_status.value),
+        )
     return RedirectResponse(url=f"/patients/{patient_id}", status_code=303)
 
 
@@ -461,10 +522,11 @@ async def update_medical_check(
     patient_id: int,
     check_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
+    writer: Annotated[Writer, Depends(get_writer)],
 ) -> MedicalCheck:
-    if not storage.patients.get_patient(patient_id=patient_id):
+    if not storage.patients.exists(patient_id):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
-    if not storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id):
+    if not storage.medical_checks.exists(patient_id=patient_id, check_id=check_id):
         raise HTTPException(status_code=404, detail="Medical check not found")
 
     if "application/json" not in (request.headers.get("content-type") or ""):
@@ -474,15 +536,21 @@ async def update_medical_check(
     status_raw = data.get("status")
     notes = data.get("notes")
 
+    new_status = None
     if status_raw is not None:
         try:
             new_status = MedicalCheckStatus(status_raw)
         except Exception:
             raise HTTPException(status_code=422, detail="Invalid status value")
-        storage.medical_checks.update_status(check_id=check_id, status=new_status.value)
 
-    if "notes" in data:
-        storage.medical_checks.update_notes(check_id=check_id, notes=notes)
+    # Status and notes change together or not at all
+    def update(db: DbStorage) -> None:
+        if new_status is not None:
+            db.medical_checks.update_status(check_id=check_id, status=new_status.value)
+        if "notes" in data:
+            db.medical_checks.update_notes(check_id=check_id, notes=notes)
+
+    await writer.run(update)
 
     if updated := storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id):
         return updated
@@ -495,24 +563,60 @@ async def delete_medical_check(
     patient_id: int,
     check_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
+    writer: Annotated[Writer, Depends(get_writer)],
 ) -> JSONResponse:
-    if not storage.patients.get_patient(patient_id=patient_id):
+    if not storage.patients.exists(patient_id):
         raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
 
-    if not storage.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id):
+    if not storage.medical_checks.exists(patient_id=patient_id, check_id=check_id):
         return JSONResponse(status_code=204, content=None)
 
-    storage.medical_checks.delete(check_id=check_id)
+    await writer.run(lambda db: db.medical_checks.delete(check_id=check_id))
     return JSONResponse(status_code=204, content=None)
 
 
 @router.get("/attachments/{p_id}/{date_str}/{filename}", include_in_schema=False)
 async def get_attachment(
+    patient_id: int,
     p_id: str,
     date_str: str,
     filename: str,
-) -> FileResponse:
-    file_path = Path("attachments") / p_id / date_str / filename
-    if not file_path.exists():
+    request: Request,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+) -> Response:
+    # Only files recorded against this patient are served, so a crafted path cannot reach anything else
+    file_path = f"{p_id}/{date_str}/{filename}"
+    attachment = None
+    if p_id == str(patient_id) and _ISO_DATE.fullmatch(date_str):
+        attachment = storage.medical_checks.find_attachment(patient_id=patient_id, file_path=file_path)
+    if attachment is None:
         raise HTTPException(status_code=404, detail="Attachment not found")
-    return FileResponse(file_path)
+    return await media_response(
+        request,
+        storage.blobs,
+        f"attachments/{file_path}",
+        filename=attachment.filename,
+        content_type=attachment.content_type,
+    )
+
+
+@router.get("/{check_id}/recordings/{voice_recording_id}", include_in_schema=False)
+async def get_voice_recording(
+    patient_id: int,
+    check_id: int,
+    voice_recording_id: int,
+    request: Request,
+    storage: Annotated[DbStorage, Depends(get_storage)],
+) -> Response:
+    recording = storage.voice_recordings.get_recording(
+        patient_id=patient_id, check_id=check_id, voice_recording_id=voice_recording_id
+    )
+    if recording is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return await media_response(
+        request,
+        storage.blobs,
+        f"voice_recordings/{recording.file_path}",
+        filename=PurePosixPath(recording.file_path).name,
+        content_type="audio/webm",
+    )
@@ -0,0 +1,64 @@
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Request
+
+from src.data_access.db_storage import DbStorage
+from src.dependencies import get_fragment_cache, get_shard, get_storage
+from src.fragment_cache import FragmentCache
+from src.tenancy import Shard, ShardPool
+
+router = APIRouter()
+
+
+def _group_commit_stats(shard: Shard) -> dict[str, Any] | None:
+    if not (writer := shard.writer):
+        return None
+    stats = writer.stats
+    return {
+        "batches": stats.batches,
+        "writes": stats.writes,
+        "failed_writes": stats.failed_writes,
+        "mean_batch_size": round(stats.mean_batch_size, 2),
+        "max_batch_size": stats.max_batch_size,
+        "batch_sizes": dict(sorted(stats.batch_sizes.items())),
+        "mean_commit_ms": round(stats.mean_commit_seconds * 1000, 3),
+        "max_commit_ms": round(stats.max_commit_seconds * 1000, 3),
+    }
+
+
+# JSON API: in-process counters for tuning caches and compression; they reset when the web worker restarts
+@router.get("/metrics")
+async def get_metrics(
+    request: Request,
+    fragments: Annotated[FragmentCache, Depends(get_fragment_cache)],
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    shard: Annotated[Shard, Depends(get_shard)],
+) -> dict[str, Any]:
+    compression = request.app.state.compression_stats
+    shards: ShardPool = request.app.state.shards
+    return {
+        "fragment_cache": {
+            "entries": len(fragments),
+            "size_chars": fragments.size,
+            "hits": fragments.hits,
+            "misses": fragments.misses,
+        },
+        "compression": {
+            "skipped": compression.skipped,
+            "encodings": {
+                name: {
+                    "responses": stats.responses,
+                    "bytes_in": stats.bytes_in,
+                    "bytes_out": stats.bytes_out,
+                    "ratio": round(stats.ratio, 4),
+                    "cpu_ms": round(stats.cpu_seconds * 1000, 3),
+                }
+                for name, stats in compression.encodings.items()
+            },
+        },
+        # The practice of this request
+        "group_commit": _group_commit_stats(shard),
+        "shards": {"open": len(shards), "opened": shards.opened, "evicted": shards.evicted},
+        # Unlike the counters above, read from the jobs table shared by every worker
+        "jobs": storage.jobs.count_by_status(),
+    }
@@ -1,35 +1,63 @@
 import json
+from collections.abc import AsyncIterator, Iterator
 from datetime import date
+from itertools import islice
 from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from markupsafe import Markup
 
 from src.data_access.db_storage import DbStorage
-from src.dependencies import get_ai_service, get_storage
+from src.dependencies import Writer, get_ai_service, get_practice_fragments, get_storage, get_writer
+from src.fragment_cache import ScopedFragmentCache
+from src.http_cache import patient_validators
 from src.models.address import Address
 from src.models.address_utils import build_address
+from src.models.ai_summary import AiSummary
 from src.models.enums import Sex, Title
 from src.models.patient import Patient
 from src.services.ai_service import AiService
+from src.templating import stream_template, templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="src/templates")
-templates.env.filters["from_json"] = json.loads
+
+
+# Patients serialised per chunk of the streamed JSON array
+JSON_STREAM_BATCH = 100
+
+
+async def _ndjson_lines(patients: Iterator[Patient]) -> AsyncIterator[str]:
+    for patient in patients:
+        yield patient.model_dump_json() + "\n"
+
+
+async def _json_records(patients: Iterator[Patient]) -> AsyncIterator[str]:
+    """Same bytes as Patients(records=...).model_dump_json(), without holding every record at once."""
+    yield '{"records":['
+    separator = ""
+    while batch := list(islice(patients, JSON_STREAM_BATCH)):
+        yield separator + ",".join(p.model_dump_json() for p in batch)
+        separator = ","
+    yield "]}"
 
 
 @router.get("", response_model=None)
 async def list_patients(
     request: Request,
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> HTMLResponse | JSONResponse:
-    patients = storage.patients.get_all_patients()
+) -> StreamingResponse:
+    # Rows are read from an open cursor while the response is sent, so memory stays flat however many
+    # patients there are. The generators are async so the sqlite connection is only used on the event loop.
+    patients = storage.patients.iter_patients()
+    accept = request.headers.get("accept") or ""
 
-    if "application/json" in (request.headers.get("accept") or ""):
-        return JSONResponse(content={"records": [json.loads(p.model_dump_json()) for p in patients]})
+    if "application/x-ndjson" in accept:
+        return StreamingResponse(_ndjson_lines(patients), media_type="application/x-ndjson")
+    if "application/json" in accept:
+        return StreamingResponse(_json_records(patients), media_type="application/json")
 
-    return templates.TemplateResponse(request, "patients.html", {"active_page": "patients", "patients": patients})
+    return stream_template(request, "patients.html", {"active_page": "patients", "patients": patients})
 
 
 @router.get("/new", include_in_schema=False)
@@ -76,14 +104,8 @@ async def send_to_ai(
         ai_req, ai_resp = await ai_service.prepare_and_send_request(patient_id)
 
         if request.headers.get("HX-Request"):
-            response = templates.TemplateResponse(
-                request,
-                "_ai_summary.html",
-                {
-                    "ai_response": ai_resp.response_json if ai_resp else None,
-                    "patient_id": patient_id,
-                },
-            )
+            summary = AiSummary.from_response_json(ai_resp.response_json) if ai_resp else None
+            response = HTMLResponse(content=_render_partial("_ai_summary.html", summary=summary))
             if ai_req and ai_req.id:
                 response.headers["X-AI-Request-ID"] = str(ai_req.id)
             return response
@@ -107,7 +129,7 @@ async def send_to_ai(
 @router.post("", status_code=201, response_model=None)
 async def create_patient(
     request: Request,
-    storage: Annotated[DbStorage, Depends(get_storage)],
+    writer: Annotated[Writer, Depends(get_writer)],
     title: Annotated[str | None, Form()] = None,
     first_name: Annotated[str | None, Form()] = None,
     middle_name: Annotated[str | None, Form()] = None,
@@ -175,7 +197,7 @@ async def create_patient(
 
     try:
         patient = Patient(**patient_data)
-        saved_patient = storage.patients.save(patient)
+        saved_patient = await writer.run(lambda db: db.patients.save(patient))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -191,6 +213,7 @@ async def update_patient(
     request: Request,
     patient_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
+    writer: Annotated[Writer, Depends(get_writer)],
     title: Annotated[str | None, Form()] = None,
     first_name: Annotated[str | None, Form()] = None,
     middle_name: Annotated[str | None, Form()] = None,
@@ -253,7 +276,7 @@ async def update_patient(
             assert existing is not None
             patient_data["address"] = existing.address
         patient = Patient(patient_id=patient_id, **patient_data)
-        saved_patient = storage.patients.save(patient)
+        saved_patient = await writer.run(lambda db: db.patients.save(patient))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -269,6 +292,7 @@ async def update_patient_post_method_override(
     request: Request,
     patient_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
+    writer: Annotated[Writer, Depends(get_writer)],
 ) -> RedirectResponse | Patient:
     form = await request.form()
     if form.get("_method") != "PUT":
@@ -281,6 +305,7 @@ async def update_patient_post_method_override(
         request=request,
         patient_id=patient_id,
         storage=storage,
+        writer=writer,
         title=_to_str(form.get("title")),
         first_name=_to_str(form.get("first_name")),
         middle_name=_to_str(form.get("middle_name")),
@@ -312,76 +337,90 @@ async def get_patient(
     request: Request,
     patient_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
-) -> HTMLResponse | Patient:
+    fragments: Annotated[ScopedFragmentCache, Depends(get_practice_fragments)],
+) -> Response:
+    wants_json = "application/json" in request.headers.get("accept", "")
+    variant = "json" if wants_json else "html"
+    # The page shows the patient's age, so its tag also changes daily
+    if not (validators := patient_validators(storage, patient_id, variant=variant, daily=not wants_json)):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if validators.matches(request):
+        return validators.not_modified()
+
     if not (patient := storage.patients.get_patient(patient_id=patient_id)):
         raise HTTPException(status_code=404, detail="Patient not found")
 
     # Serve JSON when requested via Accept header; otherwise render HTML template
-    if "application/json" in request.headers.get("accept", ""):
-        return patient
+    if wants_json:
+        return validators.apply(Response(content=patient.model_dump_json(), media_type="application/json"))
 
     # Provide available medical check types for UI dropdown
     check_templates = [t for t in storage.medical_check_templates.list_medical_check_templates() if t.is_active]
 
-    medical_checks = storage.medical_checks.get_medical_checks(patient_id)
-
-    # Fetch last AI response and its request ID
-    last_ai_response = None
-    last_request_id = None
-    if ai_requests := storage.ai_requests.get_by_patient(patient_id):
-        last_request = ai_requests[0]
-        last_request_id = last_request.id
-        if last_request.id is not None:
-            if ai_responses := storage.ai_responses.get_by_request(last_request.id):
-                last_ai_response = ai_responses[0].response_json
+    age = _get_age(patient.dob)
+    summary_card_html = fragments.get_or_render(
+        ("summary_card", patient_id, validators.patient_version, age),
+        lambda: _render_partial("_patient_summary_card.html", patient=patient, age=age),
+    )
+    # Checks, charts and the AI summary are loaded by the page itself, so the shell can be sent straight away
+    last_request_id = storage.ai_requests.get_latest_id(patient_id)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         request,
         "patient_details.html",
         {
             "active_page": "patients",
             "patient": patient,
-            "age": _get_age(patient.dob),
             "templates": check_templates,
-            "medical_checks": medical_checks,
-            "last_ai_response": last_ai_response,
+            "summary_card_html": summary_card_html,
             "last_request_id": last_request_id,
             "patient_id": patient_id,
             "check_added": request.query_params.get("check_added") == "1",
         },
     )
+    return validators.apply(response)
 
 
 @router.get("/{patient_id}/ai_summary", include_in_schema=False)
 async def get_ai_summary(
-    request: Request,
     patient_id: int,
     storage: Annotated[DbStorage, Depends(get_storage)],
+    fragments: Annotated[ScopedFragmentCache, Depends(get_practice_fragments)],
     current_request_id: str | None = None,
 ) -> HTMLResponse:
-    last_ai_response = None
-    last_request_id = None
-    if ai_requests := storage.ai_requests.get_by_patient(patient_id):
-        last_request = ai_requests[0]
-        last_request_id = last_request.id
-        if last_request.id is not None:
-            if ai_responses := storage.ai_responses.get_by_request(last_request.id):
-                last_ai_response = ai_responses[0].response_json
+    ai_summary_html, last_request_id, answered = _ai_summary_fragment(storage, fragments, patient_id)
 
-    response = templates.TemplateResponse(
-        request,
-        "_ai_summary.html",
-        {
-            "ai_response": last_ai_response,
-            "patient_id": patient_id,
-        },
-    )
+    response = HTMLResponse(content=ai_summary_html)
     if last_request_id:
         response.headers["X-AI-Request-ID"] = str(last_request_id)
 
     # Stop polling if we have a newer request ID than the one we started with,
     # and it has a response.
-    if current_request_id and last_request_id and str(last_request_id) != str(current_request_id) and last_ai_response:
+    if current_request_id and last_request_id and str(last_request_id) != str(current_request_id) and answered:
         response.status_code = 286  # HTMX special status to stop polling
 
     return response
+
+
+def _render_partial(name: str, **context: Any) -> str:
+    return templates.get_template(name).render(**context)
+
+
+def _ai_summary_fragment(
+    storage: DbStorage, fragments: ScopedFragmentCache, patient_id: int
+) -> tuple[Markup, int | None, bool]:
+    """Rendered summary of the patient's latest AI request, that request's id, and whether it was answered."""
+    last_request_id = storage.ai_requests.get_latest_id(patient_id)
+    response_id = storage.ai_responses.get_latest_id(last_request_id) if last_request_id is not None else None
+    return _render_ai_summary(storage, fragments, response_id), last_request_id, response_id is not None
+
+
+def _render_ai_summary(storage: DbStorage, fragments: ScopedFragmentCache, response_id: int | None) -> Markup:
+    if response_id is None:
+        return Markup(_render_partial("_ai_summary.html", summary=None))
+
+    # A response never changes once saved, so its id is a complete cache key
+    return fragments.get_or_render(
+        ("ai_summary", response_id),
+        lambda: _render_partial("_ai_summary.html", summary=storage.ai_responses.get_summary(response_id)),
+    )
@@ -1,9 +1,7 @@
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
 from starlette.responses import RedirectResponse
 
 router = APIRouter()
-templates = Jinja2Templates(directory="src/templates")
 
 
 @router.get("/", include_in_schema=False)
@@ -0,0 +1,34 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.data_access.db_storage import DbStorage
+from src.dependencies import get_storage
+from src.models.search import SearchResults
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 100
+
+
+# JSON API: full-text search over check notes, attachment text and voice transcripts
+@router.get("")
+async def search(
+    storage: Annotated[DbStorage, Depends(get_storage)],
+    q: Annotated[str, Query(min_length=1, max_length=500)],
+    patient_id: int | None = None,
+    page: Annotated[int, Query(ge=1)] = 1,
+    page_size: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = 20,
+) -> SearchResults:
+    if patient_id is not None and not storage.patients.exists(patient_id):
+        raise HTTPException(status_code=404, detail=f"Patient with patient_id={patient_id} not found")
+
+    # Fetch one extra row to tell whether there is a next page without counting every match
+    records = storage.search.search(q, patient_id=patient_id, limit=page_size + 1, offset=(page - 1) * page_size)
+    return SearchResults(
+        query=q,
+        page=page,
+        page_size=page_size,
+        has_more=len(records) > page_size,
+        records=records[:page_size],
+    )
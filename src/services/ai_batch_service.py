@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+from src.data_access.db_storage import DbStorage
+from src.models.ai_batch_job import AiBatchJob
+from src.models.enums import AiBatchItemStatus
+from src.services.ai_service import AiService, payload_hash
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_STATUS_CODE = 429
+DEFAULT_RETRY_AFTER_SECONDS = 5.0
+
+
+def _retry_after_seconds(exc: Exception) -> float | None:
+    """Seconds to wait before retrying a rate-limited call, or None if `exc` is not a rate limit."""
+    if getattr(exc, "status_code", None) != RATE_LIMIT_STATUS_CODE:
+        return None
+
+    response = getattr(exc, "response", None)
+    raw = response.headers.get("retry-after") if response is not None else None
+    if not raw:
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+    try:
+        return max(float(raw), 0.0)
+    except ValueError:
+        pass
+
+    # Retry-After may also be an HTTP date
+    try:
+        retry_at = parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+    return max((retry_at - datetime.now(UTC)).total_seconds(), 0.0)
+
+
+class AiBatchService:
+    """Runs AI summaries for a list of patients with bounded concurrency.
+
+    Progress is persisted per patient in `ai_batch_job_items`, so an interrupted job can be resumed by
+    running it again. Patients whose payload is unchanged since their last answered request are skipped.
+    A 429 from the AI provider pauses every worker until its Retry-After has elapsed.
+    """
+
+    def __init__(self, db: DbStorage, ai_service: AiService, *, concurrency: int, max_attempts: int = 3):
+        self.db = db
+        self.ai_service = ai_service
+        self.concurrency = max(concurrency, 1)
+        self.max_attempts = max_attempts
+        self._resume_at = 0.0
+
+    def create_job(self, patient_ids: list[int] | None = None) -> AiBatchJob:
+        if patient_ids is None:
+            patient_ids = [p.patient_id for p in self.db.patients.get_all_patients() if p.patient_id is not None]
+        job_id = self.db.ai_batch_jobs.create_job(patient_ids)
+        job = self.db.ai_batch_jobs.get_job(job_id)
+        assert job is not None
+        return job
+
+    async def run(
+        self,
+        job_id: int,
+        *,
+        retry_failed: bool = False,
+        on_progress: Callable[[AiBatchJob], None] | None = None,
+    ) -> AiBatchJob:
+        if retry_failed:
+            self.db.ai_batch_jobs.reset_failed(job_id)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for patient_id in self.db.ai_batch_jobs.get_patient_ids(job_id, AiBatchItemStatus.PENDING):
+            queue.put_nowait(patient_id)
+
+        self.db.ai_batch_jobs.start_job(job_id)
+        workers = min(self.concurrency, queue.qsize())
+        await asyncio.gather(*(self._worker(job_id, queue, on_progress) for _ in range(workers)))
+        self.db.ai_batch_jobs.finish_job(job_id)
+
+        job = self.db.ai_batch_jobs.get_job(job_id)
+        assert job is not None
+        return job
+
+    async def _worker(
+        self, job_id: int, queue: asyncio.Queue[int], on_progress: Callable[[AiBatchJob], None] | None
+    ) -> None:
+        while True:
+            try:
+                patient_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            status, error = await self._summarise(patient_id)
+            self.db.ai_batch_jobs.update_item(job_id=job_id, patient_id=patient_id, status=status, error=error)
+            if on_progress and (job := self.db.ai_batch_jobs.get_job(job_id)):
+                on_progress(job)
+
+    async def _summarise(self, patient_id: int) -> tuple[AiBatchItemStatus, str | None]:
+        try:
+            payload, token_counts = self.ai_service.prepare_request(patient_id)
+        except ValueError as e:
+            return AiBatchItemStatus.FAILED, str(e)
+
+        if self.db.ai_requests.get_latest_answered_hash(patient_id) == payload_hash(payload):
+            return AiBatchItemStatus.SKIPPED, None
+
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_for_rate_limit()
+            try:
+                await self.ai_service.send_request(patient_id, payload, token_counts)
+                return AiBatchItemStatus.DONE, None
+            except Exception as e:  # noqa: BLE001 - one patient's failure is recorded on its item, not the batch
+                retry_after = _retry_after_seconds(e)
+                if retry_after is None or attempt == self.max_attempts:
+                    return AiBatchItemStatus.FAILED, str(e)
+                logger.warning(f"Rate limited while summarising patient {patient_id}; retrying in {retry_after}s")
+                self._resume_at = max(self._resume_at, asyncio.get_running_loop().time() + retry_after)
+
+        return AiBatchItemStatus.FAILED, "Retry attempts exhausted"
+
+    async def _wait_for_rate_limit(self) -> None:
+        if (delay := self._resume_at - asyncio.get_running_loop().time()) > 0:
+            await asyncio.sleep(delay)
@@ -1,28 +1,56 @@
-import json
-import logging
-from pathlib import Path
-from typing import Any
+from __future__ import annotations
 
-from openai import AsyncOpenAI
-from pypdf import PdfReader
+import hashlib
+import logging
+from pathlib import PurePosixPath
+from typing import IO, TYPE_CHECKING, Any
 
 from settings import OpenAISettings
+from src.data_access.blob_store import BlobNotFoundError
 from src.data_access.db_storage import DbStorage
 from src.models.ai_request import AiRequest
 from src.models.ai_response import AiResponse
 from src.models.medical_check import MedicalCheck
 from src.models.patient import Patient
+from src.services.payload_builder import PayloadBuilder, to_compact_json
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
 
+def __getattr__(name: str) -> Any:
+    # openai takes longer to import than the rest of the app together, so it is only loaded once a client is
+    # created
+    if name == "AsyncOpenAI":
+        from openai import AsyncOpenAI
+
+        globals()[name] = AsyncOpenAI
+        return AsyncOpenAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _client_class() -> type[AsyncOpenAI]:
+    # Looked up as a module attribute on every call, so `patch("src.services.ai_service.AsyncOpenAI")` takes effect
+    return globals().get("AsyncOpenAI") or __getattr__("AsyncOpenAI")
+
+
+def payload_hash(payload: dict[str, Any]) -> str:
+    """Stable fingerprint of a request payload, used to skip re-sending unchanged patient data."""
+    return _hash_payload_json(to_compact_json(payload))
+
+
+def _hash_payload_json(payload_json: str) -> str:
+    return hashlib.sha256(payload_json.encode("utf-8")).hexdigest()
+
+
 class AiService:
     def __init__(self, db: DbStorage, settings: OpenAISettings):
         self.db = db
         self.settings = settings
         self.client = (
-            AsyncOpenAI(
+            _client_class()(
                 api_key=settings.api_key,
                 base_url=settings.url.replace("/chat/completions", "") if settings.url else None,
             )
@@ -30,27 +58,30 @@ class AiService:
             else None
         )
 
-    async def transcribe_voice_recording(self, file_path: Path) -> str:
+    async def transcribe_voice_recording(self, filename: str, audio_file: IO[bytes]) -> str:
         """Transcribes a voice recording using gpt-4o-transcribe-diarize."""
         if not self.client:
             return "AI Service not configured (no API key)"
 
         try:
-            with open(file_path, "rb") as audio_file:
-                response = await self.client.audio.transcriptions.create(
-                    model="gpt-4o-transcribe-diarize",
-                    file=audio_file,
-                    response_format="diarized_json",
-                    extra_body={"chunking_strategy": "auto"}
-                )
-                if hasattr(response, "model_dump_json"):
-                    return response.model_dump_json()
-                return str(response)
+            response = await self.client.audio.transcriptions.create(
+                model="gpt-4o-transcribe-diarize",
+                file=(filename, audio_file),
+                response_format="diarized_json",
+                extra_body={"chunking_strategy": "auto"}
+            )
+            if hasattr(response, "model_dump_json"):
+                return response.model_dump_json()
+            return str(response)
         except Exception as e:
-            logger.error(f"Error transcribing {file_path}: {e}")
+            logger.error(f"Error transcribing {filename}: {e}")
             return f"Transcription error: {e}"
 
     async def prepare_and_send_request(self, patient_id: int) -> tuple[AiRequest, AiResponse | None]:
+        payload, token_counts = self.prepare_request(patient_id)
+        return await self.send_request(patient_id, payload, token_counts)
+
+    def prepare_request(self, patient_id: int) -> tuple[dict[str, Any], dict[str, int]]:
         # 1. Collect data
         patient = self.db.patients.get_patient(patient_id)
         if not patient:
@@ -58,38 +89,15 @@ class AiService:
 
         medical_checks = self.db.medical_checks.get_medical_checks(patient_id)
 
-        # 2. Anonymize data
-        anonymized_patient = self._anonymize_patient(patient)
-        anonymized_checks = [self._anonymize_medical_check(mc) for mc in medical_checks]
+        # 2. Anonymize data and format payload within the token budget
+        return self._build_payload(patient, medical_checks)
 
-        # 3. Format payload
-        payload = {
-            "model": self.settings.model,
-            "messages": [
-                {"role": "system", "content": self.settings.system_prompt},
-                {
-                    "role": "user",
-                    "content": json.dumps(
-                        {
-                            "patient_info": anonymized_patient,
-                            "medical_history": anonymized_checks,
-                        },
-                        indent=4,
-                    ),
-                },
-            ],
-        }
-
-        ai_request = AiRequest(
-            patient_id=patient_id,
-            model_name=self.settings.model,
-            model_url=self.settings.url,
-            system_prompt_text=self.settings.system_prompt,
-            request_payload_json=json.dumps(payload),
-        )
-        self.db.ai_requests.save(ai_request)
+    async def send_request(
+        self, patient_id: int, payload: dict[str, Any], token_counts: dict[str, int]
+    ) -> tuple[AiRequest, AiResponse | None]:
+        ai_request = self._save_request(patient_id, payload, token_counts)
 
-        # 5. Send to OpenAI (if API key is present)
+        # 3. Send to OpenAI (if API key is present)
         ai_response = None
         if self.client:
             try:
@@ -109,49 +117,80 @@ class AiService:
 
         return ai_request, ai_response
 
+    def _save_request(self, patient_id: int, payload: dict[str, Any], token_counts: dict[str, int]) -> AiRequest:
+        request_payload_json = to_compact_json(payload)
+        ai_request = AiRequest(
+            patient_id=patient_id,
+            model_name=self.settings.model,
+            model_url=self.settings.url,
+            system_prompt_text=self.settings.system_prompt,
+            request_payload_json=request_payload_json,
+            token_counts_json=to_compact_json(token_counts),
+            payload_hash=_hash_payload_json(request_payload_json),
+        )
+        return self.db.ai_requests.save(ai_request)
+
+    def _build_payload(
+        self, patient: Patient, medical_checks: list[MedicalCheck]
+    ) -> tuple[dict[str, Any], dict[str, int]]:
+        builder = PayloadBuilder(
+            token_budget=self.settings.token_budget,
+            attachment_token_limit=self.settings.attachment_token_limit,
+        )
+        content, token_counts = builder.build(
+            system_prompt=self.settings.system_prompt,
+            patient_info=self._anonymize_patient(patient),
+            medical_history=[(mc, self._anonymize_medical_check(mc)) for mc in medical_checks],
+        )
+        payload = {
+            "model": self.settings.model,
+            "messages": [
+                {"role": "system", "content": self.settings.system_prompt},
+                {"role": "user", "content": content},
+            ],
+        }
+        return payload, token_counts
+
     def _anonymize_patient(self, patient: Patient) -> dict[str, Any]:
-        data_json = patient.model_dump_json(
-            exclude={"first_name", "middle_name", "last_name", "address", "email", "phone"}
+        return patient.model_dump(
+            mode="json", exclude={"first_name", "middle_name", "last_name", "address", "email", "phone"}
         )
-        return json.loads(data_json)
 
     def _anonymize_medical_check(self, mc: MedicalCheck) -> dict[str, Any]:
-        data = json.loads(mc.model_dump_json())
-        # Attachments already have metadata (filename, content_type).
-        # We use the stored parsed_content if available.
-        for i, attachment in enumerate(mc.attachments):
-            if attachment.parsed_content:
-                data["attachments"][i]["content"] = attachment.parsed_content
-        return data
+        # Attachment text is left out here; PayloadBuilder adds it back within the token budget
+        return mc.model_dump(mode="json", exclude={"attachments": {"__all__": {"parsed_content", "summary"}}})
 
     def _read_attachment_content(self, relative_path: str) -> str | None:
         """Reads text content of an attachment if it is a text file or PDF."""
-        full_path = Path("attachments") / relative_path
-        if not full_path.exists() or not full_path.is_file():
+        key = f"attachments/{relative_path}"
+        suffix = PurePosixPath(relative_path).suffix.lower()
+        # Simple check for text files by extension
+        text_extensions = {".txt", ".csv", ".json", ".xml", ".md"}
+        if suffix != ".pdf" and suffix not in text_extensions:
+            return None
+        try:
+            file = self.db.blobs.open(key)
+        except (BlobNotFoundError, ValueError):
             return None
 
-        suffix = full_path.suffix.lower()
+        with file:
+            # Handle PDF files
+            if suffix == ".pdf":
+                from pypdf import PdfReader
+
+                try:
+                    reader = PdfReader(file)
+                    text = ""
+                    for page in reader.pages:
+                        text += page.extract_text() + "\n"
+                    return text.strip()
+                except Exception as e:
+                    logger.error(f"Error reading PDF attachment {key}: {e}")
+                    return None
 
-        # Handle PDF files
-        if suffix == ".pdf":
             try:
-                reader = PdfReader(full_path)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text.strip()
+                # We assume UTF-8 for now.
+                return file.read().decode("utf-8", errors="replace")
             except Exception as e:
-                logger.error(f"Error reading PDF attachment {full_path}: {e}")
+                logger.error(f"Error reading text attachment {key}: {e}")
                 return None
-
-        # Simple check for text files by extension
-        text_extensions = {".txt", ".csv", ".json", ".xml", ".md"}
-        if suffix not in text_extensions:
-            return None
-
-        try:
-            # We assume UTF-8 for now.
-            return full_path.read_text(encoding="utf-8", errors="replace")
-        except Exception as e:
-            logger.error(f"Error reading text attachment {full_path}: {e}")
-            return None
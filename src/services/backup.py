@@ -0,0 +1,217 @@
+import hashlib
+import json
+import shutil
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from logging import getLogger
+from pathlib import Path
+
+logger = getLogger(__name__)
+
+# Trees of uploaded files backed up next to the database, relative to the directory the app runs from
+FILE_ROOTS = ("attachments", "voice_recordings")
+SNAPSHOT_NAME = "database.sqlite"
+ARCHIVE_SNAPSHOT_NAME = "archive.sqlite"
+MANIFEST_NAME = "manifest.json"
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+@dataclass
+class BackupResult:
+    path: Path
+    files: int
+    copied_files: int
+    copied_bytes: int
+
+    @property
+    def snapshot(self) -> Path:
+        return self.path / SNAPSHOT_NAME
+
+
+def snapshot_database(
+    db_file: Path,
+    dest: Path,
+    *,
+    pages_per_step: int = 1024,
+    step_sleep_seconds: float = 0.005,
+    progress: Callable[[int, int, int], object] | None = None,
+) -> Path:
+    """Copy a consistent snapshot of the live database to `dest` with the SQLite online backup API.
+
+    The copy runs `pages_per_step` pages at a time, sleeping in between so the app's own queries are not
+    starved. The source keeps one read transaction open for the whole copy: in WAL mode writers carry on
+    and the snapshot is the database as of the start, where otherwise every write by another connection
+    would restart the copy. (With a rollback journal, writers wait until the copy is done.)
+
+    `progress` is called after each step as progress(status, remaining_pages, total_pages).
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    partial = dest.with_name(f"{dest.name}.partial")
+    partial.unlink(missing_ok=True)
+
+    source = sqlite3.connect(str(db_file), isolation_level=None)
+    target = sqlite3.connect(str(partial))
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_schema").fetchone()
+        source.backup(target, pages=pages_per_step, progress=progress, sleep=step_sleep_seconds)
+        source.execute("COMMIT")
+        # The copy inherits WAL mode from the source; a single self-contained file is easier to ship and to
+        # open read-only
+        target.execute("PRAGMA journal_mode = DELETE").fetchone()
+        if (result := target.execute("PRAGMA quick_check").fetchone()[0]) != "ok":
+            raise sqlite3.DatabaseError(f"Snapshot of {db_file} failed its integrity check: {result}")
+    finally:
+        target.close()
+        source.close()
+    partial.replace(dest)
+    return dest
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _walk(base_dir: Path, roots: Iterable[str]) -> Iterator[tuple[str, Path]]:
+    for root in roots:
+        if (base_dir / root).is_dir():
+            for path in sorted((base_dir / root).rglob("*")):
+                if path.is_file():
+                    yield path.relative_to(base_dir).as_posix(), path
+
+
+class BackupStore:
+    """Backups in `backup_dir`: one directory per backup with a database snapshot and a manifest of files.
+
+    Attachments and voice recordings are stored once by content hash under `objects/` and shared between
+    backups, so each backup only copies the files added or changed since the previous one. Files whose size
+    and modification time match the previous manifest are not even read again.
+    """
+
+    def __init__(self, backup_dir: Path) -> None:
+        self.backup_dir = backup_dir
+        self.objects_dir = backup_dir / "objects"
+
+    def backups(self) -> list[Path]:
+        """Completed backups, oldest first."""
+        if not self.backup_dir.is_dir():
+            return []
+        return sorted(p.parent for p in self.backup_dir.glob(f"*/{MANIFEST_NAME}"))
+
+    def latest_snapshot(self) -> Path | None:
+        """The most recent database snapshot, e.g. to open with DbStorage(path, read_only=True) for reporting."""
+        backups = self.backups()
+        return backups[-1] / SNAPSHOT_NAME if backups else None
+
+    def read_manifest(self, backup: Path) -> dict[str, FileEntry]:
+        files = json.loads((backup / MANIFEST_NAME).read_text())["files"]
+        return {name: FileEntry(**entry) for name, entry in files.items()}
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def create(
+        self,
+        db_file: Path,
+        *,
+        archive_file: Path | None = None,
+        base_dir: Path = Path(),
+        roots: Iterable[str] = FILE_ROOTS,
+        pages_per_step: int = 1024,
+        step_sleep_seconds: float = 0.005,
+    ) -> BackupResult:
+        backups = self.backups()
+        previous = self.read_manifest(backups[-1]) if backups else {}
+        created_at = datetime.now(UTC)
+        # Renamed into place once complete, so an interrupted backup is never mistaken for a good one
+        partial = self.backup_dir / f"{created_at:%Y%m%dT%H%M%S%fZ}.partial"
+        partial.mkdir(parents=True)
+
+        snapshot_database(
+            db_file, partial / SNAPSHOT_NAME, pages_per_step=pages_per_step, step_sleep_seconds=step_sleep_seconds
+        )
+        # Rows may move to the archive between the two snapshots; restored, they are then found in both,
+        # and running the archiver again settles them
+        if archive_file is not None and not archive_file.exists():
+            archive_file = None
+        if archive_file is not None:
+            snapshot_database(
+                archive_file,
+                partial / ARCHIVE_SNAPSHOT_NAME,
+                pages_per_step=pages_per_step,
+                step_sleep_seconds=step_sleep_seconds,
+            )
+        files, copied_files, copied_bytes = self._copy_files(base_dir, roots, previous)
+        manifest = {
+            "created_at": created_at.isoformat(),
+            "database": SNAPSHOT_NAME,
+            "archive": ARCHIVE_SNAPSHOT_NAME if archive_file is not None else None,
+            "files": {name: asdict(entry) for name, entry in files.items()},
+        }
+        (partial / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+        path = partial.with_suffix("")
+        partial.rename(path)
+        result = BackupResult(path, len(files), copied_files, copied_bytes)
+        logger.info(f"Backup {path.name}: {result.files} files, {copied_files} new ({copied_bytes} bytes)")
+        return result
+
+    def _copy_files(
+        self, base_dir: Path, roots: Iterable[str], previous: dict[str, FileEntry]
+    ) -> tuple[dict[str, FileEntry], int, int]:
+        files: dict[str, FileEntry] = {}
+        copied_files = copied_bytes = 0
+        for name, path in _walk(base_dir, roots):
+            stat = path.stat()
+            known = previous.get(name)
+            if known and (known.size, known.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                sha256 = known.sha256
+            else:
+                sha256 = _sha256(path)
+            files[name] = FileEntry(sha256, stat.st_size, stat.st_mtime_ns)
+
+            target = self.object_path(sha256)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                partial = target.with_name(f"{sha256}.partial")
+                shutil.copyfile(path, partial)
+                partial.replace(target)
+                copied_files += 1
+                copied_bytes += stat.st_size
+        return files, copied_files, copied_bytes
+
+    def restore_files(self, backup: Path, base_dir: Path) -> int:
+        """Write the attachments and recordings of `backup` back under `base_dir`; returns how many."""
+        manifest = self.read_manifest(backup)
+        for name, entry in manifest.items():
+            target = base_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(self.object_path(entry.sha256), target)
+        return len(manifest)
+
+    def prune(self, keep: int) -> list[Path]:
+        """Delete all but the `keep` newest backups, and the stored files no remaining backup refers to."""
+        backups = self.backups()
+        removed = backups[: max(len(backups) - keep, 0)]
+        for backup in removed:
+            shutil.rmtree(backup)
+
+        referenced = {entry.sha256 for backup in self.backups() for entry in self.read_manifest(backup).values()}
+        if self.objects_dir.is_dir():
+            for path in self.objects_dir.glob("*/*"):
+                if path.name not in referenced:
+                    path.unlink()
+        return removed
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import deque
+from collections.abc import Awaitable, Callable, Mapping
+from pathlib import PurePosixPath
+from typing import Any
+
+from settings import JobSettings, Settings
+from src.data_access.db_storage import DbStorage
+from src.data_access.identity_map import unit_of_work
+from src.dependencies import build_ai_service
+from src.models.enums import JobKind
+from src.models.job import Job
+from src.services.ai_batch_service import AiBatchService
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[DbStorage, dict[str, Any]], Awaitable[None]]
+
+
+def enqueue_ai_summary(db: DbStorage, patient_id: int) -> int:
+    """Queue an AI summary of the patient; checks saved before it starts share that one summary."""
+    return db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": patient_id}, dedupe_key=f"ai_summary:{patient_id}")
+
+
+async def summarise_patient(db: DbStorage, payload: dict[str, Any]) -> None:
+    await build_ai_service(db).prepare_and_send_request(int(payload["patient_id"]))
+
+
+async def transcribe_recordings(db: DbStorage, payload: dict[str, Any]) -> None:
+    """Transcribe every voice recording of a medical check, then queue the patient's AI summary."""
+    ai_service = build_ai_service(db)
+    for rec in db.voice_recordings.get_recordings_by_check_id(int(payload["check_id"])):
+        if not rec.file_path or rec.voice_recording_id is None:
+            continue
+        # file_path in DB is relative to voice_recordings/
+        key = f"voice_recordings/{rec.file_path}"
+        if await asyncio.to_thread(db.blobs.stat, key) is not None:
+            with await asyncio.to_thread(db.blobs.open, key) as audio:
+                transcript_json = await ai_service.transcribe_voice_recording(PurePosixPath(key).name, audio)
+            db.voice_recordings.update_transcription(
+                voice_recording_id=rec.voice_recording_id, full_text=transcript_json
+            )
+    if "patient_id" in payload:
+        enqueue_ai_summary(db, int(payload["patient_id"]))
+
+
+def enqueue_ai_batch(db: DbStorage, batch_job_id: int, *, retry_failed: bool = False) -> int:
+    """Queue a run of the batch; while one is queued, queueing it again returns that run."""
+    payload = {"batch_job_id": batch_job_id, "retry_failed": retry_failed}
+    return db.jobs.enqueue(JobKind.AI_BATCH, payload, dedupe_key=f"ai_batch:{batch_job_id}")
+
+
+async def run_ai_batch(db: DbStorage, payload: dict[str, Any]) -> None:
+    batch_job_id = int(payload["batch_job_id"])
+    # A resume queued while the batch runs would send the same pending patients to OpenAI a second time
+    if db.jobs.count_running(f"ai_batch:{batch_job_id}") > 1:
+        logger.info(f"AI batch {batch_job_id} is already running; skipping this run")
+        return
+    batch_service = AiBatchService(db, build_ai_service(db), concurrency=Settings().openai.batch_concurrency)
+    await batch_service.run(batch_job_id, retry_failed=bool(payload.get("retry_failed")))
+
+
+def schedule_maintenance(db: DbStorage, delay_seconds: float = 0) -> int:
+    """Queue the database maintenance job, unless it is queued already."""
+    return db.jobs.enqueue(JobKind.DB_MAINTENANCE, {}, dedupe_key="db_maintenance", delay_seconds=delay_seconds)
+
+
+async def maintain_database(db: DbStorage, payload: dict[str, Any]) -> None:
+    """Refresh planner statistics and give free pages back, then schedule the next run."""
+    settings = Settings().sqlite
+    db.run_maintenance(vacuum_pages=settings.incremental_vacuum_pages)
+    schedule_maintenance(db, delay_seconds=settings.maintenance_interval_seconds)
+
+
+HANDLERS: dict[JobKind, JobHandler] = {
+    JobKind.AI_SUMMARY: summarise_patient,
+    JobKind.TRANSCRIBE_RECORDINGS: transcribe_recordings,
+    JobKind.AI_BATCH: run_ai_batch,
+    JobKind.DB_MAINTENANCE: maintain_database,
+}
+
+
+class JobWorker:
+    """Runs jobs from the `jobs` table, up to `settings.concurrency` at a time.
+
+    Every job runs in its own unit of work, and its lease is renewed by a heartbeat while it runs. A handler
+    raising ValueError is dead-lettered straight away, as retrying cannot fix a bad payload or a missing
+    patient; any other exception is retried with exponential backoff until `max_attempts` is reached.
+
+    `db` may also be a function returning the databases to serve, such as every practice's; free slots are then
+    filled with one job from each database in turn, so a busy database cannot keep the others waiting.
+    """
+
+    def __init__(
+        self,
+        db: DbStorage | Callable[[], list[DbStorage]],
+        settings: JobSettings,
+        handlers: Mapping[JobKind, JobHandler] = HANDLERS,
+        *,
+        owner: str | None = None,
+    ):
+        self.databases = db if callable(db) else lambda: [db]
+        self.settings = settings
+        self.handlers = handlers
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._turn = 0
+
+    async def run(self, stop: asyncio.Event | None = None, *, until_idle: bool = False) -> int:
+        """Process jobs until `stop` is set, or with until_idle until none is due; returns how many ran.
+
+        Jobs already started are finished before returning.
+        """
+        stop = stop or asyncio.Event()
+        stopped = asyncio.ensure_future(stop.wait())
+        running: set[asyncio.Task[None]] = set()
+        processed = 0
+        try:
+            while not stop.is_set():
+                self._lease(running)
+                if until_idle and not running:
+                    break
+
+                done, _ = await asyncio.wait(
+                    {*running, stopped}, timeout=self.settings.poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                finished = done & running
+                processed += len(finished)
+                running -= finished
+            if running:
+                await asyncio.gather(*running)
+                processed += len(running)
+        finally:
+            stopped.cancel()
+        return processed
+
+    def _lease(self, running: set[asyncio.Task[None]]) -> None:
+        databases = self.databases()
+        for db in databases:
+            db.jobs.requeue_expired()
+        # Starts one database further on each time, so the first one is not always served first
+        self._turn = (self._turn + 1) % max(len(databases), 1)
+        queue = deque(databases[self._turn :] + databases[: self._turn])
+        while queue and len(running) < self.settings.concurrency:
+            db = queue.popleft()
+            if job := db.jobs.lease(self.owner, self.settings.lease_seconds):
+                running.add(asyncio.create_task(self._process(db, job)))
+                queue.append(db)
+
+    async def _process(self, db: DbStorage, job: Job) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(db, job.job_id))
+        try:
+            with unit_of_work():
+                handler = self.handlers.get(job.kind)
+                if handler is None:
+                    raise ValueError(f"No handler for job kind '{job.kind}'")
+                await handler(db, job.payload)
+        except Exception as e:  # noqa: BLE001 - every handler error is recorded on the job
+            retry_in = None if isinstance(e, ValueError) else self.backoff_seconds(job.attempts)
+            status = db.jobs.fail(job.job_id, self.owner, f"{type(e).__name__}: {e}", retry_in_seconds=retry_in)
+            logger.warning(f"Job {job.job_id} ({job.kind}) failed on attempt {job.attempts}, now {status}: {e}")
+        else:
+            db.jobs.complete(job.job_id, self.owner)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, db: DbStorage, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.settings.lease_seconds / 3)
+            if not db.jobs.heartbeat(job_id, self.owner, self.settings.lease_seconds):
+                logger.warning(f"Lost the lease on job {job_id}; its result will be discarded")
+                return
+
+    def backoff_seconds(self, attempts: int) -> float:
+        return min(self.settings.backoff_base_seconds * 2 ** (attempts - 1), self.settings.backoff_max_seconds)
@@ -15,56 +15,20 @@ class MockAiService(AiService):
         self.mock_mode = os.getenv("AI_MOCK_MODE", "live")
         self.fixtures_dir = Path(os.getenv("AI_FIXTURES_DIR", "tests/fixtures/ai_responses"))
 
-    async def prepare_and_send_request(self, patient_id: int) -> tuple[AiRequest, AiResponse | None]:
+    async def send_request(
+        self, patient_id: int, payload: dict[str, Any], token_counts: dict[str, int]
+    ) -> tuple[AiRequest, AiResponse | None]:
         if self.mock_mode == "live":
-            return await super().prepare_and_send_request(patient_id)
-
-        # 1. Collect data (same as super)
-        patient = self.db.patients.get_patient(patient_id)
-        if not patient:
-            raise ValueError(f"Patient {patient_id} not found")
-
-        medical_checks = self.db.medical_checks.get_medical_checks(patient_id)
-        anonymized_patient = self._anonymize_patient(patient)
-        anonymized_checks = [self._anonymize_medical_check(mc) for mc in medical_checks]
-
-        payload = {
-            "model": self.settings.model,
-            "messages": [
-                {"role": "system", "content": self.settings.system_prompt},
-                {
-                    "role": "user",
-                    "content": json.dumps(
-                        {
-                            "patient_info": anonymized_patient,
-                            "medical_history": anonymized_checks,
-                        },
-                        indent=2,
-                    ),
-                },
-            ],
-        }
+            return await super().send_request(patient_id, payload, token_counts)
 
         cache_key = self._generate_cache_key(payload)
         cache_file = self.fixtures_dir / f"{cache_key}.json"
 
         if self.mock_mode == "playback":
-            if cache_file.exists():
-                with open(cache_file, "r") as f:
-                    cached_data = json.load(f)
-
-                ai_request = AiRequest(
-                    patient_id=patient_id,
-                    model_name=self.settings.model,
-                    model_url=self.settings.url,
-                    system_prompt_text=self.settings.system_prompt,
-                    request_payload_json=json.dumps(payload),
-                )
-                self.db.ai_requests.save(ai_request)
+            ai_request = self._save_request(patient_id, payload, token_counts)
 
-                ai_response = AiResponse(request_id=ai_request.id, response_json=json.dumps(cached_data))  # type: ignore
-                self.db.ai_responses.save(ai_response)
-                return ai_request, ai_response
+            if cache_file.exists():
+                response_json = cache_file.read_text()
             else:
                 # If no fixture found, return a dummy response instead of failing
                 # This makes tests more robust if they don't strictly depend on AI content
@@ -75,23 +39,14 @@ class MockAiService(AiService):
                     },
                     "Charts": [],
                 }
-                ai_request = AiRequest(
-                    patient_id=patient_id,
-                    model_name=self.settings.model,
-                    model_url=self.settings.url,
-                    system_prompt_text=self.settings.system_prompt,
-                    request_payload_json=json.dumps(payload),
-                )
-                self.db.ai_requests.save(ai_request)
-                ai_response = AiResponse(
-                    request_id=ai_request.id,  # type: ignore
-                    response_json=json.dumps({"choices": [{"message": {"content": json.dumps(dummy_content)}}]}),
-                )
-                self.db.ai_responses.save(ai_response)
-                return ai_request, ai_response
+                response_json = json.dumps({"choices": [{"message": {"content": json.dumps(dummy_content)}}]})
+
+            ai_response = AiResponse(request_id=ai_request.id, response_json=response_json)  # type: ignore
+            self.db.ai_responses.save(ai_response)
+            return ai_request, ai_response
 
         # Record mode
-        ai_request_rec, ai_response_rec = await super().prepare_and_send_request(patient_id)
+        ai_request_rec, ai_response_rec = await super().send_request(patient_id, payload, token_counts)
 
         if ai_response_rec:
             self.fixtures_dir.mkdir(parents=True, exist_ok=True)
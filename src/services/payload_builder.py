@@ -0,0 +1,157 @@
+from typing import Any
+
+import pydantic_core
+
+from src.models.enums import MedicalCheckStatus
+from src.models.medical_check import MedicalCheck
+
+# Rough heuristic for English prose and JSON; good enough for budgeting without a tokenizer dependency
+CHARS_PER_TOKEN = 4
+ATTACHMENT_SUMMARY_CHARS = 2000
+# Below this allowance a truncated attachment is more noise than signal, so it is left out
+MIN_TRUNCATED_TOKENS = 50
+
+_STATUS_PRIORITY = {
+    MedicalCheckStatus.RED: 0,
+    MedicalCheckStatus.AMBER: 1,
+    MedicalCheckStatus.GREEN: 2,
+}
+
+
+def to_compact_json(value: Any) -> str:
+    """Serialise plain JSON-compatible data without whitespace using pydantic-core's Rust encoder."""
+    return pydantic_core.to_json(value).decode("utf-8")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def summarise_attachment_text(text: str | None, max_chars: int = ATTACHMENT_SUMMARY_CHARS) -> str | None:
+    """Build an extractive summary of parsed attachment text.
+
+    Whitespace is collapsed and duplicate lines dropped. Lines carrying numbers (results, ranges, dates)
+    are kept first, prose fills whatever room is left, and the original line order is preserved.
+    Returns None when the text is short enough to be sent as-is.
+    """
+    if not text or len(text) <= max_chars:
+        return None
+
+    lines: list[str] = []
+    seen: set[str] = set()
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if line and line not in seen:
+            seen.add(line)
+            lines.append(line)
+
+    by_priority = sorted(range(len(lines)), key=lambda i: (not any(c.isdigit() for c in lines[i]), i))
+    selected: set[int] = set()
+    used = 0
+    for i in by_priority:
+        cost = len(lines[i]) + 1
+        if used + cost > max_chars:
+            continue
+        selected.add(i)
+        used += cost
+
+    return "\n".join(lines[i] for i in sorted(selected)) or text[:max_chars]
+
+
+class PayloadBuilder:
+    """Assembles the user message for the AI request within a token budget.
+
+    Checks are admitted in priority order (Red, then Amber, then Green; most recent first within a status)
+    until the budget is spent. Attachment text is then added to the admitted checks in the same order:
+    the full parsed content if it fits, else the summary stored at upload, else a truncated prefix.
+    """
+
+    def __init__(self, *, token_budget: int, attachment_token_limit: int):
+        self.token_budget = token_budget
+        self.attachment_token_limit = attachment_token_limit
+
+    def build(
+        self,
+        *,
+        system_prompt: str,
+        patient_info: dict[str, Any],
+        medical_history: list[tuple[MedicalCheck, dict[str, Any]]],
+    ) -> tuple[str, dict[str, int]]:
+        """Return the serialised user message content and the estimated token count per section.
+
+        Each `medical_history` entry pairs a check with its anonymized dict, which is extended in place
+        with attachment content. Every check is serialised once for costing and that fragment is reused
+        in the output, so only checks that gained attachment text are serialised twice.
+        """
+        patient_json = to_compact_json(patient_info)
+        counts = {
+            "system_prompt": estimate_tokens(system_prompt),
+            "patient_info": estimate_tokens(patient_json),
+        }
+        remaining = self.token_budget - counts["system_prompt"] - counts["patient_info"]
+
+        ranked = sorted(
+            range(len(medical_history)),
+            key=lambda i: (
+                _STATUS_PRIORITY.get(medical_history[i][0].status, len(_STATUS_PRIORITY)),
+                -medical_history[i][0].check_date.toordinal(),
+            ),
+        )
+
+        fragments: dict[int, str] = {}
+        history_tokens = 0
+        for i in ranked:
+            fragment = to_compact_json(medical_history[i][1])
+            if (cost := estimate_tokens(fragment)) > remaining:
+                continue
+            fragments[i] = fragment
+            remaining -= cost
+            history_tokens += cost
+
+        attachment_tokens = 0
+        for i in [i for i in ranked if i in fragments]:
+            mc, data = medical_history[i]
+            check_tokens = 0
+            for idx, attachment in enumerate(mc.attachments):
+                if not attachment.parsed_content:
+                    continue
+                used = self._add_attachment_text(
+                    data["attachments"][idx],
+                    parsed_content=attachment.parsed_content,
+                    summary=attachment.summary,
+                    allowance=min(remaining, self.attachment_token_limit),
+                )
+                remaining -= used
+                check_tokens += used
+            if check_tokens:
+                fragments[i] = to_compact_json(data)
+                attachment_tokens += check_tokens
+
+        counts["medical_history"] = history_tokens
+        counts["attachments"] = attachment_tokens
+        counts["total"] = sum(counts.values())
+        counts["budget"] = self.token_budget
+        counts["omitted_checks"] = len(medical_history) - len(fragments)
+
+        history_json = ",".join(fragments[i] for i in sorted(fragments))
+        content = f'{{"patient_info":{patient_json},"medical_history":[{history_json}]}}'
+        return content, counts
+
+    @staticmethod
+    def _add_attachment_text(
+        target: dict[str, Any], *, parsed_content: str, summary: str | None, allowance: int
+    ) -> int:
+        if (tokens := estimate_tokens(parsed_content)) <= allowance:
+            target["content"] = parsed_content
+            return tokens
+
+        if summary and (tokens := estimate_tokens(summary)) <= allowance:
+            target["summary"] = summary
+            return tokens
+
+        if allowance >= MIN_TRUNCATED_TOKENS:
+            target["content"] = parsed_content[: allowance * CHARS_PER_TOKEN]
+            target["content_truncated"] = True
+            return allowance
+
+        return 0
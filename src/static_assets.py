@@ -0,0 +1,93 @@
+import json
+from functools import cache
+from pathlib import Path
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Scope
+
+STATIC_DIR = Path("src/static")
+STATIC_URL = "/static"
+# Output of build_assets.py: content-hashed copies of every static file, plus their .gz/.br variants
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# Third-party assets served from /static once vendored by build_assets.py; until then pages use the CDN
+VENDORED_ASSETS = {
+    "vendor/bootstrap/bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/bootstrap.bundle.min.js": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js"
+    ),
+    "vendor/bootstrap-icons/bootstrap-icons.min.css": (
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css"
+    ),
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2": (
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2"
+    ),
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff": (
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff"
+    ),
+    "vendor/htmx/htmx.min.js": "https://unpkg.com/htmx.org@2.0.4/dist/htmx.min.js",
+    "vendor/chart.js/chart.umd.min.js": "https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js",
+}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Preferred first; build_assets.py writes these next to each compressible file
+_PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+@cache
+def load_manifest(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    """Logical asset path (relative to the static dir) -> fingerprinted path; empty before the first build."""
+    path = static_dir / DIST_DIR / MANIFEST_NAME
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def asset_url(path: str) -> str:
+    """URL of a static asset, e.g. asset_url("js/audio-recorder.js"); exposed to templates as a Jinja global."""
+    if hashed := load_manifest().get(path):
+        return f"{STATIC_URL}/{DIST_DIR}/{hashed}"
+    if path in VENDORED_ASSETS and not (STATIC_DIR / path).is_file():
+        return VENDORED_ASSETS[path]
+    return f"{STATIC_URL}/{path}"
+
+
+def accepted_encodings(scope: Scope) -> set[str]:
+    """Content codings the client accepts, from its Accept-Encoding header."""
+    accepted = set()
+    for token in Headers(scope=scope).get("accept-encoding", "").split(","):
+        coding, _, params = token.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles that caches fingerprinted files forever and serves their precompressed variants."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not path.startswith(f"{DIST_DIR}/"):
+            return await super().get_response(path, scope)
+
+        accepted = accepted_encodings(scope)
+        response = None
+        for encoding, suffix in _PRECOMPRESSED.items():
+            if encoding not in accepted:
+                continue
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                continue
+            # FileResponse takes the type of "x.css.gz" from "x.css", the suffix being an encoding
+            response.headers["Content-Encoding"] = encoding
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1,85 @@
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Mapping
+from pathlib import Path
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from src.static_assets import asset_url
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path("src/templates")
+# Rendered output is sent in chunks of about this many characters
+STREAM_CHUNK_CHARS = 16 * 1024
+
+
+def safe_json_decode(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _create_environment() -> Environment:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        extensions=["jinja2.ext.loopcontrols"],
+    )
+    env.filters["json_decode"] = safe_json_decode
+    env.globals["asset_url"] = asset_url
+    return env
+
+
+# Shared by every router, so each template is compiled and cached once per process
+templates = Jinja2Templates(env=_create_environment())
+
+
+def configure_templates(*, auto_reload: bool, bytecode_cache_dir: Path | None) -> None:
+    """Apply deployment settings: production skips the per-render mtime check and reuses compiled bytecode."""
+    env = templates.env
+    env.auto_reload = auto_reload
+    if bytecode_cache_dir is None:
+        env.bytecode_cache = None
+        return
+    bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+
+
+def precompile_templates() -> int:
+    """Compile every template now rather than on its first request; returns how many were loaded."""
+    started = time.perf_counter()
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    logger.info(f"Compiled {len(names)} templates in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return len(names)
+
+
+def stream_template(request: Request, name: str, context: Mapping[str, Any]) -> StreamingResponse:
+    """Render a template piece by piece with Template.generate, sending it as it is produced.
+
+    Pass row generators (e.g. PatientsStorage.iter_patients) in `context` to keep memory flat for long
+    lists. Rendering stays on the event loop thread, which owns the sqlite connection those rows come from.
+    """
+    template = templates.env.get_template(name)
+
+    async def chunks() -> AsyncIterator[str]:
+        buffer: list[str] = []
+        size = 0
+        for piece in template.generate({**context, "request": request}):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_CHUNK_CHARS:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+
+    return StreamingResponse(chunks(), media_type="text/html; charset=utf-8")
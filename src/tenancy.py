@@ -0,0 +1,218 @@
+import asyncio
+import re
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import AbstractAsyncContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from settings import Settings
+from src.data_access.backends import is_postgres
+from src.data_access.blob_store import BlobStore, LocalBlobStore, S3BlobStore
+from src.data_access.db_storage import DbStorage
+from src.data_access.group_commit import GroupCommitWriter
+from src.static_assets import STATIC_URL
+
+logger = getLogger(__name__)
+
+# Requests pick their practice with the first label of the host name, or with this header when
+# TENANCY_TRUST_PRACTICE_HEADER says a proxy in front sets it
+PRACTICE_HEADER = "X-Practice-Id"
+_PRACTICE_ID = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+SHARD_DB_NAME = "database.sqlite"
+
+
+class UnknownPracticeError(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class Practice:
+    """Where one practice's data lives: its database file, and the root of its attachments and recordings.
+
+    practice_id is None when the app runs for a single practice, whose database may be a postgresql:// URL.
+    """
+
+    practice_id: str | None
+    db_file: Path | str
+    files_root: Path
+
+
+def single_practice(settings: Settings) -> Practice:
+    return Practice(None, settings.database, Path())
+
+
+def blob_store_for(settings: Settings, practice: Practice) -> BlobStore:
+    """The store of the practice's attachments and recordings: under files_root, or under its id in the bucket."""
+    blob_settings = settings.blob_store
+    if blob_settings.backend == "local":
+        return LocalBlobStore(practice.files_root)
+    return S3BlobStore(
+        bucket=blob_settings.s3_bucket,
+        access_key=blob_settings.s3_access_key_id,
+        secret_key=blob_settings.s3_secret_access_key,
+        endpoint=blob_settings.s3_endpoint,
+        region=blob_settings.s3_region,
+        prefix=f"{practice.practice_id}/" if practice.practice_id else "",
+        part_size=blob_settings.part_size,
+        presign_seconds=blob_settings.presign_seconds,
+    )
+
+
+def practice_for(settings: Settings, practice_id: str) -> Practice:
+    if not _PRACTICE_ID.match(practice_id):
+        raise UnknownPracticeError(practice_id)
+    root = settings.tenancy.practices_dir / practice_id
+    return Practice(practice_id, root / SHARD_DB_NAME, root)
+
+
+def all_practices(settings: Settings) -> list[Practice]:
+    """Every practice with a database, or just the single practice when sharding is off."""
+    if not settings.tenancy.enabled:
+        return [single_practice(settings)]
+    if not settings.tenancy.practices_dir.is_dir():
+        return []
+    return [
+        practice_for(settings, path.parent.name)
+        for path in sorted(settings.tenancy.practices_dir.glob(f"*/{SHARD_DB_NAME}"))
+        if _PRACTICE_ID.match(path.parent.name)
+    ]
+
+
+def resolve_practice(settings: Settings, practice_id: str | None) -> Practice:
+    """The practice a command line tool works on: `practice_id`, required when sharding is on."""
+    if not settings.tenancy.enabled:
+        return single_practice(settings)
+    if not practice_id:
+        raise UnknownPracticeError("A practice id is required when TENANCY_ENABLED is set")
+    practice = practice_for(settings, practice_id)
+    if not Path(practice.db_file).exists():
+        raise UnknownPracticeError(practice_id)
+    return practice
+
+
+@dataclass
+class Shard:
+    """An open practice database, with its group commit writer and its share of concurrent requests."""
+
+    practice: Practice
+    storage: DbStorage
+    writer: GroupCommitWriter | None
+    slots: AbstractAsyncContextManager
+    in_use: int = field(default=0)
+
+    def close(self) -> None:
+        if self.writer:
+            self.writer.close()
+        self.storage.close()
+
+
+class ShardPool:
+    """Keeps the databases of the most recently used practices open, up to `max_open_shards` of them.
+
+    Shards used by a request in flight are never closed; when every open shard is busy the pool grows past
+    its bound for a while and shrinks back as requests finish.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.max_open = max(settings.tenancy.max_open_shards, 1)
+        self.opened = 0
+        self.evicted = 0
+        self._shards: OrderedDict[str | None, Shard] = OrderedDict()
+
+    def resolve(self, headers: dict[str, str], host: str | None) -> Practice:
+        """The practice a request is for: the host name's first label, or the trusted X-Practice-Id header."""
+        tenancy = self.settings.tenancy
+        if not tenancy.enabled:
+            return single_practice(self.settings)
+        # Clients can send any header they like; left untrusted it would let them read another practice's data
+        header = headers.get(PRACTICE_HEADER.lower()) if tenancy.trust_practice_header else None
+        practice_id = header or (host or "").split(":", 1)[0].split(".", 1)[0]
+        practice = practice_for(self.settings, practice_id.lower())
+        if practice.practice_id not in self._shards and not Path(practice.db_file).exists():
+            raise UnknownPracticeError(practice_id)
+        return practice
+
+    @contextmanager
+    def checkout(self, practice: Practice) -> Iterator[Shard]:
+        shard = self._shards.get(practice.practice_id)
+        if shard is None:
+            shard = self._shards[practice.practice_id] = self._open(practice)
+        self._shards.move_to_end(practice.practice_id)
+        shard.in_use += 1
+        self._evict()
+        try:
+            yield shard
+        finally:
+            shard.in_use -= 1
+            self._evict()
+
+    def _open(self, practice: Practice) -> Shard:
+        writer = None
+        # PostgreSQL commits concurrent transactions together by itself
+        if self.settings.group_commit.enabled and not is_postgres(practice.db_file):
+            writer = GroupCommitWriter(
+                Path(practice.db_file),
+                window_seconds=self.settings.group_commit.window_ms / 1000,
+                max_batch=self.settings.group_commit.max_batch,
+            )
+            writer.start()
+        # Without sharding the single practice is never queued behind itself
+        tenancy = self.settings.tenancy
+        slots = asyncio.Semaphore(tenancy.max_concurrent_requests) if tenancy.enabled else nullcontext()
+        self.opened += 1
+        storage = DbStorage(practice.db_file, blobs=blob_store_for(self.settings, practice))
+        return Shard(practice, storage, writer, slots)
+
+    def _evict(self) -> None:
+        while len(self._shards) > self.max_open:
+            for idle, shard in self._shards.items():
+                if shard.in_use == 0:
+                    break
+            else:
+                return
+            del self._shards[idle]
+            shard.close()
+            self.evicted += 1
+            logger.info(f"Closed the database of practice {idle}")
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def close(self) -> None:
+        while self._shards:
+            self._shards.popitem()[1].close()
+
+
+class PracticeMiddleware:
+    """Resolves each request's practice and runs it against that practice's shard.
+
+    The shard is held until the response has been sent, so streamed bodies and background tasks still find
+    their database open. Requests for a practice with no database get a 404.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(STATIC_URL):
+            await self.app(scope, receive, send)
+            return
+
+        pool: ShardPool = scope["app"].state.shards
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        try:
+            practice = pool.resolve(headers, headers.get("host"))
+        except UnknownPracticeError:
+            await JSONResponse({"detail": "Unknown practice"}, status_code=404)(scope, receive, send)
+            return
+
+        with pool.checkout(practice) as shard:
+            async with shard.slots:
+                scope.setdefault("state", {})["shard"] = shard
+                await self.app(scope, receive, send)
@@ -0,0 +1,116 @@
+"""Background job worker: runs the AI summaries, transcriptions and AI batches queued by the web app.
+
+It also runs the periodic database maintenance (PRAGMA optimize and incremental vacuum), every
+SQLITE_MAINTENANCE_INTERVAL_SECONDS.
+
+Run one or more next to the web server, from the project root so attachment paths resolve:
+
+    uv run python -m src.worker [--concurrency 2] [--drain] [--practice ID]
+
+With TENANCY_ENABLED each practice has its own queue in its own database. A worker serves every practice,
+taking one job from each in turn and picking up practices created while it runs, or only the one --practice.
+
+Each worker has its own database connection. SIGINT/SIGTERM stop leasing new jobs and let running ones
+finish; jobs left unfinished by a killed worker are picked up again once their lease expires.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import time
+from collections.abc import Callable
+from functools import partial
+
+from settings import Settings
+from src.data_access.db_storage import DbStorage
+from src.services.job_worker import JobWorker, schedule_maintenance
+from src.tenancy import Practice, all_practices, blob_store_for, resolve_practice
+
+logger = logging.getLogger(__name__)
+
+
+class PracticeDatabases:
+    """The databases of the practices a worker serves, opened when first seen and kept open.
+
+    `practices` is listed again at most every `rescan_seconds`, so practices created later are served too.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        practices: Callable[[], list[Practice]],
+        *,
+        rescan_seconds: float,
+        maintain: bool = True,
+    ) -> None:
+        self.settings = settings
+        self.practices = practices
+        self.rescan_seconds = rescan_seconds
+        self.maintain = maintain
+        self._open: dict[str | None, DbStorage] = {}
+        self._scanned_at: float | None = None
+
+    def __call__(self) -> list[DbStorage]:
+        now = time.monotonic()
+        if self._scanned_at is None or now - self._scanned_at >= self.rescan_seconds:
+            self._scanned_at = now
+            for practice in self.practices():
+                if practice.practice_id not in self._open:
+                    self._open[practice.practice_id] = self._connect(practice)
+        return list(self._open.values())
+
+    def _connect(self, practice: Practice) -> DbStorage:
+        db = DbStorage(practice.db_file, blobs=blob_store_for(self.settings, practice))
+        if self.maintain:
+            # Runs now and then reschedules itself; a no-op when another worker has it queued already
+            schedule_maintenance(db)
+        if practice.practice_id:
+            logger.info(f"Serving the jobs of practice {practice.practice_id}")
+        return db
+
+    def close(self) -> None:
+        while self._open:
+            self._open.popitem()[1].close()
+
+
+async def _serve(worker: JobWorker, drain: bool) -> int:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return await worker.run(stop, until_idle=drain)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, help="Jobs run at the same time (default: JOBS_CONCURRENCY)")
+    parser.add_argument("--drain", action="store_true", help="Exit once no job is due instead of polling")
+    parser.add_argument("--practice", help="The practice to work on; required when TENANCY_ENABLED is set")
+    args = parser.parse_args()
+
+    settings = Settings()
+    job_settings = settings.jobs
+    if args.concurrency:
+        job_settings = job_settings.model_copy(update={"concurrency": args.concurrency})
+
+    if settings.tenancy.enabled and not args.practice:
+        practices = partial(all_practices, settings)
+    else:
+        practice = resolve_practice(settings, args.practice)
+        practices = partial(list, [practice])
+    databases = PracticeDatabases(
+        settings, practices, rescan_seconds=job_settings.poll_interval, maintain=not args.drain
+    )
+    worker = JobWorker(databases, job_settings)
+    logger.info(f"Worker {worker.owner} started with concurrency {job_settings.concurrency}")
+    try:
+        processed = asyncio.run(_serve(worker, args.drain))
+    finally:
+        databases.close()
+    logger.info(f"Worker {worker.owner} stopped after {processed} jobs")
+
+
+if __name__ == "__main__":
+    main()
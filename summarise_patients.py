@@ -0,0 +1,62 @@
+"""Batch AI summaries for a list of patients, e.g. everyone booked into today's clinics.
+
+Usage:
+    uv run python summarise_patients.py [--patients 1,2,3] [--concurrency 4] [--practice ID]
+    uv run python summarise_patients.py --resume JOB_ID [--retry-failed] [--practice ID]
+
+With TENANCY_ENABLED the patients, and the job, are those of the practice given with --practice.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from settings import Settings
+from src.data_access.db_storage import DbStorage
+from src.dependencies import build_ai_service
+from src.models.ai_batch_job import AiBatchJob
+from src.services.ai_batch_service import AiBatchService
+from src.tenancy import blob_store_for, resolve_practice
+
+logger = logging.getLogger(__name__)
+
+
+def _report(job: AiBatchJob) -> None:
+    processed = job.done + job.skipped + job.failed
+    eta = f"{job.eta_seconds:.0f}s" if job.eta_seconds is not None else "n/a"
+    logger.info(
+        f"job {job.job_id}: {processed}/{job.total} "
+        f"(done={job.done}, skipped={job.skipped}, failed={job.failed}) eta={eta}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings = Settings()
+    practice = resolve_practice(settings, args.practice)
+    storage = DbStorage(practice.db_file, blobs=blob_store_for(settings, practice))
+    try:
+        concurrency = args.concurrency or settings.openai.batch_concurrency
+        service = AiBatchService(storage, build_ai_service(storage), concurrency=concurrency)
+
+        if args.resume is not None:
+            job_id = args.resume
+        else:
+            patient_ids = [int(p) for p in args.patients.split(",") if p.strip()] if args.patients else None
+            job_id = service.create_job(patient_ids).job_id
+            logger.info(f"Created AI batch job {job_id}")
+
+        _report(await service.run(job_id, retry_failed=args.retry_failed, on_progress=_report))
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", help="Comma-separated patient ids (default: all patients)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent AI requests (default: OPENAI_BATCH_CONCURRENCY)")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="Resume an interrupted job")
+    parser.add_argument("--retry-failed", action="store_true", help="When resuming, retry failed patients too")
+    parser.add_argument("--practice", help="The practice to work on; required when TENANCY_ENABLED is set")
+    asyncio.run(main(parser.parse_args()))
@@ -1,23 +1,54 @@
+import os
 import re
+import uuid
 from collections.abc import Generator
 from pathlib import Path
+from urllib.parse import quote
 
 import pytest
 from fastapi.testclient import TestClient
 
 from migrate import apply_migrations
+from src.data_access.backends import close_pools, connect
 from src.main import create_app
 
+# A postgresql:// URL runs the suite against PostgreSQL, each test in a schema of its own
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if TEST_DATABASE_URL:
+        skip = pytest.mark.skip(reason="SQLite only")
+        for item in items:
+            if "sqlite_only" in item.keywords:
+                item.add_marker(skip)
+
 
 @pytest.fixture()
-def temp_db_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
-    db_path = tmp_path / "test.sqlite"
-    monkeypatch.setenv("DB_FILE", str(db_path))
-    return db_path
+def temp_db_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[Path | str]:
+    if not TEST_DATABASE_URL:
+        db_path = tmp_path / "test.sqlite"
+        monkeypatch.setenv("DB_FILE", str(db_path))
+        yield db_path
+        return
+
+    schema = f"test_{uuid.uuid4().hex}"
+    admin = connect(TEST_DATABASE_URL)
+    admin.execute(f"CREATE SCHEMA {schema}")
+    admin.close()
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    url = f"{TEST_DATABASE_URL}{separator}options={quote(f'-csearch_path={schema}')}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    yield url
+    close_pools()
+    admin = connect(TEST_DATABASE_URL)
+    admin.execute(f"DROP SCHEMA {schema} CASCADE")
+    admin.close()
+    close_pools()
 
 
 @pytest.fixture()
-def migrated_db(temp_db_path: Path) -> Path:
+def migrated_db(temp_db_path: Path | str) -> Path | str:
     apply_migrations(str(temp_db_path))
     return temp_db_path
 
@@ -28,7 +59,7 @@ def app(migrated_db: Path):
 
 
 @pytest.fixture()
-def client(app) -> Generator[TestClient, None, None]:
+def client(app) -> Generator[TestClient]:
     with TestClient(app) as c:
         yield c
 
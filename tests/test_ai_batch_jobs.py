@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from settings import JobSettings, OpenAISettings
+from src.data_access.db_storage import DbStorage
+from src.models.enums import AiBatchItemStatus, AiBatchJobStatus
+from src.services.ai_batch_service import AiBatchService, _retry_after_seconds
+from src.services.job_worker import JobWorker, enqueue_ai_batch
+from src.services.mock_ai_service import MockAiService
+
+
+def _settings() -> OpenAISettings:
+    return OpenAISettings(
+        api_key="",
+        system_prompt="Test prompt",
+        model="test-model",
+        url="https://example.com",
+        timeout=30.0,
+        response_format={"type": "json_object"},
+    )
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str | None):
+        super().__init__("rate limited")
+        self.response = MagicMock(headers={"retry-after": retry_after} if retry_after else {})
+
+
+def test_retry_after_seconds():
+    assert _retry_after_seconds(ValueError("boom")) is None
+    assert _retry_after_seconds(_RateLimitError("2.5")) == 2.5
+    assert _retry_after_seconds(_RateLimitError("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+    assert _retry_after_seconds(_RateLimitError(None)) == 5.0
+
+
+@pytest.mark.asyncio
+async def test_batch_summarises_then_skips_unchanged_patients(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    first, second = create_patient(), create_patient({"first_name": "jane"})
+    service = AiBatchService(db, MockAiService(db, _settings()), concurrency=2)
+
+    progress = []
+    job = await service.run(service.create_job([first, second]).job_id, on_progress=progress.append)
+
+    assert job.status == AiBatchJobStatus.COMPLETED
+    assert (job.total, job.done, job.skipped, job.failed, job.pending) == (2, 2, 0, 0, 0)
+    assert [p.pending for p in progress] == [1, 0]
+
+    rerun = await service.run(service.create_job([first, second, 9999]).job_id)
+
+    assert (rerun.done, rerun.skipped, rerun.failed) == (0, 2, 1)
+    assert len(db.ai_requests.get_by_patient(first)) == 1
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_retries_after_rate_limit_and_resumes(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    ai_service = MockAiService(db, _settings())
+    ai_service.send_request = AsyncMock(side_effect=[_RateLimitError("0"), _RateLimitError("0"), _RateLimitError("0")])
+
+    service = AiBatchService(db, ai_service, concurrency=1, max_attempts=3)
+    job = await service.run(service.create_job([patient_id]).job_id)
+
+    assert job.failed == 1
+    assert ai_service.send_request.await_count == 3
+
+    # Resuming without retry_failed leaves the failed patient alone; with it the patient is retried
+    ai_service.send_request = AsyncMock(side_effect=[_RateLimitError("0"), None])
+    assert (await service.run(job.job_id)).failed == 1
+    resumed = await service.run(job.job_id, retry_failed=True)
+
+    assert (resumed.done, resumed.failed) == (1, 0)
+    assert db.ai_batch_jobs.get_patient_ids(job.job_id, AiBatchItemStatus.DONE) == [patient_id]
+    db.close()
+
+
+def test_ai_batch_job_endpoints(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+
+    resp = client.post("/admin/ai_batch_jobs", json={"patient_ids": [patient_id]})
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    assert resp.headers["location"] == f"/admin/ai_batch_jobs/{job_id}"
+    assert client.get(f"/admin/ai_batch_jobs/{job_id}").json()["status"] == "pending"
+
+    # The batch is run by the worker process
+    db = DbStorage(migrated_db)
+    asyncio.run(JobWorker(db, JobSettings()).run(until_idle=True))
+    db.close()
+
+    resp = client.get(f"/admin/ai_batch_jobs/{job_id}")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "completed"
+    assert resp.json()["done"] == 1
+
+    resp = client.post(f"/admin/ai_batch_jobs/{job_id}/resume")
+    assert resp.status_code == 202
+
+    assert client.post("/admin/ai_batch_jobs", json={"patient_ids": "all"}).status_code == 422
+    assert client.get("/admin/ai_batch_jobs/999").status_code == 404
+
+
+def test_a_batch_is_never_run_twice_at_once(create_patient, migrated_db):
+    db = DbStorage(migrated_db)
+    batch_job_id = db.ai_batch_jobs.create_job([create_patient()])
+    first = enqueue_ai_batch(db, batch_job_id)
+    assert enqueue_ai_batch(db, batch_job_id, retry_failed=True) == first
+
+    # A resume queued while the first run holds its lease is skipped when its turn comes
+    db.jobs.lease("w1", lease_seconds=30)
+    enqueue_ai_batch(db, batch_job_id)
+    assert asyncio.run(JobWorker(db, JobSettings(), owner="w2").run(until_idle=True)) == 1
+
+    job = db.ai_batch_jobs.get_job(batch_job_id)
+    assert job is not None and (job.status, job.pending) == (AiBatchJobStatus.PENDING, 1)
+    db.close()
@@ -0,0 +1,215 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from src.data_access.archive import attach_archive
+from src.data_access.db_storage import DbStorage
+from src.models.address import Address
+from src.models.ai_request import AiRequest
+from src.models.ai_response import AiResponse
+from src.models.enums import Sex, Title
+from src.models.medical_check_item import MedicalCheckItem
+from src.models.patient import Patient
+
+# Needs the SQLite files themselves
+pytestmark = pytest.mark.sqlite_only
+
+
+def _patient(first_name: str) -> Patient:
+    return Patient(
+        title=Title.MS,
+        first_name=first_name,
+        last_name="doe",
+        sex=Sex.FEMALE,
+        dob=date(1980, 5, 1),
+        email=f"{first_name}@example.com",
+        phone="000",
+        address=Address(line_1="1 Test Street", line_2=None, town="Testville", postcode="SW1A1AA", country="UK"),
+    )
+
+
+def _add_patient(db: DbStorage, first_name: str) -> int:
+    patient_id = db.patients.save(_patient(first_name)).patient_id
+    assert patient_id is not None
+    return patient_id
+
+
+def _get_patient(db: DbStorage, patient_id: int, *, include_archived: bool = False) -> Patient:
+    patient = db.patients.get_patient(patient_id, include_archived=include_archived)
+    assert patient is not None
+    return patient
+
+
+def _archive_file(db: DbStorage) -> Path:
+    assert db.archive_file is not None
+    return db.archive_file
+
+
+def _add_check(db: DbStorage, patient_id: int, check_date: str) -> int:
+    return db.medical_checks.save(
+        patient_id=patient_id,
+        check_template="blood",
+        check_date=check_date,
+        status="Green",
+        medical_check_items=[MedicalCheckItem(name="Glucose", units="mmol/L", value="5.1")],
+        notes="Routine review",
+        attachments=[{"filename": "a.pdf", "content_type": "application/pdf", "file_path": "1/a.pdf"}],
+    )
+
+
+def _add_ai_request(db: DbStorage, patient_id: int, created_at: str) -> int:
+    request = db.ai_requests.save(
+        AiRequest(
+            patient_id=patient_id, model_name="m", model_url="u", system_prompt_text="s", request_payload_json="{}"
+        )
+    )
+    assert request.id is not None
+    db.ai_responses.save(AiResponse(request_id=request.id, response_json='{"sections": []}'))
+    db.connection.execute("UPDATE ai_requests SET created_at = ? WHERE id = ?", [created_at, request.id])
+    db.commit()
+    return request.id
+
+
+@pytest.fixture()
+def db(migrated_db: Path):
+    storage = DbStorage(migrated_db)
+    attach_archive(storage.connection, _archive_file(storage), create=True)
+    yield storage
+    storage.close()
+
+
+def test_inactive_patients_move_to_the_archive(db: DbStorage, migrated_db: Path):
+    left = _add_patient(db, "left")
+    active = _add_patient(db, "active")
+    _add_check(db, left, "2001-01-01")
+    _add_check(db, active, "2001-01-01")
+    _add_check(db, active, date.today().isoformat())
+    _add_ai_request(db, left, "2001-01-02 10:00:00")
+
+    assert db.archive.archive_inactive_patients(inactive_months=60, batch_size=1) == 1
+
+    assert db.patients.get_patient(left) is None
+    assert db.medical_checks.get_medical_checks(left) == []
+    assert [p.patient_id for p in db.patients.get_all_patients()] == [active]
+
+    archived = _get_patient(db, left, include_archived=True)
+    assert (archived.first_name, archived.address.town) == ("Left", "Testville")
+    [check] = db.medical_checks.get_medical_checks(left, include_archived=True)
+    assert (check.check_date, check.notes) == (date(2001, 1, 1), "Routine review")
+    assert [i.name for i in check.medical_check_items] == ["Glucose"]
+    assert [a.filename for a in check.attachments] == ["a.pdf"]
+    [request] = db.ai_requests.get_by_patient(left, include_archived=True)
+    assert request.id is not None
+    assert len(db.ai_responses.get_by_request(request.id, include_archived=True)) == 1
+    assert [p.patient_id for p in db.patients.get_all_patients(include_archived=True)] == [active, left]
+
+    # Connections opened later attach the archive on their own
+    other = DbStorage(migrated_db)
+    assert _get_patient(other, left, include_archived=True).first_name == "Left"
+    other.close()
+
+
+def test_old_ai_requests_move_but_the_latest_stays(db: DbStorage):
+    patient_id = _add_patient(db, "ann")
+    oldest = _add_ai_request(db, patient_id, "2001-01-01 10:00:00")
+    old = _add_ai_request(db, patient_id, "2002-01-01 10:00:00")
+    latest = _add_ai_request(db, patient_id, "2003-01-01 10:00:00")
+
+    assert db.archive.archive_ai_requests(older_than_months=24) == 2
+
+    assert [r.id for r in db.ai_requests.get_by_patient(patient_id)] == [latest]
+    assert [r.id for r in db.ai_requests.get_by_patient(patient_id, include_archived=True)] == [latest, old, oldest]
+    assert db.ai_responses.get_by_request(old) == []
+    assert len(db.ai_responses.get_by_request(old, include_archived=True)) == 1
+    assert db.connection.execute("SELECT COUNT(*) FROM archive.ai_summaries").fetchone()[0] == 2
+    # The patient itself is still live
+    assert _get_patient(db, patient_id).first_name == "Ann"
+
+
+def test_include_archived_without_an_archive(migrated_db: Path):
+    db = DbStorage(migrated_db)
+    patient_id = _add_patient(db, "ann")
+
+    assert not _archive_file(db).exists()
+    assert _get_patient(db, patient_id, include_archived=True).first_name == "Ann"
+    db.close()
+
+
+def test_archive_picks_up_columns_added_by_later_migrations(db: DbStorage, migrated_db: Path):
+    patient_id = _add_patient(db, "left")
+    _add_check(db, patient_id, "2001-01-01")
+    db.archive.archive_inactive_patients(inactive_months=60)
+    db.connection.execute("ALTER TABLE main.medical_checks ADD COLUMN reviewed_by TEXT")
+    db.commit()
+
+    other = DbStorage(migrated_db)
+    assert other.connection.execute(
+        "SELECT reviewed_by FROM medical_checks_with_archive WHERE patient_id = ?", [patient_id]
+    ).fetchall() == [(None,)]
+    attach_archive(other.connection, _archive_file(other), create=True)
+    assert "reviewed_by" in {row[1] for row in other.connection.execute("PRAGMA archive.table_info(medical_checks)")}
+    other.close()
+
+
+def test_ids_of_archived_rows_are_never_reused(db: DbStorage):
+    active = _add_patient(db, "active")
+    _add_check(db, active, date.today().isoformat())
+    left = _add_patient(db, "left")
+    left_check = _add_check(db, left, "2001-01-01")
+    db.archive.archive_inactive_patients(inactive_months=60)
+
+    newcomer = _add_patient(db, "newcomer")
+    newcomer_check = _add_check(db, newcomer, date.today().isoformat())
+
+    assert newcomer > left and newcomer_check > left_check
+    ids = {p.patient_id for p in db.patients.get_all_patients(include_archived=True)}
+    assert ids == {active, left, newcomer}
+    # Reads that include the archive, such as serving attachments, see only the newcomer's own checks
+    assert [c.check_id for c in db.medical_checks.get_medical_checks(newcomer, include_archived=True)] == [
+        newcomer_check
+    ]
+    assert _get_patient(db, left, include_archived=True).first_name == "Left"
+
+
+def test_an_archived_row_is_never_overwritten(db: DbStorage):
+    patient_id = _add_patient(db, "left")
+    _add_check(db, patient_id, "2001-01-01")
+    # A row archived under the same id, as ids were reused before they were AUTOINCREMENT
+    db.connection.execute("INSERT INTO archive.patients SELECT * FROM main.patients WHERE patient_id = ?", [patient_id])
+    db.connection.execute("UPDATE archive.patients SET first_name = 'Earlier' WHERE patient_id = ?", [patient_id])
+    db.commit()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        db.archive.archive_inactive_patients(inactive_months=60)
+
+    assert _get_patient(db, patient_id).first_name == "Left"
+    (archived,) = db.connection.execute("SELECT first_name FROM archive.patients").fetchone()
+    assert archived == "Earlier"
+
+
+def test_archiving_again_after_a_crash_skips_rows_already_copied(db: DbStorage):
+    patient_id = _add_patient(db, "left")
+    _add_check(db, patient_id, "2001-01-01")
+    # The archive's commit landed, the live database's did not
+    for table in ("patients", "addresses", "medical_checks"):
+        db.connection.execute(f"INSERT INTO archive.{table} SELECT * FROM main.{table}")
+    db.commit()
+
+    assert db.archive.archive_inactive_patients(inactive_months=60) == 1
+    assert db.patients.get_patient(patient_id) is None
+    assert [p.first_name for p in db.patients.get_all_patients(include_archived=True)] == ["Left"]
+
+
+def test_ids_archived_before_autoincrement_are_skipped(db: DbStorage, migrated_db: Path):
+    patient_id = _add_patient(db, "left")
+    _add_check(db, patient_id, "2001-01-01")
+    db.archive.archive_inactive_patients(inactive_months=60)
+    # As if the rows had been archived before migration 0015 recorded the highest id
+    db.connection.execute("DELETE FROM main.sqlite_sequence WHERE name = 'patients'")
+    db.commit()
+
+    other = DbStorage(migrated_db)
+    assert other.patients.save(_patient("newcomer")).patient_id == patient_id + 1
+    other.close()
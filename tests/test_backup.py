@@ -0,0 +1,80 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.data_access.db_storage import DbStorage
+from src.services.backup import BackupStore, snapshot_database
+
+# Needs the SQLite files themselves
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture()
+def files(tmp_path: Path) -> Path:
+    base_dir = tmp_path / "app"
+    (base_dir / "attachments" / "1").mkdir(parents=True)
+    (base_dir / "voice_recordings" / "1").mkdir(parents=True)
+    (base_dir / "attachments" / "1" / "letter.pdf").write_bytes(b"%PDF-1.4 letter")
+    (base_dir / "attachments" / "1" / "copy.pdf").write_bytes(b"%PDF-1.4 letter")
+    (base_dir / "voice_recordings" / "1" / "a.webm").write_bytes(b"\x1aE\xdf\xa3")
+    return base_dir
+
+
+def test_snapshot_is_consistent_while_the_app_writes(migrated_db: Path, create_patient, tmp_path: Path):
+    create_patient()
+    writer = sqlite3.connect(migrated_db)
+    steps = []
+
+    def write_between_steps(status: int, remaining: int, total: int) -> None:
+        steps.append(remaining)
+        writer.execute("UPDATE patients SET notes = 'changed'")
+        writer.commit()
+
+    snapshot = snapshot_database(
+        migrated_db, tmp_path / "snap.sqlite", pages_per_step=1, step_sleep_seconds=0, progress=write_between_steps
+    )
+    writer.close()
+
+    assert len(steps) > 1 and steps[-1] == 0
+    db = DbStorage(snapshot, read_only=True)
+    assert db.connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    # As of the start of the copy
+    assert [p.notes for p in db.patients.get_all_patients()] == [None]
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        db.connection.execute("DELETE FROM patients")
+    db.close()
+
+
+def test_backups_copy_only_changed_files(migrated_db: Path, files: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "backups")
+
+    first = store.create(migrated_db, base_dir=files)
+    # Two identical attachments are stored once
+    assert (first.files, first.copied_files) == (3, 2)
+
+    (files / "attachments" / "1" / "new.pdf").write_bytes(b"%PDF-1.4 new")
+    second = store.create(migrated_db, base_dir=files)
+    assert (second.files, second.copied_files, second.copied_bytes) == (4, 1, len(b"%PDF-1.4 new"))
+    assert store.backups() == [first.path, second.path]
+    assert store.latest_snapshot() == second.snapshot
+
+    assert not (second.path / "archive.sqlite").exists()
+
+    restored = tmp_path / "restored"
+    assert store.restore_files(second.path, restored) == 4
+    assert (restored / "voice_recordings" / "1" / "a.webm").read_bytes() == b"\x1aE\xdf\xa3"
+
+
+def test_prune_drops_old_backups_and_their_files(migrated_db: Path, files: Path, tmp_path: Path):
+    store = BackupStore(tmp_path / "backups")
+    first = store.create(migrated_db, base_dir=files)
+    (files / "voice_recordings" / "1" / "a.webm").unlink()
+    second = store.create(migrated_db, base_dir=files)
+
+    assert store.prune(keep=1) == [first.path]
+
+    assert store.backups() == [second.path]
+    assert {p.name for p in store.objects_dir.glob("*/*")} == {
+        e.sha256 for e in store.read_manifest(second.path).values()
+    }
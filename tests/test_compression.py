@@ -0,0 +1,94 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from settings import CompressionSettings
+from src.middleware import CompressionMiddleware, CompressionStats
+
+BIG_TEXT = "Blood pressure stable, continue current dose.\n" * 100
+GZIP = {"accept-encoding": "gzip"}
+
+
+def _client(stats: CompressionStats) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, settings=CompressionSettings(minimum_size=500), stats=stats)
+
+    @app.get("/text")
+    async def text() -> Response:
+        return PlainTextResponse(BIG_TEXT, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small() -> Response:
+        return PlainTextResponse("ok")
+
+    @app.get("/recording")
+    async def recording() -> Response:
+        return Response(b"\x1aE\xdf\xa3" * 1000, media_type="video/webm")
+
+    @app.get("/stream")
+    async def stream() -> Response:
+        async def lines():
+            for _ in range(100):
+                yield "Blood pressure stable, continue current dose.\n"
+
+        return StreamingResponse(lines(), media_type="text/html")
+
+    return TestClient(app)
+
+
+def _raw(client: TestClient, url: str, headers: dict[str, str]) -> tuple[dict[str, str], bytes]:
+    with client.stream("GET", url, headers=headers) as resp:
+        return dict(resp.headers), b"".join(resp.iter_raw())
+
+
+def test_compresses_allowed_types_above_threshold():
+    stats = CompressionStats()
+    client = _client(stats)
+
+    headers, body = _raw(client, "/text", GZIP)
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"v1"'
+    assert int(headers["content-length"]) == len(body)
+    assert gzip.decompress(body).decode() == BIG_TEXT
+
+    headers, body = _raw(client, "/stream", GZIP)
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == BIG_TEXT
+
+    gzip_stats = stats.encodings["gzip"]
+    assert gzip_stats.responses == 2
+    assert gzip_stats.bytes_in == 2 * len(BIG_TEXT)
+    assert gzip_stats.ratio < 0.2
+    assert gzip_stats.cpu_seconds >= 0
+
+
+def test_skips_small_media_ranged_and_unaccepted_responses():
+    stats = CompressionStats()
+    client = _client(stats)
+
+    for url, headers in [
+        ("/small", GZIP),
+        ("/recording", GZIP),
+        ("/text", {"accept-encoding": "identity"}),
+        ("/text", {**GZIP, "range": "bytes=0-10"}),
+    ]:
+        resp_headers, body = _raw(client, url, headers)
+        assert "content-encoding" not in resp_headers, url
+    assert body == BIG_TEXT.encode()
+    assert stats.skipped == 4
+    assert stats.encodings == {}
+
+
+def test_app_pages_are_compressed_and_reported_in_metrics(client: TestClient, create_patient):
+    patient_id = create_patient()
+
+    page = client.get(f"/patients/{patient_id}", headers=GZIP)
+    assert page.headers["content-encoding"] == "gzip"
+    assert page.headers["vary"] == "Accept, HX-Request, X-Practice-Id, Accept-Encoding"
+
+    metrics = client.get("/admin/metrics").json()
+    assert metrics["compression"]["encodings"]["gzip"]["responses"] >= 1
+    assert 0 < metrics["compression"]["encodings"]["gzip"]["ratio"] < 1
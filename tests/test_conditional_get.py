@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+
+JSON = {"accept": "application/json"}
+
+
+def test_patient_version_is_bumped_by_writes_to_any_patient_table(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id, other_id = create_patient(), create_patient({"first_name": "jane"})
+    versions = [db.patients.get_version(patient_id)[0]]
+
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    versions.append(db.patients.get_version(patient_id)[0])
+    db.medical_checks.add_attachments(
+        check_id=check_id, attachments=[{"filename": "a.txt", "content_type": "text/plain", "file_path": "a.txt"}]
+    )
+    versions.append(db.patients.get_version(patient_id)[0])
+    db.medical_checks.update_status(check_id=check_id, status="Red")
+    versions.append(db.patients.get_version(patient_id)[0])
+    other_version = db.patients.get_version(other_id)
+
+    db.medical_checks.delete(check_id=check_id)
+    versions.append(db.patients.get_version(patient_id)[0])
+
+    assert versions == sorted(set(versions))
+    assert db.patients.get_version(other_id) == other_version
+    assert db.patients.get_version(9999) is None
+    db.close()
+
+
+@pytest.mark.parametrize(
+    ("path", "headers"),
+    [
+        ("/patients/{id}", {}),
+        ("/patients/{id}", JSON),
+        ("/patients/{id}/medical_checks", {}),
+        ("/patients/{id}/medical_checks/chartable_options", {}),
+        ("/patients/{id}/medical_checks/chartable_options", {"HX-Request": "true"}),
+        ("/patients/{id}/medical_checks/timeseries?check_template=blood&item_name=Glucose", {}),
+    ],
+)
+def test_read_endpoints_return_304_until_the_patient_changes(
+    client: TestClient, create_patient, migrated_db, path, headers
+):
+    patient_id = create_patient()
+    url = path.format(id=patient_id)
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = client.get(url, headers={**headers, "if-none-match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    client.put(f"/patients/{patient_id}/medical_checks/0", json={})  # no-op, check does not exist
+    assert client.get(url, headers={**headers, "if-none-match": etag}).status_code == 304
+
+    # Written through another connection, as another worker process would
+    db = DbStorage(migrated_db)
+    db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    db.close()
+    changed = client.get(url, headers={**headers, "if-none-match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_representations_have_distinct_etags(client: TestClient, create_patient):
+    patient_id = create_patient()
+
+    html_etag = client.get(f"/patients/{patient_id}").headers["etag"]
+    json_resp = client.get(
+        f"/patients/{patient_id}", headers={"accept": "application/json", "if-none-match": html_etag}
+    )
+
+    assert json_resp.status_code == 200
+    assert json_resp.json()["patient_id"] == patient_id
+    assert client.get("/patients/9999", headers={"if-none-match": "*"}).status_code == 404
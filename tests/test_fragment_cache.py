@@ -0,0 +1,114 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from migrate import apply_migrations
+from src.data_access.db_storage import DbStorage
+from src.fragment_cache import FragmentCache
+from src.models.ai_request import AiRequest
+from src.models.ai_response import AiResponse
+
+
+def _save_ai_response(db: DbStorage, patient_id: int, content: dict) -> AiResponse:
+    request = db.ai_requests.save(
+        AiRequest(
+            patient_id=patient_id,
+            model_name="m",
+            model_url="u",
+            system_prompt_text="p",
+            request_payload_json="{}",
+        )
+    )
+    assert request.id is not None
+    response_json = json.dumps({"choices": [{"message": {"content": json.dumps(content)}}]})
+    return db.ai_responses.save(AiResponse(request_id=request.id, response_json=response_json))
+
+
+def test_cache_evicts_least_recently_used_fragments_beyond_size_limit():
+    cache = FragmentCache(max_chars=10)
+    cache.get_or_render("a", lambda: "aaaa")
+    cache.get_or_render("b", lambda: "bbbb")
+    cache.get_or_render("a", lambda: "unused")
+    cache.get_or_render("c", lambda: "cccc")
+
+    assert cache.size == 8
+    assert cache.get_or_render("a", lambda: "new a") == "aaaa"
+    assert cache.get_or_render("b", lambda: "new b") == "new b"
+    assert cache.get_or_render("huge", lambda: "x" * 11) == "x" * 11
+    assert "huge" not in cache._entries
+
+
+def test_ai_summary_is_parsed_when_the_response_is_saved(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    content = {"Overview": {"html": "<p>All well</p>"}, "Plan": "Recheck in 3 months", "Charts": "blood.Glucose"}
+    response = _save_ai_response(db, patient_id, content)
+
+    (sections_json, charts_json) = db._conn.execute(
+        "SELECT sections_json, charts_json FROM ai_summaries WHERE response_id = ?", [response.id]
+    ).fetchone()
+    assert [s["title"] for s in json.loads(sections_json)] == ["Overview", "Plan"]
+    assert json.loads(charts_json) == ["blood.Glucose"]
+
+    # A response without a summary row is still shown, but reading it never writes
+    db._conn.execute("DELETE FROM ai_summaries")
+    summary = db.ai_responses.get_summary(response.id)
+    assert summary is not None
+    assert summary.sections[0].html == "<p>All well</p>"
+    assert summary.sections[1].text == "Recheck in 3 months"
+    assert db._conn.execute("SELECT COUNT(*) FROM ai_summaries").fetchone()[0] == 0
+    db.close()
+
+
+@pytest.mark.sqlite_only
+def test_migration_summarises_responses_saved_before_it(tmp_path: Path):
+    db_file = tmp_path / "old.sqlite"
+    apply_migrations(db_file, target_version="0011_patient_versions")
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "INSERT INTO ai_requests (id, patient_id, model_name, model_url, system_prompt_text, request_payload_json)"
+        " VALUES (1, 1, 'm', 'u', 'p', '{}')"
+    )
+    response_json = json.dumps({"choices": [{"message": {"content": json.dumps({"Plan": "Recheck"})}}]})
+    conn.execute("INSERT INTO ai_responses (id, request_id, response_json) VALUES (7, 1, ?)", [response_json])
+    conn.commit()
+    conn.close()
+
+    apply_migrations(db_file)
+
+    conn = sqlite3.connect(db_file)
+    (sections_json,) = conn.execute("SELECT sections_json FROM ai_summaries WHERE response_id = 7").fetchone()
+    conn.close()
+    assert json.loads(sections_json)[0] == {"title": "Plan", "html": None, "text": "Recheck"}
+
+
+def test_patient_page_reuses_fragments_until_the_patient_changes(client: TestClient, app, create_patient, migrated_db):
+    patient_id = create_patient()
+    db = DbStorage(migrated_db)
+    _save_ai_response(db, patient_id, {"Overview": "Stable"})
+    db.close()
+    cache: FragmentCache = app.state.fragment_cache
+    cache.clear()
+    urls = [
+        f"/patients/{patient_id}",
+        f"/patients/{patient_id}/medical_checks/tiles",
+        f"/patients/{patient_id}/ai_summary",
+    ]
+
+    first = [client.get(url).text for url in urls]
+    assert "Stable" in first[2]
+    misses = cache.misses
+    assert [client.get(url).text for url in urls] == first
+    assert cache.misses == misses
+
+    db = DbStorage(migrated_db)
+    db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    db.close()
+    assert "2024-01-01" in "".join(client.get(url).text for url in urls)
+    # Summary card and check tiles are re-rendered; the AI summary is not
+    assert cache.misses == misses + 2
@@ -0,0 +1,139 @@
+import asyncio
+import sqlite3
+from concurrent.futures import Future
+from datetime import date
+from functools import partial
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.data_access.group_commit import DirectWriter, GroupCommitWriter
+from src.main import create_app
+from src.models.address import Address
+from src.models.enums import Sex, Title
+from src.models.patient import Patient
+
+# Needs the SQLite files themselves
+pytestmark = pytest.mark.sqlite_only
+
+
+def _patient(first_name: str) -> Patient:
+    return Patient(
+        title=Title.MS,
+        first_name=first_name,
+        last_name="doe",
+        sex=Sex.FEMALE,
+        dob=date(1980, 5, 1),
+        email=f"{first_name}@example.com",
+        phone="000",
+        address=Address(line_1="1 Test Street", line_2=None, town="Testville", postcode="SW1A1AA", country="UK"),
+    )
+
+
+@pytest.fixture()
+def writer(migrated_db: Path):
+    # A wide window, so every write submitted below lands in the same batch
+    group_writer = GroupCommitWriter(migrated_db, window_seconds=0.2, max_batch=8)
+    group_writer.start()
+    yield group_writer
+    group_writer.close()
+
+
+def test_concurrent_writes_share_one_commit(writer: GroupCommitWriter, migrated_db: Path):
+    def save(db: DbStorage, i: int) -> int | None:
+        return db.patients.save(_patient(f"p{i}")).patient_id
+
+    futures = [writer.submit(partial(save, i=i)) for i in range(8)]
+
+    patient_ids = [f.result(timeout=5) for f in futures]
+
+    assert len(set(patient_ids)) == 8
+    assert (writer.stats.batches, writer.stats.writes, writer.stats.batch_sizes) == (1, 8, {8: 1})
+    assert writer.stats.max_commit_seconds >= 0
+    db = DbStorage(migrated_db)
+    assert len(db.patients.get_all_patients()) == 8
+    db.close()
+
+
+def test_failed_write_is_rolled_back_alone(writer: GroupCommitWriter, migrated_db: Path):
+    def save_then_fail(db: DbStorage) -> None:
+        db.patients.save(_patient("rolled_back"))
+        raise ValueError("invalid")
+
+    first: Future[Patient] = writer.submit(lambda db: db.patients.save(_patient("first")))
+    failed = writer.submit(save_then_fail)
+    writer.submit(lambda db: db.patients.save(_patient("last")))
+
+    with pytest.raises(ValueError, match="invalid"):
+        failed.result(timeout=5)
+    assert first.result().first_name == "First"
+    assert writer.stats.failed_writes == 1
+    db = DbStorage(migrated_db)
+    assert sorted(p.first_name for p in db.patients.get_all_patients()) == ["First", "Last"]
+    db.close()
+
+
+def test_direct_write_is_rolled_back_whole(migrated_db: Path):
+    db = DbStorage(migrated_db)
+    db.patients.save(_patient("kept"))
+
+    def save_then_fail(db: DbStorage) -> None:
+        patient_id = db.patients.save(_patient("rolled_back")).patient_id
+        assert patient_id is not None
+        # No such check, so the foreign key fails
+        db.voice_recordings.insert_recording(check_id=999, file_path="a.webm")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        asyncio.run(DirectWriter(db).run(save_then_fail))
+
+    assert not db.connection.in_transaction
+    other = DbStorage(migrated_db)
+    assert [p.first_name for p in other.patients.get_all_patients()] == ["Kept"]
+    other.close()
+    db.close()
+
+
+def test_app_routes_write_through_the_group_writer(migrated_db: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("GROUP_COMMIT_ENABLED", "true")
+    monkeypatch.setenv("GROUP_COMMIT_WINDOW_MS", "0")
+
+    with TestClient(create_app()) as client:
+        resp = client.post(
+            "/patients",
+            data={
+                "title": "Ms",
+                "first_name": "ann",
+                "last_name": "lee",
+                "sex": "female",
+                "dob": "1980-01-01",
+                "email": "ann@example.com",
+                "phone": "1",
+                "line_1": "1 Road",
+                "town": "Town",
+                "postcode": "SW1A1AA",
+                "country": "United Kingdom",
+            },
+            follow_redirects=False,
+        )
+        patient_id = int(resp.headers["location"].rsplit("/", 1)[1])
+        resp = client.post(
+            f"/patients/{patient_id}/medical_checks",
+            data={"type": "blood", "date": "2024-01-01", "status": "Green", "param_count": "0"},
+            follow_redirects=False,
+        )
+        assert resp.status_code == 303
+        [check] = client.get(f"/patients/{patient_id}/medical_checks").json()["records"]
+
+        # The partial is rendered from the request's connection, after the write committed on the writer's
+        resp = client.post(
+            f"/patients/{patient_id}/medical_checks/{check['check_id']}/status",
+            data={"status": "Red"},
+            headers={"HX-Request": "true"},
+        )
+        assert "Red" in resp.text
+
+        stats = client.get("/admin/metrics").json()["group_commit"]
+        assert stats["writes"] == stats["batches"] == 3
+        assert stats["failed_writes"] == 0
@@ -0,0 +1,64 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+
+HTMX = {"HX-Request": "true"}
+
+
+def _save_check(migrated_db, patient_id: int, status: str = "Amber") -> int:
+    db = DbStorage(migrated_db)
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status=status, medical_check_items=[]
+    )
+    db.close()
+    return check_id
+
+
+def test_status_update_from_htmx_returns_status_block(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    check_id = _save_check(migrated_db, patient_id)
+    url = f"/patients/{patient_id}/medical_checks/{check_id}/status"
+
+    resp = client.post(url, data={"status": "Red"}, headers=HTMX, follow_redirects=False)
+
+    assert resp.status_code == 200
+    assert resp.text.lstrip().startswith('<div id="checkStatus">')
+    assert '<span id="checkStatusBadge" class="badge bg-danger">Red</span>' in resp.text
+    assert "<html" not in resp.text
+    assert json.loads(resp.headers["HX-Trigger"]) == {"medicalCheckUpdated": {"checkId": check_id, "status": "Red"}}
+
+    missing = client.post(f"/patients/{patient_id}/medical_checks/9999/status", data={"status": "Red"}, headers=HTMX)
+    assert missing.status_code == 404
+    # Plain form posts still redirect to the patient page
+    assert client.post(url, data={"status": "Green"}, follow_redirects=False).status_code == 303
+
+
+def test_check_created_from_details_page_returns_its_tile(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    db = DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="blood", items=[])
+    db.close()
+
+    form = client.get(
+        f"/patients/{patient_id}/medical_checks/new",
+        params={"check_template_id": template_id},
+        headers={**HTMX, "HX-Target": "newCheckPanel"},
+    ).text
+    assert 'hx-target="#checksTiles"' in form
+    assert "<html" not in form
+
+    resp = client.post(
+        f"/patients/{patient_id}/medical_checks",
+        data={"type": "blood", "date": "2024-02-03", "status": "Green", "param_count": "0"},
+        headers={**HTMX, "HX-Target": "checksTiles"},
+        follow_redirects=False,
+    )
+
+    assert resp.status_code == 201
+    (check,) = client.get(f"/patients/{patient_id}/medical_checks").json()["records"]
+    assert f'id="check-tile-{check["check_id"]}"' in resp.text
+    assert "2024-02-03" in resp.text
+    trigger = json.loads(resp.headers["HX-Trigger"])
+    assert trigger == {"medicalCheckCreated": {"checkId": check["check_id"], "status": "Green"}}
@@ -0,0 +1,89 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.data_access.identity_map import unit_of_work
+from src.data_access.medical_checks import MedicalChecksStorage
+from src.data_access.patients import PatientsStorage
+
+
+def _trace(db: DbStorage) -> list[str]:
+    statements: list[str] = []
+    db._conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_patient_is_loaded_once_per_unit_of_work(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+
+    with unit_of_work():
+        statements = _trace(db)
+        first = db.patients.get_patient(patient_id)
+        assert db.patients.get_patient(patient_id) is first
+        assert db.patients.exists(patient_id)
+        assert len(statements) == 1
+
+        first.notes = "updated"
+        db.patients.save(first)
+        assert db.patients.get_patient(patient_id) is not first
+
+    # Outside a unit of work every call goes to the database
+    assert db.patients.get_patient(patient_id) is not db.patients.get_patient(patient_id)
+    db.close()
+
+
+def test_exists_probes_do_not_hydrate_models(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+
+    statements = _trace(db)
+    assert db.patients.exists(patient_id)
+    assert not db.patients.exists(9999)
+    assert db.medical_checks.exists(patient_id=patient_id, check_id=check_id)
+    assert not db.medical_checks.exists(patient_id=9999, check_id=check_id)
+    assert not any("addresses" in s or "medical_check_items" in s for s in statements)
+    db.close()
+
+
+def test_writes_evict_cached_medical_checks(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+
+    with unit_of_work():
+        assert db.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id).notes is None
+        db.medical_checks.update_notes(check_id=check_id, notes="follow up")
+        assert db.medical_checks.get_medical_check(patient_id=patient_id, check_id=check_id).notes == "follow up"
+        assert db.medical_checks.get_medical_check(patient_id=9999, check_id=check_id) is None
+    db.close()
+
+
+def test_update_endpoint_loads_the_check_once(client: TestClient, create_patient, migrated_db, monkeypatch):
+    patient_id = create_patient()
+    db = DbStorage(migrated_db)
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    db.close()
+
+    loads: list[int] = []
+    original = MedicalChecksStorage._get_voice_recordings
+
+    def counting(self, check_id: int):
+        loads.append(check_id)
+        return original(self, check_id)
+
+    monkeypatch.setattr(MedicalChecksStorage, "_get_voice_recordings", counting)
+    monkeypatch.setattr(PatientsStorage, "get_patient", lambda *args, **kwargs: pytest.fail("patient hydrated"))
+
+    resp = client.put(f"/patients/{patient_id}/medical_checks/{check_id}", json={"status": "Red"})
+
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "Red"
+    assert loads == [check_id]
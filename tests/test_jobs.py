@@ -0,0 +1,138 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from settings import JobSettings
+from src.data_access.db_storage import DbStorage
+from src.models.enums import JobKind, JobStatus
+from src.services.job_worker import JobWorker, transcribe_recordings
+
+
+@pytest.fixture()
+def db(migrated_db: Path):
+    storage = DbStorage(migrated_db)
+    yield storage
+    storage.close()
+
+
+def test_lease_complete_and_dedupe(db: DbStorage):
+    first = db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": 1}, dedupe_key="ai_summary:1")
+    assert db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": 1}, dedupe_key="ai_summary:1") == first
+    later = db.jobs.enqueue(JobKind.AI_BATCH, {"batch_job_id": 1}, delay_seconds=60)
+
+    job = db.jobs.lease("w1", lease_seconds=30)
+    assert job is not None
+    assert (job.job_id, job.status, job.attempts, job.payload) == (first, JobStatus.RUNNING, 1, {"patient_id": 1})
+    # Not due yet
+    assert db.jobs.lease("w1", lease_seconds=30) is None
+    # Once the queued job has started, the same work can be queued again
+    assert db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": 1}, dedupe_key="ai_summary:1") not in (first, later)
+
+    assert db.jobs.heartbeat(first, "w1", lease_seconds=30)
+    assert not db.jobs.heartbeat(first, "w2", lease_seconds=30)
+    db.jobs.complete(first, "w1")
+    assert (done := db.jobs.get_job(first)) is not None and done.status == JobStatus.DONE
+    assert db.jobs.count_by_status() == {"done": 1, "queued": 2}
+
+
+def test_failures_back_off_then_dead_letter(db: DbStorage):
+    job_id = db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": 1}, max_attempts=2)
+
+    db.jobs.lease("w1", lease_seconds=30)
+    assert db.jobs.fail(job_id, "w1", "boom", retry_in_seconds=-1) == JobStatus.QUEUED
+    assert (failed := db.jobs.get_job(job_id)) is not None and failed.last_error == "boom"
+
+    db.jobs.lease("w1", lease_seconds=30)
+    assert db.jobs.fail(job_id, "w2", "not mine", retry_in_seconds=0) is None
+    assert db.jobs.fail(job_id, "w1", "boom again", retry_in_seconds=0) == JobStatus.DEAD
+    assert [j.job_id for j in db.jobs.get_jobs(JobStatus.DEAD)] == [job_id]
+
+    revived = db.jobs.retry(job_id)
+    assert revived is not None
+    assert (revived.status, revived.attempts) == (JobStatus.QUEUED, 0)
+    assert db.jobs.retry(job_id) is None
+
+
+def test_expired_leases_are_requeued(db: DbStorage):
+    job_id = db.jobs.enqueue(JobKind.AI_SUMMARY, {"patient_id": 1})
+    db.jobs.lease("crashed", lease_seconds=-1)
+
+    assert db.jobs.requeue_expired() == 1
+    job = db.jobs.get_job(job_id)
+    assert job is not None
+    assert (job.status, job.lease_owner, job.last_error) == (JobStatus.QUEUED, None, "Lease expired")
+    assert not db.jobs.heartbeat(job_id, "crashed", lease_seconds=30)
+    assert (job := db.jobs.lease("w1", lease_seconds=30)) is not None and job.attempts == 2
+
+
+def test_worker_runs_jobs_concurrently_and_retries(db: DbStorage):
+    in_flight, peak, calls = 0, 0, []
+
+    async def handler(_db: DbStorage, payload: dict) -> None:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        calls.append(payload["n"])
+        if payload["n"] == 0 and calls.count(0) == 1:
+            raise RuntimeError("transient")
+        if payload["n"] == 1:
+            raise ValueError("bad payload")
+
+    for n in range(4):
+        db.jobs.enqueue(JobKind.AI_SUMMARY, {"n": n})
+    settings = JobSettings(concurrency=2, poll_interval=0.01, backoff_base_seconds=0)
+    worker = JobWorker(db, settings, {JobKind.AI_SUMMARY: handler})
+
+    assert asyncio.run(worker.run(until_idle=True)) == 5
+    assert peak == 2
+    assert sorted(calls) == [0, 0, 1, 2, 3]
+    assert db.jobs.count_by_status() == {"done": 3, "dead": 1}
+    assert db.jobs.get_jobs(JobStatus.DEAD)[0].last_error == "ValueError: bad payload"
+    assert worker.backoff_seconds(1) == 0
+    assert JobWorker(db, JobSettings()).backoff_seconds(10) == JobSettings().backoff_max_seconds
+
+
+def test_transcription_queues_the_summary(db: DbStorage, create_patient, tmp_path: Path, monkeypatch):
+    patient_id = create_patient()
+    check_id = db.medical_checks.save(
+        patient_id=patient_id, check_template="blood", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    recording_id = db.voice_recordings.insert_recording(check_id=check_id, file_path=f"{patient_id}/a.webm")
+    db.voice_recordings.conn.commit()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "voice_recordings" / str(patient_id)).mkdir(parents=True)
+    (tmp_path / "voice_recordings" / str(patient_id) / "a.webm").write_bytes(b"\x1aE\xdf\xa3")
+
+    asyncio.run(transcribe_recordings(db, {"check_id": check_id, "patient_id": patient_id}))
+
+    recording = db.voice_recordings.get_recordings_by_check_id(check_id)[0]
+    assert recording.voice_recording_id == recording_id and recording.full_text
+    assert [(j.kind, j.payload) for j in db.jobs.get_jobs()] == [(JobKind.AI_SUMMARY, {"patient_id": patient_id})]
+
+
+def test_routes_enqueue_work_for_the_worker(client: TestClient, create_patient, db: DbStorage):
+    patient_id = create_patient()
+    for day in ("2024-01-01", "2024-01-02"):
+        resp = client.post(
+            f"/patients/{patient_id}/medical_checks",
+            data={"type": "blood", "date": day, "status": "Green", "param_count": "0"},
+            follow_redirects=False,
+        )
+        assert resp.status_code == 303
+    assert db.ai_requests.get_by_patient(patient_id) == []
+
+    [job] = client.get("/admin/jobs").json()
+    assert (job["kind"], job["payload"], job["status"]) == ("ai_summary", {"patient_id": patient_id}, "queued")
+    assert client.get("/admin/metrics").json()["jobs"] == {"queued": 1}
+
+    asyncio.run(JobWorker(db, JobSettings()).run(until_idle=True))
+
+    assert len(db.ai_requests.get_by_patient(patient_id)) == 1
+    assert client.get(f"/admin/jobs/{job['job_id']}").json()["status"] == "done"
+    assert client.get("/admin/jobs", params={"status": "dead"}).json() == []
+    assert client.post(f"/admin/jobs/{job['job_id']}/retry").status_code == 409
+    assert client.get("/admin/jobs/999").status_code == 404
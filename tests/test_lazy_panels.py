@@ -0,0 +1,63 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.routes.medical_checks import TILES_PAGE_SIZE
+
+_TILE_LINK = re.compile(r"/medical_checks/(\d+)'")
+_NEXT_PAGE = re.compile(r'hx-get="([^"]+/tiles\?[^"]+)"')
+
+
+def _save_checks(migrated_db, patient_id: int, count: int) -> list[int]:
+    db = DbStorage(migrated_db)
+    check_ids = [
+        db.medical_checks.save(
+            patient_id=patient_id,
+            check_template="blood",
+            check_date=f"2024-01-{day % 28 + 1:02d}",
+            status="Green",
+            medical_check_items=[],
+        )
+        for day in range(count)
+    ]
+    db.close()
+    return check_ids
+
+
+def test_details_shell_defers_checks_and_ai_panels(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    _save_checks(migrated_db, patient_id, 1)
+
+    html = client.get(f"/patients/{patient_id}").text
+
+    assert f'hx-get="/patients/{patient_id}/medical_checks/tiles"' in html
+    assert f'hx-get="/patients/{patient_id}/ai_summary?current_request_id="' in html
+    assert "2024-01-01" not in html
+
+
+def test_tiles_page_through_all_checks_newest_first(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    check_ids = _save_checks(migrated_db, patient_id, 2 * TILES_PAGE_SIZE + 5)
+    db = DbStorage(migrated_db)
+    expected = [c.check_id for c in db.medical_checks.get_medical_checks(patient_id)]
+    db.close()
+
+    seen, pages = [], 0
+    url = f"/patients/{patient_id}/medical_checks/tiles"
+    while url:
+        html = client.get(url.replace("&amp;", "&")).text
+        seen += [int(i) for i in _TILE_LINK.findall(html)]
+        pages += 1
+        url = m.group(1) if (m := _NEXT_PAGE.search(html)) else ""
+
+    assert pages == 3
+    assert seen == expected
+    assert sorted(seen) == check_ids
+
+
+def test_tiles_for_patient_without_checks(client: TestClient, create_patient):
+    patient_id = create_patient()
+
+    assert "No records yet." in client.get(f"/patients/{patient_id}/medical_checks/tiles").text
+    assert client.get("/patients/9999/medical_checks/tiles").status_code == 404
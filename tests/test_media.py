@@ -0,0 +1,161 @@
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.data_access.blob_store import LocalBlobStore
+from src.data_access.db_storage import DbStorage
+from src.media import byte_range, served_as
+
+CONTENT = b"0123456789" * 100
+
+
+@pytest.fixture()
+def in_tmp_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # Uploads land under the working directory by default
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _upload(client: TestClient, patient_id: int, field: str, name: str, content_type: str) -> None:
+    form = {"type": "blood", "date": "2024-01-01", "status": "Green", "param_count": "0"}
+    files = [(field, (name, io.BytesIO(CONTENT), content_type))]
+    resp = client.post(f"/patients/{patient_id}/medical_checks", data=form, files=files, follow_redirects=False)
+    assert resp.status_code == 303
+
+
+def test_attachment_ranges_and_validators(client: TestClient, create_patient, in_tmp_dir: Path):
+    patient_id = create_patient()
+    _upload(client, patient_id, "attachments", "scan.bin", "application/octet-stream")
+    url = f"/patients/{patient_id}/medical_checks/attachments/{patient_id}/2024-01-01/scan.bin"
+
+    full = client.get(url)
+    etag = f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+    assert (full.status_code, full.content, full.headers["etag"]) == (200, CONTENT, etag)
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["cache-control"] == "private, no-cache"
+    assert full.headers["x-content-type-options"] == "nosniff"
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    part = client.get(url, headers={"Range": "bytes=10-19"})
+    assert (part.status_code, part.content, part.headers["content-range"]) == (206, CONTENT[10:20], "bytes 10-19/1000")
+    assert client.get(url, headers={"Range": "bytes=5000-"}).status_code == 416
+    # A stale If-Range gets the whole, current file
+    assert client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"old"'}).status_code == 200
+
+
+def test_attachment_paths_are_checked_against_the_patient(client: TestClient, create_patient, in_tmp_dir: Path):
+    owner, other = create_patient(), create_patient({"first_name": "jane"})
+    _upload(client, owner, "attachments", "letter.txt", "text/plain")
+    (in_tmp_dir / "secret.txt").write_text("not an attachment")
+
+    for path in (
+        f"/patients/{other}/medical_checks/attachments/{owner}/2024-01-01/letter.txt",
+        f"/patients/{other}/medical_checks/attachments/{other}/2024-01-01/letter.txt",
+        f"/patients/{owner}/medical_checks/attachments/{owner}/..%2F..%2F..%2F/secret.txt",
+        f"/patients/{owner}/medical_checks/attachments/{owner}/2024-01-01/..%5C..%5Csecret.txt",
+    ):
+        assert client.get(path).status_code == 404, path
+    assert client.get(f"/patients/{owner}/medical_checks/attachments/{owner}/2024-01-01/letter.txt").status_code == 200
+
+
+def test_only_safe_types_are_shown_inline(client: TestClient, create_patient, in_tmp_dir: Path):
+    patient_id = create_patient()
+    _upload(client, patient_id, "attachments", "letter.html", "text/html")
+    _upload(client, patient_id, "attachments", "letter.txt", "text/plain")
+    _upload(client, patient_id, "attachments", "letter.pdf", "application/pdf")
+    url = f"/patients/{patient_id}/medical_checks/attachments/{patient_id}/2024-01-01/"
+
+    html = client.get(url + "letter.html")
+    assert html.headers["content-type"] == "application/octet-stream"
+    assert html.headers["content-disposition"] == "attachment; filename*=utf-8''letter.html"
+    assert html.headers["content-security-policy"] == "sandbox"
+    text = client.get(url + "letter.txt")
+    assert text.headers["content-type"].startswith("text/plain")
+    assert text.headers["content-disposition"] == "inline; filename*=utf-8''letter.txt"
+    assert "content-security-policy" not in text.headers
+    # Browsers' PDF viewers render nothing under a sandbox policy
+    pdf = client.get(url + "letter.pdf")
+    assert pdf.headers["content-type"] == "application/pdf"
+    assert pdf.headers["content-disposition"] == "inline; filename*=utf-8''letter.pdf"
+    assert pdf.headers["x-content-type-options"] == "nosniff"
+    assert "content-security-policy" not in pdf.headers
+
+
+@pytest.mark.parametrize(
+    ("content_type", "filename", "expected"),
+    [
+        ("application/pdf", "a.pdf", ("application/pdf", "inline")),
+        ("image/png", "a.png", ("image/png", "inline")),
+        ("audio/webm", "a.webm", ("audio/webm", "inline")),
+        ("text/plain; charset=utf-8", "a.txt", ("text/plain; charset=utf-8", "inline")),
+        (None, "a.jpg", ("image/jpeg", "inline")),
+        ("image/svg+xml", "a.svg", ("application/octet-stream", "attachment")),
+        ("text/html", "a.html", ("application/octet-stream", "attachment")),
+        ("application/xhtml+xml", "a.pdf", ("application/octet-stream", "attachment")),
+        (None, "a.js", ("application/octet-stream", "attachment")),
+    ],
+)
+def test_served_as(content_type: str | None, filename: str, expected: tuple[str, str]):
+    assert served_as(content_type, filename) == expected
+
+
+def test_voice_recording_playback(client: TestClient, create_patient, migrated_db, in_tmp_dir: Path):
+    patient_id = create_patient()
+    _upload(client, patient_id, "voice_recordings", "blob", "audio/webm")
+    db = DbStorage(migrated_db)
+    [check] = db.medical_checks.get_medical_checks(patient_id)
+    [recording] = check.voice_recordings
+    db.close()
+    url = f"/patients/{patient_id}/medical_checks/{check.check_id}/recordings/{recording.voice_recording_id}"
+
+    resp = client.get(url, headers={"Range": "bytes=-100"})
+    assert (resp.status_code, resp.content) == (206, CONTENT[-100:])
+    assert resp.headers["content-type"] == "audio/webm"
+    assert client.get(f"/patients/{patient_id}/medical_checks/{check.check_id}/recordings/999").status_code == 404
+    assert url in client.get(f"/patients/{patient_id}/medical_checks/{check.check_id}").text
+
+
+class _StreamedOnly(LocalBlobStore):
+    """A store without files the app can send itself, like a bucket that hands out no URLs."""
+
+    def local_path(self, key: str) -> Path | None:
+        return None
+
+
+def test_streamed_ranges(client: TestClient, create_patient, in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("src.tenancy.LocalBlobStore", _StreamedOnly)
+    patient_id = create_patient()
+    _upload(client, patient_id, "attachments", "scan.bin", "application/octet-stream")
+    url = f"/patients/{patient_id}/medical_checks/attachments/{patient_id}/2024-01-01/scan.bin"
+
+    part = client.get(url, headers={"Range": "bytes=990-"})
+    assert (part.status_code, part.content, part.headers["content-length"]) == (206, CONTENT[990:], "10")
+    assert "last-modified" not in part.headers
+    assert client.get(url).content == CONTENT
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("bytes=0-0", (0, 0)),
+        ("bytes=990-2000", (990, 999)),
+        ("bytes=-2000", (0, 999)),
+        ("bytes=0-1,5-6", None),
+        ("bytes=5-1", None),
+        ("items=0-1", None),
+    ],
+)
+def test_byte_range(header: str | None, expected: tuple[int, int] | None):
+    assert byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_unsatisfiable_byte_range(header: str):
+    with pytest.raises(HTTPException) as exc:
+        byte_range(header, 1000)
+    assert exc.value.headers == {"Content-Range": "bytes */1000"}
@@ -1,7 +1,6 @@
 import io
 import json
 from datetime import date
-from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -63,9 +62,8 @@ async def test_attachment_parsed_content_stored_and_used(client: TestClient):
     assert attachment["parsed_content"] == "PRE-PARSED CONTENT"
 
     # 4. Verify AI request uses the stored parsed content
-    # Get the real test database path from Settings
-    db_path = Path(Settings().db_file)
-    db = DbStorage(db_path)
+    # Get the real test database from Settings
+    db = DbStorage(Settings().database)
     try:
         settings = OpenAISettings(
             api_key="test",
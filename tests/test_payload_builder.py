@@ -0,0 +1,109 @@
+import json
+from datetime import date
+
+import pytest
+
+from settings import OpenAISettings
+from src.data_access.db_storage import DbStorage
+from src.models.enums import MedicalCheckStatus
+from src.models.medical_check import MedicalCheck, MedicalCheckAttachment
+from src.models.medical_check_item import MedicalCheckItem
+from src.services.ai_service import AiService, payload_hash
+from src.services.payload_builder import PayloadBuilder, estimate_tokens, summarise_attachment_text
+
+
+def _check(check_id: int, check_date: str, status: str, attachments=None) -> tuple[MedicalCheck, dict]:
+    mc = MedicalCheck(
+        check_id=check_id,
+        check_date=date.fromisoformat(check_date),
+        template_name="blood",
+        status=MedicalCheckStatus(status),
+        notes="n" * 200,
+        medical_check_items=[MedicalCheckItem(name="Glucose", units="mmol/L", value="5.5")],
+        attachments=attachments or [],
+    )
+    data = mc.model_dump(mode="json", exclude={"attachments": {"__all__": {"parsed_content", "summary"}}})
+    return mc, data
+
+
+def test_summarise_attachment_text_keeps_numeric_lines_within_limit():
+    assert summarise_attachment_text("short report") is None
+
+    prose = "\n".join(f"Narrative paragraph number {'x' * 80}" for _ in range(50))
+    text = prose + "\nHaemoglobin 98 g/L (L)\nHaemoglobin 98 g/L (L)\n" + "Closing remarks " * 100
+    summary = summarise_attachment_text(text, max_chars=200)
+
+    assert summary is not None
+    assert len(summary) <= 200
+    assert summary.count("Haemoglobin 98 g/L (L)") == 1
+
+
+def test_builder_prioritises_abnormal_checks_when_over_budget():
+    green_recent = _check(1, "2025-03-01", "Green")
+    red_old = _check(2, "2020-01-01", "Red")
+    one_check = estimate_tokens(json.dumps(red_old[1], separators=(",", ":")))
+
+    builder = PayloadBuilder(token_budget=one_check + 20, attachment_token_limit=100)
+    content, counts = builder.build(system_prompt="prompt", patient_info={}, medical_history=[green_recent, red_old])
+
+    assert [c["check_id"] for c in json.loads(content)["medical_history"]] == [2]
+    assert counts["omitted_checks"] == 1
+    assert counts["total"] <= counts["budget"]
+
+
+def test_builder_falls_back_to_summary_then_truncation():
+    long_text = "Result line 1\n" * 1000
+    with_summary = MedicalCheckAttachment(
+        filename="a.txt", file_path="1/a.txt", parsed_content=long_text, summary="Result line 1"
+    )
+    without_summary = MedicalCheckAttachment(filename="b.txt", file_path="1/b.txt", parsed_content=long_text)
+    entry = _check(1, "2025-01-01", "Amber", attachments=[with_summary, without_summary])
+
+    builder = PayloadBuilder(token_budget=10_000, attachment_token_limit=200)
+    content, counts = builder.build(system_prompt="", patient_info={}, medical_history=[entry])
+
+    first, second = json.loads(content)["medical_history"][0]["attachments"]
+    assert first["summary"] == "Result line 1"
+    assert "content" not in first
+    assert second["content_truncated"] is True
+    assert len(second["content"]) == 200 * 4
+    assert counts["attachments"] == estimate_tokens("Result line 1") + 200
+
+
+@pytest.mark.asyncio
+async def test_token_counts_are_stored_with_ai_request(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    settings = OpenAISettings(
+        api_key="",
+        system_prompt="Test prompt",
+        model="test-model",
+        url="https://example.com",
+        timeout=30.0,
+        response_format={"type": "json_object"},
+    )
+    patient_id = create_patient()
+    db.medical_checks.save(
+        patient_id=patient_id,
+        check_template="blood",
+        check_date="2024-01-01",
+        status="Red",
+        medical_check_items=[],
+        attachments=[
+            {"filename": "r.txt", "content_type": "text/plain", "file_path": "x/r.txt", "parsed_content": "Hb 98"}
+        ],
+    )
+
+    ai_req, _ = await AiService(db, settings).prepare_and_send_request(patient_id)
+
+    saved = db.ai_requests.get_by_patient(patient_id)[0]
+    counts = json.loads(saved.token_counts_json)
+    assert saved.id == ai_req.id
+    assert counts["budget"] == settings.token_budget
+    assert counts["attachments"] == estimate_tokens("Hb 98")
+    assert counts["omitted_checks"] == 0
+    assert set(counts) >= {"system_prompt", "patient_info", "medical_history", "attachments", "total"}
+
+    # Payloads are stored and sent compact, and hashed from the stored serialisation
+    assert ", " not in saved.request_payload_json.replace(settings.system_prompt, "")
+    assert saved.payload_hash == payload_hash(json.loads(saved.request_payload_json))
+    db.close()
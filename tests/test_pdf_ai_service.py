@@ -22,15 +22,7 @@ async def test_ai_service_includes_pdf_content(migrated_db, create_patient, tmp_
         response_format={"type": "json_object"},
     )
 
-    # Mock the attachments directory for AiService
-    with patch("src.services.ai_service.Path"):
-        # We need to be careful with patching Path because it's used inside AiService
-        # and also in our test setup.
-        pass
-
-    # Alternative: use a real temporary directory and point AiService to it if possible.
-    # AiService uses Path("attachments") / relative_path.
-    # We can't easily change "attachments" root without modifying AiService.
+    # AiService reads attachments from db.blobs, by default under the working directory.
     # Let's use the same approach as test_ai_service_attachments.py but for PDF.
 
     with patch("src.services.ai_service.AsyncOpenAI") as mock_openai_class:
@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.models.enums import Projection
+from src.models.medical_check_item import MedicalCheckItem
+
+
+def _save_check(db: DbStorage, patient_id: int) -> int:
+    check_id = db.medical_checks.save(
+        patient_id=patient_id,
+        check_template="blood",
+        check_date="2024-01-01",
+        status="Amber",
+        medical_check_items=[MedicalCheckItem(name="Glucose", units="mmol/L", value="5.5")],
+        attachments=[
+            {"filename": "r.txt", "content_type": "text/plain", "file_path": "x/r.txt", "parsed_content": "x" * 10_000}
+        ],
+    )
+    recording_id = db.voice_recordings.insert_recording(check_id=check_id, file_path="r.webm")
+    db.voice_recordings.update_transcription(voice_recording_id=recording_id, full_text="y" * 10_000)
+    return check_id
+
+
+def test_summary_projection_skips_large_text_columns(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    _save_check(db, patient_id)
+
+    statements: list[str] = []
+    db._conn.set_trace_callback(statements.append)
+    (check,) = db.medical_checks.get_medical_checks(patient_id, projection=Projection.SUMMARY)
+
+    assert check.attachments[0].filename == "r.txt"
+    assert check.attachments[0].parsed_content is None
+    assert check.voice_recordings[0].full_text is None
+    assert check.medical_check_items[0].name == "Glucose"
+    assert not any("parsed_content" in s or "full_text" in s for s in statements)
+
+    (full,) = db.medical_checks.get_medical_checks(patient_id)
+    assert full.attachments[0].parsed_content == "x" * 10_000
+    assert full.voice_recordings[0].full_text == "y" * 10_000
+
+    (sparse,) = db.medical_checks.get_medical_checks(patient_id, fields={"status"})
+    assert sparse.attachments == [] and sparse.voice_recordings == [] and sparse.medical_check_items == []
+    db.close()
+
+
+def test_list_endpoint_supports_projection_and_sparse_fieldsets(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    db = DbStorage(migrated_db)
+    check_id = _save_check(db, patient_id)
+    db.close()
+    url = f"/patients/{patient_id}/medical_checks"
+
+    full = client.get(url).json()["records"][0]
+    assert full["attachments"][0]["parsed_content"] == "x" * 10_000
+
+    summary = client.get(url, params={"projection": "summary"}).json()["records"][0]
+    assert summary["attachments"][0] == {
+        "attachment_id": full["attachments"][0]["attachment_id"],
+        "filename": "r.txt",
+        "content_type": "text/plain",
+        "file_path": "x/r.txt",
+    }
+    assert "full_text" not in summary["voice_recordings"][0]
+
+    sparse = client.get(url, params={"fields": "check_id, status"}).json()
+    assert sparse == {"records": [{"check_id": check_id, "status": "Amber"}]}
+
+    resp = client.get(url, params={"fields": "status,patient_id"})
+    assert resp.status_code == 422
+    assert client.get(url, params={"projection": "partial"}).status_code == 422
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.data_access.search import to_fts_query
+
+
+def _save_check(db: DbStorage, patient_id: int, notes: str | None, attachments=None) -> int:
+    return db.medical_checks.save(
+        patient_id=patient_id,
+        check_template="ECG",
+        check_date="2024-01-01",
+        status="Amber",
+        medical_check_items=[],
+        notes=notes,
+        attachments=attachments,
+    )
+
+
+def test_to_fts_query_never_produces_invalid_syntax():
+    assert to_fts_query('atrial "fib" OR-') == '"atrial" "fib" "OR-"'
+    assert to_fts_query('"atrial fibrillation" card*') == '"atrial fibrillation" "card"*'
+    assert to_fts_query('say "it" " ^ ') == '"say" "it"'
+    assert to_fts_query("  * - ") is None
+
+
+def test_triggers_keep_the_index_in_sync(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    check_id = _save_check(
+        db,
+        patient_id,
+        notes="Irregular pulse",
+        attachments=[
+            {"filename": "l.txt", "content_type": "text/plain", "file_path": "x", "parsed_content": "Atrial flutter"}
+        ],
+    )
+    recording_id = db.voice_recordings.insert_recording(check_id=check_id, file_path="r.webm")
+    db.voice_recordings.update_transcription(
+        voice_recording_id=recording_id, full_text=json.dumps({"text": "palpitations at night", "segments": []})
+    )
+
+    assert [r.source for r in db.search.search("irregular", limit=10)] == ["check_notes"]
+    assert [r.source for r in db.search.search("atrial", limit=10)] == ["attachment"]
+    assert [r.source_id for r in db.search.search("palpitation", limit=10)] == [recording_id]
+    assert db.search.search("segments", limit=10) == []
+
+    db.medical_checks.update_notes(check_id=check_id, notes="Regular rhythm")
+    assert db.search.search("irregular", limit=10) == []
+    assert db.search.search("rhythm", limit=10)[0].check_id == check_id
+
+    db.medical_checks.delete(check_id=check_id)
+    assert all(db.search.search(term, limit=10) == [] for term in ("atrial", "rhythm", "palpitations"))
+    db.close()
+
+
+# PostgreSQL's ts_headline drops markup and highlights the words of a phrase one by one
+@pytest.mark.sqlite_only
+def test_search_ranks_filters_and_escapes(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    first, second = create_patient(), create_patient({"first_name": "jane"})
+    _save_check(db, first, notes="Known atrial fibrillation. <b>Atrial fibrillation</b> rate controlled.")
+    _save_check(db, second, notes="Family history of atrial fibrillation, otherwise well with no concerns today")
+
+    results = db.search.search('"atrial fibrillation"', limit=10)
+    assert [r.patient_id for r in results] == [first, second]
+    assert results[0].template_name == "ECG"
+    assert "&lt;b&gt;<mark>Atrial fibrillation</mark>&lt;/b&gt;" in results[0].snippet
+
+    assert [r.patient_id for r in db.search.search("fibrillation", patient_id=second, limit=10)] == [second]
+    assert [r.patient_id for r in db.search.search("fibrillation", limit=1, offset=1)] == [second]
+    db.close()
+
+
+def test_search_endpoint(client: TestClient, create_patient, migrated_db):
+    patient_id = create_patient()
+    db = DbStorage(migrated_db)
+    for _ in range(3):
+        _save_check(db, patient_id, notes="Atrial fibrillation noted")
+    db.close()
+
+    resp = client.get("/search", params={"q": "atrial fibrillation", "page_size": 2})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["has_more"] is True
+    assert len(body["records"]) == 2
+    assert "<mark>" in body["records"][0]["snippet"]
+
+    resp = client.get("/search", params={"q": "atrial", "page": 2, "page_size": 2, "patient_id": patient_id})
+    assert resp.json()["has_more"] is False
+    assert len(resp.json()["records"]) == 1
+
+    assert client.get("/search", params={"q": "atrial", "patient_id": 9999}).status_code == 404
+    assert client.get("/search", params={"q": ""}).status_code == 422
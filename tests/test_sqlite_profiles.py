@@ -0,0 +1,90 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from settings import SQLITE_PROFILES, Settings
+from src.data_access.db_storage import DbStorage
+from src.models.enums import JobKind, JobStatus
+from src.services.job_worker import maintain_database, schedule_maintenance
+
+# Needs the SQLite files themselves
+pytestmark = pytest.mark.sqlite_only
+
+
+def _pragmas(db: DbStorage) -> dict[str, object]:
+    return {
+        name: db.connection.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+    }
+
+
+def test_connections_use_the_configured_profile(migrated_db: Path, monkeypatch: pytest.MonkeyPatch):
+    db = DbStorage(migrated_db)
+    assert _pragmas(db) == {
+        "journal_mode": "wal",
+        "synchronous": 2,
+        "cache_size": -65536,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": 2,
+        "busy_timeout": 5000,
+    }
+    assert db.connection.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    db.close()
+
+    monkeypatch.setenv("SQLITE_PROFILE", "balanced")
+    db = DbStorage(migrated_db)
+    assert _pragmas(db)["synchronous"] == 1
+    db.close()
+
+    db = DbStorage(migrated_db, profile=SQLITE_PROFILES["legacy"])
+    assert _pragmas(db) | {"busy_timeout": None} == {
+        "journal_mode": "delete",
+        "synchronous": 2,
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": 0,
+        "busy_timeout": None,
+    }
+    db.close()
+
+
+def test_unknown_profile_is_rejected(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SQLITE_PROFILE", "turbo")
+    with pytest.raises(ValueError, match="profile"):
+        Settings()
+
+
+def test_maintenance_gives_free_pages_back(migrated_db: Path):
+    db = DbStorage(migrated_db)
+    assert db.connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    db.connection.executemany("INSERT INTO jobs (kind, payload_json) VALUES ('ai_summary', ?)", [("x" * 2000,)] * 500)
+    db.commit()
+    db.connection.execute("DELETE FROM jobs")
+    db.commit()
+
+    report = db.run_maintenance(vacuum_pages=100)
+
+    # Bounded by vacuum_pages, give or take the pointer-map pages the vacuum frees along the way
+    assert 100 <= report.vacuumed_pages < 110
+    assert report.freelist_pages_after > 0
+    assert db.connection.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    db.close()
+
+
+def test_maintenance_job_reschedules_itself(migrated_db: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SQLITE_MAINTENANCE_INTERVAL_SECONDS", "3600")
+    db = DbStorage(migrated_db)
+    first = schedule_maintenance(db)
+    assert schedule_maintenance(db) == first
+
+    job = db.jobs.lease("w1", lease_seconds=30)
+    assert job is not None
+    asyncio.run(maintain_database(db, job.payload))
+    db.jobs.complete(job.job_id, "w1")
+
+    [queued] = db.jobs.get_jobs(JobStatus.QUEUED)
+    assert queued.kind == JobKind.DB_MAINTENANCE and queued.job_id != first
+    # Not due for another hour
+    assert db.jobs.lease("w1", lease_seconds=30) is None
+    db.close()
@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.bench_startup import LAZY_MODULES, STARTUP_BUDGET_MS, import_profile, startup_ms
+from settings import OpenAISettings, Settings
+from src.services import ai_service
+
+
+def test_app_import_skips_heavy_dependencies():
+    assert [m for m in LAZY_MODULES if m in import_profile()] == []
+
+
+@pytest.mark.import_budget
+def test_app_import_stays_within_budget():
+    assert min(startup_ms(import_profile()) for _ in range(3)) <= STARTUP_BUDGET_MS
+
+
+def test_openai_client_is_created_on_demand():
+    from openai import AsyncOpenAI
+
+    settings = OpenAISettings(
+        api_key="sk-test", system_prompt="", model="m", url="", timeout=1.0, response_format={"type": "json_object"}
+    )
+
+    assert ai_service.AsyncOpenAI is AsyncOpenAI
+    assert ai_service._client_class() is AsyncOpenAI
+    assert isinstance(ai_service.AiService(None, settings).client, AsyncOpenAI)  # type: ignore[arg-type]
+
+
+def test_settings_read_environment_when_created(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("COMPRESSION_MINIMUM_SIZE", "10")
+    monkeypatch.setenv("OPENAI_MODEL", "late-model")
+
+    settings = Settings()
+
+    assert settings.compression.minimum_size == 10
+    assert settings.openai.model == "late-model"
+    assert settings.openai.system_prompt
@@ -0,0 +1,63 @@
+import gzip
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from build_assets import build
+from src import static_assets
+from src.static_assets import IMMUTABLE, VENDORED_ASSETS, StaticAssets, asset_url, load_manifest
+
+
+@pytest.fixture()
+def static_dir(tmp_path: Path) -> Path:
+    (tmp_path / "fonts").mkdir()
+    (tmp_path / "fonts" / "icons.woff2").write_bytes(b"\x00font")
+    (tmp_path / "app.js").write_text("console.log('hello');\n" * 50)
+    (tmp_path / "icons.css").write_text('@font-face { src: url("fonts/icons.woff2?abc#x") }\n' + "a{}" * 100)
+    return tmp_path
+
+
+def test_build_fingerprints_precompresses_and_rewrites_css(static_dir: Path):
+    manifest = build(static_dir)
+    dist = static_dir / "dist"
+
+    assert manifest["app.js"].startswith("app.") and manifest["app.js"].endswith(".js")
+    assert load_manifest.__wrapped__(static_dir) == manifest
+    js = dist / manifest["app.js"]
+    assert gzip.decompress(js.with_name(js.name + ".gz").read_bytes()) == js.read_bytes()
+    assert not (dist / (manifest["fonts/icons.woff2"] + ".gz")).exists()
+    css = (dist / manifest["icons.css"]).read_text()
+    assert f'url("{manifest["fonts/icons.woff2"]}#x")' in css
+
+    # Unchanged content keeps its name, so browsers keep their cached copy across builds
+    assert build(static_dir) == manifest
+
+
+def test_fingerprinted_assets_are_immutable_and_served_precompressed(static_dir: Path):
+    manifest = build(static_dir)
+    app = FastAPI()
+    app.mount("/static", StaticAssets(directory=static_dir), name="static")
+    client = TestClient(app)
+    url = f"/static/dist/{manifest['app.js']}"
+
+    compressed = client.get(url, headers={"accept-encoding": "br, gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["content-type"].startswith("text/javascript")
+    assert compressed.headers["cache-control"] == IMMUTABLE
+    assert compressed.text == (static_dir / "app.js").read_text()
+
+    plain = client.get(url, headers={"accept-encoding": "gzip;q=0"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["cache-control"] == IMMUTABLE
+    assert "cache-control" not in client.get("/static/app.js").headers
+
+
+def test_asset_url_prefers_manifest_then_local_file_then_cdn(static_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(static_assets, "STATIC_DIR", static_dir)
+    monkeypatch.setattr(static_assets, "load_manifest", lambda: {"app.js": "app.0123.js"})
+
+    assert asset_url("app.js") == "/static/dist/app.0123.js"
+    assert asset_url("icons.css") == "/static/icons.css"
+    assert asset_url("vendor/htmx/htmx.min.js") == VENDORED_ASSETS["vendor/htmx/htmx.min.js"]
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.data_access.backends import POSTGRES, SQLITE, dialect_of, is_postgres, postgres_pool, to_pyformat
+from src.data_access.db_storage import DbStorage
+from src.data_access.search import to_tsquery
+
+postgres_only = pytest.mark.skipif(not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+
+
+def test_to_pyformat_rewrites_placeholders_outside_literals():
+    assert to_pyformat("SELECT * FROM t WHERE a = ? AND b = '?'") == "SELECT * FROM t WHERE a = %s AND b = '?'"
+    assert to_pyformat("SELECT '50%', 'it''s ?' || ? LIKE 'a%'") == "SELECT '50%%', 'it''s ?' || %s LIKE 'a%%'"
+
+
+def test_to_tsquery_matches_the_fts_query_syntax():
+    assert to_tsquery('"atrial fibrillation" card*') == "'atrial' <-> 'fibrillation' & 'card':*"
+    assert to_tsquery("it's OR- ") == "'it' <-> 's' & 'OR'"
+    assert to_tsquery("  * - ") is None
+
+
+def test_database_kinds():
+    assert is_postgres("postgresql://db/medical") and is_postgres("postgres://db/medical")
+    assert not is_postgres("postgresql.sqlite")
+    assert dialect_of(object()) is SQLITE
+
+
+@postgres_only
+def test_postgres_storage_round_trip(migrated_db, create_patient):
+    psycopg = pytest.importorskip("psycopg")
+    db = DbStorage(migrated_db)
+    assert db.patients.dialect is POSTGRES
+    patient_id = create_patient()
+    check_id = db.medical_checks.save(
+        patient_id=patient_id,
+        check_template="ECG",
+        check_date="2024-01-01",
+        status="Amber",
+        medical_check_items=[],
+        notes="Known atrial fibrillation, rate controlled",
+    )
+
+    [result] = db.search.search("atrial fib*", limit=10)
+    assert (result.patient_id, result.check_id, result.template_name) == (patient_id, check_id, "ECG")
+    assert "<mark>atrial</mark>" in result.snippet
+
+    # A write that fails leaves the connection usable, as with sqlite3
+    with pytest.raises(psycopg.IntegrityError):
+        db.connection.execute("INSERT INTO patients (patient_id) VALUES (?)", (patient_id,))
+    db.connection.rollback()
+    assert [p.patient_id for p in db.patients.get_all_patients()] == [patient_id]
+    db.close()
+
+
+@postgres_only
+def test_postgres_transactions_borrow_a_connection_of_their_own(migrated_db):
+    db = DbStorage(migrated_db)
+    conn = db.connection
+    pool = postgres_pool(migrated_db)
+    (version,) = conn.execute("SELECT version FROM schema_version").fetchone()
+
+    with ThreadPoolExecutor(max_workers=1) as other_thread:
+        other_thread.submit(conn.execute, "UPDATE schema_version SET version = 'changed'").result()
+        # The other thread's transaction holds its connection; this one reads on another
+        assert other_thread.submit(lambda: conn.in_transaction).result()
+        assert not conn.in_transaction
+        assert conn.execute("SELECT version FROM schema_version").fetchone() == (version,)
+        other_thread.submit(conn.commit).result()
+
+    assert conn.execute("SELECT version FROM schema_version").fetchone() == ("changed",)
+    stats = pool.get_stats()
+    assert stats["pool_available"] == stats["pool_size"]
+    db.close()
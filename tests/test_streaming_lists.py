@@ -0,0 +1,61 @@
+import json
+import types
+
+from fastapi.testclient import TestClient
+
+from src.data_access.db_storage import DbStorage
+from src.models.patient import Patients
+
+
+def _create_patients(create_patient, count: int) -> list[int]:
+    return [create_patient({"first_name": f"patient{i}", "email": f"p{i}@example.com"}) for i in range(count)]
+
+
+def test_iter_patients_reads_lazily_newest_first(client: TestClient, create_patient, migrated_db):
+    patient_ids = _create_patients(create_patient, 5)
+    db = DbStorage(migrated_db)
+
+    rows = db.patients.iter_patients(batch_size=2)
+    assert isinstance(rows, types.GeneratorType)
+    assert [p.patient_id for p in rows] == sorted(patient_ids, reverse=True)
+    assert db.patients.get_all_patients() == list(db.patients.iter_patients())
+    db.close()
+
+
+def test_html_list_is_streamed_with_every_row(client: TestClient, create_patient):
+    _create_patients(create_patient, 3)
+
+    resp = client.get("/patients")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/html")
+    assert "content-length" not in resp.headers
+    for i in range(3):
+        assert f"Patient{i}" in resp.text
+    assert resp.text.rstrip().endswith("</html>")
+
+
+def test_json_list_matches_buffered_serialisation(client: TestClient, create_patient, migrated_db):
+    empty = client.get("/patients", headers={"accept": "application/json"})
+    assert empty.content == Patients().model_dump_json().encode()
+
+    _create_patients(create_patient, 3)
+    db = DbStorage(migrated_db)
+    expected = Patients(records=db.patients.get_all_patients()).model_dump_json()
+    db.close()
+
+    resp = client.get("/patients", headers={"accept": "application/json"})
+
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.text == expected
+    assert len(resp.json()["records"]) == 3
+
+
+def test_ndjson_list_has_one_patient_per_line(client: TestClient, create_patient):
+    patient_ids = _create_patients(create_patient, 3)
+
+    resp = client.get("/patients", headers={"accept": "application/x-ndjson"})
+
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = resp.text.splitlines()
+    assert [json.loads(line)["patient_id"] for line in lines] == sorted(patient_ids, reverse=True)
@@ -0,0 +1,102 @@
+from src.data_access.db_storage import DbStorage
+from src.data_access.identity_map import unit_of_work
+from src.models.medical_check_template import MedicalCheckTemplateItem
+
+
+def _trace(db: DbStorage) -> list[str]:
+    statements: list[str] = []
+    db._conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_catalogue_is_cached_between_reads(migrated_db):
+    db = DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(
+        template_id=None, check_name="Lipids", items=[MedicalCheckTemplateItem(name="LDL", units="mmol/L")]
+    )
+    db.medical_check_templates.list_medical_check_templates()
+
+    statements = _trace(db)
+    templates = db.medical_check_templates.list_medical_check_templates()
+    template = db.medical_check_templates.get_template(template_id=template_id)
+
+    assert template is not None and template.items[0].name == "LDL"
+    assert template in templates
+    # Only the version probes hit the database
+    assert all("catalogue_versions" in s for s in statements)
+    db.close()
+
+
+def test_writes_invalidate_the_catalogue(migrated_db):
+    db = DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="Lipids", items=[])
+    version = db.medical_check_templates.catalogue_version
+
+    db.medical_check_templates.set_active_status(template_id=template_id, is_active=False)
+    assert db.medical_check_templates.get_template(template_id=template_id).is_active is False
+
+    db.medical_check_templates.upsert(template_id=template_id, check_name="Lipid panel", items=[])
+    assert db.medical_check_templates.get_template(template_id=template_id).name == "Lipid panel"
+    assert db.medical_check_templates.catalogue_version > version
+    db.close()
+
+
+def test_writes_from_another_connection_are_picked_up(migrated_db):
+    db, other = DbStorage(migrated_db), DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="Lipids", items=[])
+    assert db.medical_check_templates.get_template(template_id=template_id).is_active is True
+
+    other.medical_check_templates.set_active_status(template_id=template_id, is_active=False)
+
+    assert db.medical_check_templates.get_template(template_id=template_id).is_active is False
+    db.close()
+    other.close()
+
+
+def test_save_resolves_template_name_from_catalogue(migrated_db, create_patient):
+    db = DbStorage(migrated_db)
+    patient_id = create_patient()
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="Lipids", items=[])
+    db.medical_check_templates.list_medical_check_templates()
+
+    statements = _trace(db)
+    db.medical_checks.save(
+        patient_id=patient_id, check_template="LIPIDS", check_date="2024-01-01", status="Green", medical_check_items=[]
+    )
+    assert not any("COLLATE NOCASE" in s for s in statements)
+    assert db.medical_checks.get_medical_checks(patient_id)[0].template_name == "Lipids"
+
+    # Unknown names are still auto-created and become visible in the catalogue straight away
+    db.medical_checks.save(
+        patient_id=patient_id, check_template="Thyroid", check_date="2024-02-01", status="Green", medical_check_items=[]
+    )
+    new_id = db.medical_check_templates.get_template_id_by_name("thyroid")
+    assert new_id is not None and new_id != template_id
+    db.close()
+
+
+def test_version_is_checked_once_per_unit_of_work(migrated_db):
+    db = DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="Lipids", items=[])
+
+    statements = _trace(db)
+    with unit_of_work():
+        db.medical_check_templates.list_medical_check_templates()
+        db.medical_check_templates.get_template(template_id=template_id)
+        db.medical_check_templates.get_template_id_by_name("lipids")
+        assert sum("catalogue_versions" in s for s in statements) == 1
+
+        # Its own writes are still seen straight away
+        db.medical_check_templates.set_active_status(template_id=template_id, is_active=False)
+        assert db.medical_check_templates.get_template(template_id=template_id).is_active is False
+    db.close()
+
+
+def test_names_match_ignoring_ascii_case_only(migrated_db):
+    db = DbStorage(migrated_db)
+    template_id = db.medical_check_templates.upsert(template_id=None, check_name="Ärzte-Check", items=[])
+
+    # As with COLLATE NOCASE, only A-Z are folded
+    assert db.medical_check_templates.get_template_id_by_name("Ärzte-CHECK") == template_id
+    assert db.medical_check_templates.get_template_id_by_name("ärzte-check") is None
+    db.close()
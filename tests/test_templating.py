@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+from src import templating
+from src.routes import medical_check_templates, medical_checks, patients
+from src.templating import configure_templates, precompile_templates, templates
+
+
+@pytest.fixture()
+def restore_environment():
+    env = templates.env
+    auto_reload, bytecode_cache = env.auto_reload, env.bytecode_cache
+    yield env
+    env.auto_reload, env.bytecode_cache = auto_reload, bytecode_cache
+
+
+def test_routers_share_one_environment_with_filters_registered(app):
+    assert patients.templates is medical_checks.templates is medical_check_templates.templates is templates
+    assert templates.env.filters["json_decode"]('{"a": 1}') == {"a": 1}
+    assert templates.env.filters["json_decode"]("not json") is None
+    assert "asset_url" in templates.env.globals
+    # Production default: no per-render check of template file mtimes
+    assert templates.env.auto_reload is False
+
+
+def test_precompile_fills_cache_and_writes_bytecode(restore_environment, tmp_path: Path):
+    env = restore_environment
+    configure_templates(auto_reload=False, bytecode_cache_dir=tmp_path / "jinja")
+    env.cache.clear()
+
+    count = precompile_templates()
+
+    names = env.list_templates(extensions=["html"])
+    assert count == len(names) == len(list(templating.TEMPLATES_DIR.glob("*.html")))
+    assert len(env.cache) == count
+    assert len(list((tmp_path / "jinja").iterdir())) == count
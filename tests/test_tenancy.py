@@ -0,0 +1,161 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from migrate import _get_current_version, _get_migration_files, apply_migrations_to_all
+from settings import JobSettings, Settings
+from src.data_access.db_storage import DbStorage
+from src.main import create_app
+from src.models.enums import JobKind
+from src.services.job_worker import JobWorker
+from src.tenancy import PRACTICE_HEADER, ShardPool, UnknownPracticeError, all_practices, practice_for
+from src.worker import PracticeDatabases
+
+# Needs the SQLite files themselves
+pytestmark = pytest.mark.sqlite_only
+
+PATIENT_FORM = {
+    "title": "Ms",
+    "first_name": "ann",
+    "last_name": "doe",
+    "sex": "female",
+    "dob": "1980-05-01",
+    "email": "ann@example.com",
+    "phone": "000",
+    "line_1": "1 Test Street",
+    "town": "Testville",
+    "postcode": "SW1A1AA",
+    "country": "United Kingdom",
+}
+
+
+@pytest.fixture()
+def practices_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    practices = tmp_path / "practices"
+    monkeypatch.setenv("TENANCY_ENABLED", "true")
+    monkeypatch.setenv("PRACTICES_DIR", str(practices))
+    monkeypatch.setenv("TENANCY_TRUST_PRACTICE_HEADER", "true")
+    settings = Settings()
+    shards = [practice_for(settings, practice_id) for practice_id in ("north", "south")]
+    for practice in shards:
+        practice.files_root.mkdir(parents=True)
+    assert apply_migrations_to_all([practice.db_file for practice in shards]) == {}
+    return practices
+
+
+@pytest.fixture()
+def tenant_client(practices_dir: Path):
+    with TestClient(create_app()) as c:
+        yield c
+
+
+def test_each_practice_sees_only_its_own_patients(tenant_client: TestClient, practices_dir: Path):
+    resp = tenant_client.post(
+        "/patients", data=PATIENT_FORM, headers={PRACTICE_HEADER: "north"}, follow_redirects=False
+    )
+    assert resp.status_code == 303
+
+    north = tenant_client.get("/patients", headers={PRACTICE_HEADER: "north", "Accept": "application/json"})
+    south = tenant_client.get("/patients", headers={PRACTICE_HEADER: "south", "Accept": "application/json"})
+
+    assert "Ann" in north.text
+    assert "Ann" not in south.text
+
+
+def test_practice_from_the_host_name(tenant_client: TestClient):
+    resp = tenant_client.get("/patients", headers={"Host": "south.gp.example:8000"})
+    assert resp.status_code == 200
+
+
+def test_practice_header_is_ignored_unless_trusted(practices_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("TENANCY_TRUST_PRACTICE_HEADER", "false")
+    pool = ShardPool(Settings())
+
+    practice = pool.resolve({PRACTICE_HEADER.lower(): "north"}, "south.gp.example")
+
+    assert practice.practice_id == "south"
+
+
+@pytest.mark.parametrize("practice_id", ["west", "../north", ""])
+def test_unknown_practice_is_not_found(tenant_client: TestClient, practice_id: str):
+    resp = tenant_client.get("/patients", headers={PRACTICE_HEADER: practice_id, "Host": "localhost"})
+    assert resp.status_code == 404
+    assert resp.json() == {"detail": "Unknown practice"}
+
+
+def test_least_recently_used_shard_is_closed(practices_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("TENANCY_MAX_OPEN_SHARDS", "1")
+    pool = ShardPool(Settings())
+    north = pool.resolve({PRACTICE_HEADER.lower(): "north"}, None)
+    south = pool.resolve({PRACTICE_HEADER.lower(): "south"}, None)
+
+    with pool.checkout(north) as north_shard:
+        # North is busy, so opening south grows the pool past its bound for a while
+        with pool.checkout(south):
+            assert len(pool) == 2
+        assert len(pool) == 1
+        assert north_shard.storage.patients.get_all_patients() == []
+    with pool.checkout(south):
+        pass
+
+    assert (pool.opened, pool.evicted, len(pool)) == (3, 2, 1)
+    with pytest.raises(UnknownPracticeError):
+        pool.resolve({PRACTICE_HEADER.lower(): "west"}, None)
+    pool.close()
+
+
+def test_migrations_apply_to_every_practice(practices_dir: Path, tmp_path: Path):
+    settings = Settings()
+    practices = all_practices(settings)
+    assert [p.practice_id for p in practices] == ["north", "south"]
+
+    failures = apply_migrations_to_all([p.db_file for p in practices], "0013_jobs", max_workers=2)
+    assert failures == {}
+    broken = tmp_path / "broken.sqlite"
+    broken.write_text("not a database")
+    failures = apply_migrations_to_all([broken, *[p.db_file for p in practices]])
+
+    assert list(failures) == [broken]
+    latest = _get_migration_files()[-1].stem
+    for practice in practices:
+        conn = sqlite3.connect(practice.db_file)
+        assert _get_current_version(conn) == latest
+        conn.close()
+
+
+def _enqueue(practice_db_file: Path | str, practice_id: str, count: int) -> None:
+    db = DbStorage(practice_db_file)
+    for n in range(count):
+        db.jobs.enqueue(JobKind.AI_SUMMARY, {"practice": practice_id, "n": n})
+    db.close()
+
+
+def test_one_worker_serves_every_practice_in_turn(practices_dir: Path):
+    settings = Settings()
+    served: list[tuple[str, int]] = []
+
+    async def handler(db: DbStorage, payload: dict[str, Any]) -> None:
+        served.append((payload["practice"], payload["n"]))
+
+    databases = PracticeDatabases(settings, lambda: all_practices(settings), rescan_seconds=0, maintain=False)
+    assert len(databases()) == 2
+    north, south = all_practices(settings)
+    _enqueue(north.db_file, "north", 3)
+    _enqueue(south.db_file, "south", 1)
+    # Created after the worker first listed the practices
+    west = practice_for(settings, "west")
+    west.files_root.mkdir()
+    assert apply_migrations_to_all([west.db_file]) == {}
+    _enqueue(west.db_file, "west", 1)
+
+    worker = JobWorker(databases, JobSettings(concurrency=1, poll_interval=0.01), {JobKind.AI_SUMMARY: handler})
+    assert asyncio.run(worker.run(until_idle=True)) == 5
+    databases.close()
+
+    # The others' jobs are not left waiting behind the whole of north's queue
+    assert {practice for practice, _ in served[:3]} == {"north", "south", "west"}
+    assert sorted(served) == [("north", 0), ("north", 1), ("north", 2), ("south", 0), ("west", 0)]